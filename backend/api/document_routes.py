@@ -1,5 +1,7 @@
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
-from typing import Optional, Dict, Any, List
+from fastapi.concurrency import run_in_threadpool
+from typing import Optional, Dict, Any, List, Tuple, Union
+import asyncio
 import logging
 import traceback
 import uuid
@@ -11,9 +13,18 @@ logger = logging.getLogger(__name__)
 
 from backend.document_analysis.document_service import DocumentAnalysisService
 from backend.document_analysis.config import OLLAMA_CONFIG
-from utils.repository import DocumentRepository, ChatHistoryRepository
+from backend.document_analysis.semantic_cache import SemanticAnswerCache
+from backend.document_analysis.quiz_parser import QuizQuestion, format_quiz
+from backend.document_analysis.conversation import SessionNotFound
+from backend.document_analysis.chat_history_store import ChatHistoryStore
+from utils.repository import DocumentRepository, ChatHistoryRepository, QuizRepository
 from utils.database import Storage
+from utils.single_flight import SingleFlight, flight_key
+from utils.cache_versions import EXTRACTOR, SPLITTER, SYSTEM_PROMPT, cache_versions, document_dependency
 from backend.model_management.system_prompt_manager import system_prompt_manager
+from backend.model_management.admission import AdmissionRejected
+from backend.model_management.model_lifecycle import ModelWarmupError, model_lifecycle
+from backend.model_management.telemetry import traced
 
 router = APIRouter()
 
@@ -27,6 +38,19 @@ document_service = DocumentAnalysisService(
 # Initialize repositories
 document_repo = DocumentRepository()
 chat_history_repo = ChatHistoryRepository()
+quiz_repo = QuizRepository()
+
+# Chat history reads come from a bounded cache; new entries are written to the database in batches
+chat_history_store = ChatHistoryStore(chat_history_repo)
+
+# Coalesces identical concurrent generation requests into one model call
+generation_flight = SingleFlight("document generation")
+
+# Semantic cache for answers to paraphrased Q&A questions
+semantic_cache = SemanticAnswerCache(
+    embeddings=document_service.embeddings,
+    chat_history_repo=chat_history_store
+)
 
 # Simple user dependency for now - in production you'd have proper auth
 def get_current_user():
@@ -60,6 +84,105 @@ def generate_multi_document_id(file_contents: List[bytes], filenames: List[str])
     uuid_str = f"{combined_hash[:8]}-{combined_hash[8:12]}-{combined_hash[12:16]}-{combined_hash[16:20]}-{combined_hash[20:32]}"
     return uuid_str
 
+def _qa_chat_meta(query_type: str, model: str, system_prompt: Optional[str], semantic_hit: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Build chat history metadata recording how a Q&A answer was produced."""
+    meta = {
+        "query_type": query_type,
+        "model": model,
+        "system_prompt_override": bool(system_prompt),
+        # Lets the semantic cache seed only from answers given under the current default prompt
+        "system_prompt_version": cache_versions.static_version(SYSTEM_PROMPT),
+    }
+    if semantic_hit:
+        meta["semantic_cache_hit"] = True
+        meta["source_chat_id"] = semantic_hit.get("chat_id")
+    return meta
+
+async def store_uploads(
+    uploads: List[Tuple[bytes, str, Optional[str]]],
+    user_id: str,
+    purpose: Optional[str] = None
+) -> List[Union[Dict[str, Any], Exception]]:
+    """
+    Save uploaded files and insert their document records concurrently.
+    
+    Args:
+        uploads: (content, filename, content_type) of each file
+        user_id: Owner of the documents
+        purpose: Optional purpose recorded in the document metadata
+        
+    Returns:
+        The document record, or the exception raised, for each upload in request order
+    """
+    def store(content_based_id: str, content: bytes, filename: str, content_type: Optional[str]) -> Dict[str, Any]:
+        # Save file to storage system
+        file_id, file_path = Storage.upload_file(content, filename)
+        
+        meta = {
+            "original_filename": filename,
+            "content_type": content_type,
+            "content_based_id": True,  # Flag to indicate this uses content-based ID
+        }
+        if purpose:
+            meta["purpose"] = purpose
+        
+        # Insert or get existing document record in database
+        return document_repo.insert_or_get_document(
+            document_id=content_based_id,
+            user_id=user_id,
+            filename=filename,
+            path=file_path,
+            content_type=content_type,
+            size=len(content),
+            meta=meta
+        )
+    
+    # Identical files share a content-based ID; store each one once
+    document_ids = [generate_content_based_document_id(content, filename) for content, filename, _ in uploads]
+    unique = {}
+    for document_id, upload in zip(document_ids, uploads):
+        unique.setdefault(document_id, upload)
+    stored = await asyncio.gather(
+        *(run_in_threadpool(store, document_id, *upload) for document_id, upload in unique.items()),
+        return_exceptions=True
+    )
+    by_id = dict(zip(unique, stored))
+    return [by_id[document_id] for document_id in document_ids]
+
+def stored_quiz_response(quiz: Dict[str, Any]) -> Dict[str, Any]:
+    """Re-serve a quiz from the quizzes table in the generate-quiz response shape."""
+    questions = quiz["questions"]
+    return {
+        "result": format_quiz([QuizQuestion.from_dict(question) for question in questions]),
+        "questions": questions,
+        "quiz_id": quiz["id"],
+        "cached": True,
+    }
+
+def store_quiz(
+    result: Dict[str, Any],
+    document_id: str,
+    difficulty: str,
+    cache_key: str,
+    model_name: str,
+    system_prompt: Optional[str]
+) -> None:
+    """Persist the structured questions of a generated quiz and add its quiz_id to the result."""
+    if not result.get("questions"):
+        return
+    quiz = quiz_repo.add_quiz(
+        document_id=document_id,
+        difficulty=difficulty,
+        questions=result["questions"],
+        meta={
+            "cache_key": cache_key,
+            "model": model_name,
+            # Same flag name as in chat history meta
+            "system_prompt_override": bool(system_prompt),
+        }
+    )
+    result["quiz_id"] = quiz["id"]
+
 @router.post("/analyze")
 async def analyze_document(
     query_type: str = Form(...),
@@ -73,6 +196,8 @@ async def analyze_document(
     extra_files_5: Optional[UploadFile] = File(None),
     model_name: Optional[str] = Form(None),
     system_prompt: Optional[str] = Form(None),
+    use_cache: bool = Form(True),
+    refresh_cache: bool = Form(False),
     current_user: Dict = Depends(get_current_user)
 ) -> Dict[str, Any]:
     """
@@ -89,6 +214,8 @@ async def analyze_document(
     - extra_files_1-5: Additional files to analyze
     - model_name: Optional Ollama model name to use for analysis
     - system_prompt: Optional custom system prompt to control AI behavior
+    - use_cache: Reuse a cached model response for an identical request (default: True)
+    - refresh_cache: Ignore any cached response and store a freshly generated one
     """
     # Gather all files from different parameters
     all_files = []
@@ -119,10 +246,10 @@ async def analyze_document(
     if not all_files:
         logger.warning("No files provided for document analysis")
         return {"result": "No files provided. Please upload at least one document for analysis."}
-      # Set model if provided
-    if model_name:
-        document_service.set_model(model_name)
-        logger.info(f"Using model {model_name} for document analysis")
+    
+    # Resolve the model for this request only; the shared default is left untouched
+    current_model = model_name or document_service.get_current_model()
+    logger.info(f"Using model {current_model} for document analysis")
     
     logger.info(f"Processing {len(all_files)} files for analysis")
     file_contents = []
@@ -130,61 +257,70 @@ async def analyze_document(
     document_ids = []  # Store document IDs for database reference
     
     for f in all_files:
-        try:
-            # Reset the file position to the beginning before reading
-            await f.seek(0)
-            file_content = await f.read()
-            
-            # Generate content-based document ID
-            content_based_id = generate_content_based_document_id(file_content, f.filename)
-            
-            # Save file to storage system
-            file_id, file_path = Storage.upload_file(file_content, f.filename)
-            
-            # Insert or get existing document record in database
-            document = document_repo.insert_or_get_document(
-                document_id=content_based_id,
-                user_id=current_user["id"],
-                filename=f.filename,
-                path=file_path,
-                content_type=f.content_type,
-                size=len(file_content),
-                meta={
-                    "original_filename": f.filename,
-                    "content_type": f.content_type,
-                    "content_based_id": True,  # Flag to indicate this uses content-based ID
-                }
-            )
-            
-            # Add to processing lists
-            file_contents.append(file_content)
-            filenames.append(f.filename)
-            document_ids.append(document["id"])
-            
-            logger.debug(f"Successfully processed file: {f.filename} ({len(file_content)} bytes), ID: {document['id']}")
-        except Exception as e:
-            logger.error(f"Error processing file {f.filename}: {str(e)}")
-            logger.error(traceback.format_exc())
-            return {"result": f"Error processing file {f.filename}: {str(e)}"}
+        # Reset the file position to the beginning before reading
+        await f.seek(0)
+        file_contents.append(await f.read())
+        filenames.append(f.filename)
+    
+    # Save all files and their document records concurrently
+    stored = await store_uploads(
+        [(content, f.filename, f.content_type) for content, f in zip(file_contents, all_files)],
+        current_user["id"]
+    )
+    for f, file_content, document in zip(all_files, file_contents, stored):
+        if isinstance(document, Exception):
+            logger.error(f"Error processing file {f.filename}: {str(document)}")
+            logger.error("".join(traceback.format_exception(type(document), document, document.__traceback__)))
+            return {"result": f"Error processing file {f.filename}: {str(document)}"}
+        
+        # Add to processing lists
+        document_ids.append(document["id"])
+        
+        logger.debug(f"Successfully processed file: {f.filename} ({len(file_content)} bytes), ID: {document['id']}")
     
     try:
+        # Semantic answer cache: reuse an answer to an equivalent question on the same
+        # document set and model. Custom system prompts change the answer, so they bypass it.
+        semantic_scope = None
+        semantic_hit = None
+        if query_type == "qa" and user_query and not system_prompt:
+            if len(file_contents) == 1:
+                semantic_scope = document_ids[0]
+            else:
+                semantic_scope = generate_multi_document_id(file_contents, filenames)
+            if use_cache and not refresh_cache:
+                # Embedding the question (and seeding from history) must not block the event loop
+                semantic_hit = await run_in_threadpool(semantic_cache.lookup, semantic_scope, current_model, user_query)
+        
         if len(file_contents) == 1:
-            # For single file, use the original method
-            logger.info("Using single-file analysis method")
-            result = document_service.analyze_document(
-                file_content=file_contents[0],
-                query_type=query_type,
-                user_query=user_query,
-                system_prompt=system_prompt,            )
+            if semantic_hit:
+                logger.info("Answering from semantic cache")
+                result = {"result": semantic_hit["answer"]}
+            else:
+                # For single file, use the original method
+                logger.info("Using single-file analysis method")
+                result = await generation_flight.do(
+                    flight_key("analyze", file_contents[0], query_type, user_query,
+                               system_prompt, current_model, refresh_cache),
+                    lambda: traced("documents/analyze", run_in_threadpool(
+                        document_service.analyze_document,
+                        file_content=file_contents[0],
+                        query_type=query_type,
+                        user_query=user_query,
+                        system_prompt=system_prompt,
+                        use_cache=use_cache,
+                        refresh_cache=refresh_cache,
+                        model_name=current_model,
+                    )),
+                    enabled=use_cache,
+                )
             # Store in chat history if it's a QA query
             if query_type == "qa" and user_query:
-                chat_entry = chat_history_repo.add_chat_entry(
+                chat_entry = chat_history_store.add(
                     document_id=document_ids[0],
                     user_query=user_query,
                     system_response=result.get("result", ""),
-                    meta={
-                        "query_type": query_type
-                    }
+                    meta=_qa_chat_meta(query_type, current_model, system_prompt, semantic_hit)
                 )
                 # Add chat history ID to result
                 result["chat_id"] = chat_entry["id"]
@@ -195,15 +331,28 @@ async def analyze_document(
             result["document_id"] = document_ids[0]
             logger.debug(f"Set result document_id to database ID: {document_ids[0]}")
         else:
-            # For multiple files, use the multi-document analysis method
-            logger.info(f"Using multi-file analysis method for {len(file_contents)} files")
-            result = document_service.analyze_multiple_documents(
-                file_contents=file_contents,
-                filenames=filenames,
-                query_type=query_type,
-                user_query=user_query,
-                system_prompt=system_prompt,
-            )
+            if semantic_hit:
+                logger.info("Answering multi-document question from semantic cache")
+                result = {"result": semantic_hit["answer"]}
+            else:
+                # For multiple files, use the multi-document analysis method
+                logger.info(f"Using multi-file analysis method for {len(file_contents)} files")
+                result = await generation_flight.do(
+                    flight_key("analyze_multiple", file_contents, filenames, query_type,
+                               user_query, system_prompt, current_model, refresh_cache),
+                    lambda: traced("documents/analyze", run_in_threadpool(
+                        document_service.analyze_multiple_documents,
+                        file_contents=file_contents,
+                        filenames=filenames,
+                        query_type=query_type,
+                        user_query=user_query,
+                        system_prompt=system_prompt,
+                        use_cache=use_cache,
+                        refresh_cache=refresh_cache,
+                        model_name=current_model,
+                    )),
+                    enabled=use_cache,
+                )
               # Store in chat history with references to all documents
             if query_type == "qa" and user_query:
                 # Generate content-based multi-document ID
@@ -226,12 +375,12 @@ async def analyze_document(
                     }
                 )
                   # Use the actual document ID from the placeholder record
-                chat_entry = chat_history_repo.add_chat_entry(
+                chat_entry = chat_history_store.add(
                     document_id=placeholder_document["id"],
                     user_query=user_query,
                     system_response=result.get("result", ""),
                     meta={
-                        "query_type": query_type,
+                        **_qa_chat_meta(query_type, current_model, system_prompt, semantic_hit),
                         "document_ids": document_ids,
                         "document_names": filenames
                     }
@@ -264,18 +413,34 @@ async def analyze_document(
                 # Use the actual document ID from the placeholder record
                 result["multi_document_id"] = placeholder_document["id"]
         
+        # Remember fresh answers for later paraphrased questions
+        if semantic_scope and semantic_hit is None and (use_cache or refresh_cache):
+            await run_in_threadpool(
+                semantic_cache.store,
+                semantic_scope, current_model, user_query,
+                result.get("result", ""), chat_id=result.get("chat_id")
+            )
+        if semantic_hit:
+            result["semantic_cache"] = {
+                "hit": True,
+                "similarity": round(semantic_hit["similarity"], 4),
+                "matched_question": semantic_hit["matched_question"],
+            }
+        
         # Add document IDs to result for frontend reference
         result["document_ids"] = document_ids
         
         # Add debug information to result for troubleshooting if needed
-        if 'debug' not in result and len(file_contents) > 1:
-            result['debug'] = {
+        if len(file_contents) > 1:
+            result.setdefault('debug', {}).update({
                 'file_count': len(file_contents),
                 'filenames': filenames,
                 'document_ids': document_ids
-            }
+            })
         
         return result
+    except AdmissionRejected as e:
+        raise e.to_http_exception()
     except Exception as e:
         logger.error(f"Error during document analysis: {str(e)}")
         logger.error(traceback.format_exc())
@@ -301,10 +466,10 @@ async def get_chat_history(document_id: str, limit: int = 50, offset: int = 0) -
         # Check if it's a regular document ID or a multi-document ID
         if document_id.startswith("multi_"):
             # For multi-document chats, retrieve directly by the combined ID
-            chat_history = chat_history_repo.get_chat_history_by_document(document_id, limit, offset)
+            chat_history = chat_history_store.get(document_id, limit, offset)
         else:
             # For single documents, get history associated with this document
-            chat_history = chat_history_repo.get_chat_history_by_document(document_id, limit, offset)
+            chat_history = chat_history_store.get(document_id, limit, offset)
             
         # Check if this is a multi-document placeholder
         is_multi_document = document and document.get("meta", {}).get("is_multi_document", False)
@@ -401,7 +566,9 @@ async def delete_document(
             raise HTTPException(status_code=403, detail="Not authorized to delete this document")
         
         # Delete associated chat history
-        chat_history_repo.delete_chat_history_by_document(document_id)
+        chat_history_store.delete_document(document_id)
+        # Every cache entry keyed on this document is dropped by bumping its generation
+        cache_versions.bump(document_dependency(document_id))
         
         # Delete the document
         success = document_repo.delete_document(document_id)
@@ -421,6 +588,8 @@ async def generate_quiz(
     difficulty: str = Form("medium"),
     model_name: Optional[str] = Form(None),
     system_prompt: Optional[str] = Form(None),
+    use_cache: bool = Form(True),
+    refresh_cache: bool = Form(False),
     current_user: Dict = Depends(get_current_user)
 ) -> Dict[str, Any]:
     """
@@ -434,13 +603,26 @@ async def generate_quiz(
     - end_page: The page to end at (-1 for all pages)
     - model_name: Optional Ollama model name to use for generation
     - system_prompt: Optional custom system prompt to control AI behavior
+    - use_cache: Reuse a cached model response for an identical request (default: True)
+    - refresh_cache: Ignore any cached response and store a freshly generated one
     """
     try:
         file_content = await file.read()
         
-        # Set model if provided
-        if model_name:
-            document_service.set_model(model_name)
+        # Resolve the model for this request only; the shared default is left untouched
+        current_model = model_name or document_service.get_current_model()
+        
+        # An identical earlier request is served straight from the quizzes table
+        quiz_key = flight_key("quiz", current_user["id"], file_content, num_questions, difficulty,
+                              system_prompt, current_model,
+                              cache_versions.static_token(SYSTEM_PROMPT, EXTRACTOR, SPLITTER))
+        if use_cache and not refresh_cache:
+            stored = quiz_repo.get_quiz_by_cache_key(quiz_key)
+            if stored:
+                logger.info(f"Serving stored quiz {stored['id']}")
+                result = stored_quiz_response(stored)
+                result["document_id"] = stored["document_id"]
+                return result
         
         # Save file to storage system
         file_id, file_path = Storage.upload_file(file_content, file.filename)
@@ -458,15 +640,26 @@ async def generate_quiz(
             }
         )
         
-        result = document_service.generate_quiz(
-            file_content=file_content,
-            num_questions=num_questions,
-            difficulty=difficulty,
-            system_prompt=system_prompt,
+        result = await generation_flight.do(
+            flight_key("quiz", file_content, num_questions, difficulty, system_prompt,
+                       current_model, refresh_cache),
+            lambda: traced("documents/generate-quiz", run_in_threadpool(
+                document_service.generate_quiz,
+                file_content=file_content,
+                num_questions=num_questions,
+                difficulty=difficulty,
+                system_prompt=system_prompt,
+                use_cache=use_cache,
+                refresh_cache=refresh_cache,
+                model_name=current_model,
+            )),
+            enabled=use_cache,
         )
         
         # Add document ID to result for frontend reference
+        result = dict(result)
         result["document_id"] = document["id"]
+        store_quiz(result, document["id"], difficulty, quiz_key, current_model, system_prompt)
         
         # Update document metadata with quiz results
         document_repo.update_document_meta(document["id"], {
@@ -477,6 +670,8 @@ async def generate_quiz(
         })
         
         return result
+    except AdmissionRejected as e:
+        raise e.to_http_exception()
     except Exception as e:
         logger.error(f"Error generating quiz: {str(e)}")
         logger.error(traceback.format_exc())
@@ -495,6 +690,8 @@ async def generate_quiz_multiple(
     extra_files_5: Optional[UploadFile] = File(None),
     model_name: Optional[str] = Form(None),
     system_prompt: Optional[str] = Form(None),
+    use_cache: bool = Form(True),
+    refresh_cache: bool = Form(False),
     current_user: Dict = Depends(get_current_user)
 ) -> Dict[str, Any]:
     """
@@ -508,6 +705,8 @@ async def generate_quiz_multiple(
     - extra_files_1-5: Additional files to analyze
     - model_name: Optional Ollama model name to use for generation
     - system_prompt: Optional custom system prompt to control AI behavior
+    - use_cache: Reuse a cached model response for an identical request (default: True)
+    - refresh_cache: Ignore any cached response and store a freshly generated one
     """
     # Gather all files from different parameters
     all_files = []
@@ -540,67 +739,70 @@ async def generate_quiz_multiple(
         return {"result": "Vui lòng cung cấp ít nhất hai tài liệu để tạo bài trắc nghiệm từ nhiều tài liệu."}
     
     try:
-        # Set model if provided
-        if model_name:
-            document_service.set_model(model_name)
-            logger.info(f"Using model {model_name} for quiz generation")
+        # Resolve the model for this request only; the shared default is left untouched
+        current_model = model_name or document_service.get_current_model()
+        logger.info(f"Using model {current_model} for quiz generation")
         
-        # Process files
+        # Read every file first so an identical earlier request can be served from the quizzes table
         file_contents = []
         filenames = []
-        document_ids = []
-        
         for f in all_files:
-            try:
-                # Reset the file position to the beginning before reading
-                await f.seek(0)
-                file_content = await f.read()
-                
-                # Generate content-based document ID
-                content_based_id = generate_content_based_document_id(file_content, f.filename)
-                
-                # Save file to storage system
-                file_id, file_path = Storage.upload_file(file_content, f.filename)
-                
-                # Insert or get existing document record in database
-                document = document_repo.insert_or_get_document(
-                    document_id=content_based_id,
-                    user_id=current_user["id"],
-                    filename=f.filename,
-                    path=file_path,
-                    content_type=f.content_type,
-                    size=len(file_content),
-                    meta={
-                        "original_filename": f.filename,
-                        "content_type": f.content_type,
-                        "content_based_id": True,
-                        "purpose": "quiz_generation"
-                    }
-                )
-                
-                # Add to processing lists
-                file_contents.append(file_content)
-                filenames.append(f.filename)
-                document_ids.append(document["id"])
-                
-                logger.debug(f"Successfully processed file for quiz: {f.filename} ({len(file_content)} bytes), ID: {document['id']}")
-            except Exception as e:
-                logger.error(f"Error processing file {f.filename}: {str(e)}")
-                logger.error(traceback.format_exc())
-                return {"result": f"Error processing file {f.filename}: {str(e)}"}
+            await f.seek(0)
+            file_contents.append(await f.read())
+            filenames.append(f.filename)
+        
+        multi_doc_id = generate_multi_document_id(file_contents, filenames)
+        quiz_key = flight_key("quiz_multiple", current_user["id"], file_contents, filenames, num_questions,
+                              difficulty, system_prompt, current_model,
+                              cache_versions.static_token(SYSTEM_PROMPT, EXTRACTOR, SPLITTER))
+        if use_cache and not refresh_cache:
+            stored = quiz_repo.get_quiz_by_cache_key(quiz_key)
+            if stored:
+                logger.info(f"Serving stored multi-document quiz {stored['id']}")
+                result = stored_quiz_response(stored)
+                placeholder_document = document_repo.get_document_by_id(stored["document_id"]) or {}
+                result["document_ids"] = placeholder_document.get("meta", {}).get("document_ids", [])
+                result["multi_document_id"] = stored["document_id"]
+                return result
+        
+        # Save all files and their document records concurrently
+        document_ids = []
+        stored = await store_uploads(
+            [(content, f.filename, f.content_type) for content, f in zip(file_contents, all_files)],
+            current_user["id"],
+            purpose="quiz_generation"
+        )
+        for f, file_content, document in zip(all_files, file_contents, stored):
+            if isinstance(document, Exception):
+                logger.error(f"Error processing file {f.filename}: {str(document)}")
+                logger.error("".join(traceback.format_exception(type(document), document, document.__traceback__)))
+                return {"result": f"Error processing file {f.filename}: {str(document)}"}
+            
+            # Add to processing lists
+            document_ids.append(document["id"])
+            
+            logger.debug(f"Successfully processed file for quiz: {f.filename} ({len(file_content)} bytes), ID: {document['id']}")
         
         # Generate multi-document quiz
         logger.info(f"Generating quiz from {len(file_contents)} documents")
-        result = document_service.generate_quiz_multiple(
-            file_contents=file_contents,
-            filenames=filenames,
-            num_questions=num_questions,
-            difficulty=difficulty,
-            system_prompt=system_prompt,
+        result = await generation_flight.do(
+            flight_key("quiz_multiple", file_contents, filenames, num_questions, difficulty,
+                       system_prompt, current_model, refresh_cache),
+            lambda: traced("documents/generate-quiz-multiple", run_in_threadpool(
+                document_service.generate_quiz_multiple,
+                file_contents=file_contents,
+                filenames=filenames,
+                num_questions=num_questions,
+                difficulty=difficulty,
+                system_prompt=system_prompt,
+                use_cache=use_cache,
+                refresh_cache=refresh_cache,
+                model_name=current_model,
+            )),
+            enabled=use_cache,
         )
         
         # Create a placeholder document record for the multi-document quiz
-        multi_doc_id = generate_multi_document_id(file_contents, filenames)
         combined_filenames = ', '.join(filenames)
         placeholder_document = document_repo.insert_or_get_document(
             document_id=multi_doc_id,
@@ -623,15 +825,184 @@ async def generate_quiz_multiple(
         )
         
         # Add document IDs to result for frontend reference
+        result = dict(result)
         result["document_ids"] = document_ids
         result["multi_document_id"] = placeholder_document["id"]
+        store_quiz(result, placeholder_document["id"], difficulty, quiz_key, current_model, system_prompt)
         
         return result
+    except AdmissionRejected as e:
+        raise e.to_http_exception()
     except Exception as e:
         logger.error(f"Error generating multi-document quiz: {str(e)}")
         logger.error(traceback.format_exc())
         return {"result": f"Error generating multi-document quiz: {str(e)}"}
 
+@router.post("/chat")
+async def chat(
+    user_query: str = Form(...),
+    session_id: Optional[str] = Form(None),
+    file: Optional[UploadFile] = File(None),
+    model_name: Optional[str] = Form(None),
+    system_prompt: Optional[str] = Form(None),
+    current_user: Dict = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """
+    Ask a question as part of a conversation about a document.
+    
+    Follow-up turns continue from the model context of the previous turn, so only
+    the new question and newly retrieved passages are processed by the model.
+    
+    Parameters:
+    - user_query: The question for this turn
+    - session_id: Session ID returned by the previous turn (omit to start a conversation)
+    - file: The document; required to start a conversation, optional afterwards
+    - model_name: Optional Ollama model name to use for this turn
+    - system_prompt: Optional custom system prompt to control AI behavior
+    """
+    try:
+        current_model = model_name or document_service.get_current_model()
+        
+        file_content = None
+        document_id = None
+        if file:
+            file_content = await file.read()
+            content_based_id = generate_content_based_document_id(file_content, file.filename)
+            document = document_repo.get_document_by_id(content_based_id)
+            if not document:
+                file_id, file_path = Storage.upload_file(file_content, file.filename)
+                document = document_repo.insert_or_get_document(
+                    document_id=content_based_id,
+                    user_id=current_user["id"],
+                    filename=file.filename,
+                    path=file_path,
+                    content_type=file.content_type,
+                    size=len(file_content),
+                    meta={
+                        "original_filename": file.filename,
+                        "content_type": file.content_type,
+                        "content_based_id": True,
+                    }
+                )
+            document_id = document["id"]
+        
+        result = await traced("documents/chat", run_in_threadpool(
+            document_service.chat,
+            user_query=user_query,
+            session_id=session_id,
+            file_content=file_content,
+            document_id=document_id,
+            system_prompt=system_prompt,
+            model_name=current_model,
+        ))
+        
+        chat_entry = chat_history_store.add(
+            document_id=result["document_id"],
+            user_query=user_query,
+            system_response=result.get("result", ""),
+            meta=dict(_qa_chat_meta("chat", current_model, system_prompt, None), session_id=result["session_id"])
+        )
+        result["chat_id"] = chat_entry["id"]
+        return result
+    except SessionNotFound as e:
+        raise HTTPException(status_code=404, detail=f"{str(e)}; upload the document again to start a new conversation")
+    except AdmissionRejected as e:
+        raise e.to_http_exception()
+    except Exception as e:
+        logger.error(f"Error in conversation: {str(e)}")
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Error in conversation: {str(e)}")
+
+@router.delete("/chat/{session_id}")
+async def end_chat(session_id: str) -> Dict[str, Any]:
+    """
+    End a conversation and release its session state.
+    """
+    return {"success": document_service.conversations.drop(session_id)}
+
+@router.get("/quizzes/{quiz_id}")
+async def get_quiz(
+    quiz_id: str,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    current_user: Dict = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """
+    Retrieve a stored quiz with its structured questions.
+    
+    Parameters:
+    - quiz_id: ID of the quiz
+    - offset: Index of the first question to return
+    - limit: Maximum number of questions to return (all remaining when omitted)
+    """
+    try:
+        quiz = quiz_repo.get_quiz_by_id(quiz_id)
+        if not quiz:
+            raise HTTPException(status_code=404, detail="Quiz not found")
+        
+        # Check if user has access to the quiz's document
+        document = document_repo.get_document_by_id(quiz["document_id"])
+        if document and document["user_id"] != current_user["id"]:
+            raise HTTPException(status_code=403, detail="Not authorized to access this quiz")
+        
+        questions = quiz.pop("questions")
+        end = None if limit is None else offset + limit
+        quiz["questions"] = questions[offset:end]
+        quiz["total_questions"] = len(questions)
+        quiz["offset"] = offset
+        return quiz
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving quiz: {str(e)}")
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Error retrieving quiz: {str(e)}")
+
+@router.get("/documents/{document_id}/quizzes")
+async def get_document_quizzes(
+    document_id: str,
+    limit: int = 20,
+    offset: int = 0,
+    current_user: Dict = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """
+    List the quizzes generated from a document, newest first.
+    """
+    try:
+        document = document_repo.get_document_by_id(document_id)
+        if not document:
+            raise HTTPException(status_code=404, detail="Document not found")
+        if document["user_id"] != current_user["id"]:
+            raise HTTPException(status_code=403, detail="Not authorized to access this document")
+        
+        quizzes = quiz_repo.get_quizzes_by_document(document_id, limit, offset)
+        return {
+            "document_id": document_id,
+            "quizzes": quizzes,
+            "limit": limit,
+            "offset": offset
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving quizzes: {str(e)}")
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Error retrieving quizzes: {str(e)}")
+
+@router.get("/chat-history-cache/stats")
+async def get_chat_history_cache_stats() -> Dict[str, Any]:
+    """
+    Get size, hit/miss and write-behind queue statistics for the chat history cache.
+    """
+    return chat_history_store.stats()
+
+@router.get("/semantic-cache/stats")
+async def get_semantic_cache_stats() -> Dict[str, Any]:
+    """
+    Get hit/miss statistics for the semantic Q&A answer cache.
+    """
+    return semantic_cache.stats()
+
 @router.get("/current-model")
 async def get_current_model() -> Dict[str, str]:
     """
@@ -643,7 +1014,7 @@ async def get_current_model() -> Dict[str, str]:
     return {"model_name": document_service.get_current_model()}
 
 @router.post("/set-model")
-async def set_model(model_name: str = Form(...)) -> Dict[str, str]:
+async def set_model(model_name: str = Form(...)) -> Dict[str, Any]:
     """
     Set the model to use for document analysis.
     
@@ -651,11 +1022,19 @@ async def set_model(model_name: str = Form(...)) -> Dict[str, str]:
     - model_name: The name of the Ollama model to use
     
     Returns:
-    - A dictionary containing the updated model name
+    - A dictionary containing the updated model name and warm-up details
     """
     try:
+        # Load the model before acknowledging so the next request doesn't pay the load time
+        warmup = await model_lifecycle.ensure_warm(model_name)
         document_service.set_model(model_name)
-        return {"model_name": model_name, "message": f"Model changed to {model_name}"}
+        return {
+            "model_name": model_name,
+            "message": f"Model changed to {model_name}",
+            "warmup": warmup,
+        }
+    except ModelWarmupError as e:
+        raise HTTPException(status_code=502, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -767,7 +1146,7 @@ async def add_chat_history_entry(
         meta = message.get("meta", {})
         
         # Add to history
-        chat_entry = chat_history_repo.add_chat_entry(
+        chat_entry = chat_history_store.add(
             document_id=document_id,
             user_query=user_query,
             system_response=system_response,
@@ -1,14 +1,18 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
+import asyncio
 import logging
 
-from backend.api.document_routes import router as document_router
+from backend.api.document_routes import router as document_router, document_service, chat_history_store
 from backend.api.slide_routes import router as slide_router
 from backend.api.simple_model_routes import router as model_router
 from backend.api.cleanup_routes import router as cleanup_router
 from backend.api.health_routes import router as health_router
+from backend.api.request_metrics import RequestMetricsMiddleware, router as metrics_router
 from backend.model_management.system_prompt_manager import system_prompt_manager
+from backend.model_management.model_lifecycle import model_lifecycle
+from backend.model_management.config import MODEL_LIFECYCLE_CONFIG
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -28,12 +32,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Time every request by route template, status and model (added last, so it runs outermost)
+app.add_middleware(RequestMetricsMiddleware, routes=app.routes)
+
 # Include routers
 app.include_router(document_router, prefix="/api/documents", tags=["Documents"])
 app.include_router(slide_router, prefix="/api/slides", tags=["Slides"])
 app.include_router(model_router, prefix="/api/ollama", tags=["Ollama Models"])
 app.include_router(cleanup_router, prefix="/api/cleanup", tags=["Storage Cleanup"])
 app.include_router(health_router, prefix="/api", tags=["Health Checks"])
+app.include_router(metrics_router, tags=["Monitoring"])
 
 # Setup background cleaning tasks (runs on server startup)
 @app.on_event("startup")
@@ -66,6 +74,17 @@ async def startup_event():
             logger.info("System prompt set successfully")
         else:
             logger.info(f"System prompt already set to: '{current_prompt}'")
+        
+        # Load the configured model in the background so the first request doesn't pay the load time
+        if MODEL_LIFECYCLE_CONFIG["preload_on_startup"]:
+            default_model = document_service.get_current_model()
+            logger.info(f"Preloading model {default_model}...")
+            app.state.model_preload = asyncio.create_task(model_lifecycle.preload(default_model))
     except Exception as e:
         logger.error(f"Error in startup event: {e}")
-        # Don't fail startup, just log the error
\ No newline at end of file
+        # Don't fail startup, just log the error
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Write chat history entries still waiting in the write-behind queue
+    chat_history_store.close()
@@ -0,0 +1,104 @@
+"""
+Request timing middleware and the Prometheus /metrics endpoint.
+
+Requests are labelled by route template (e.g. "/api/documents/documents/{document_id}")
+rather than by path, so IDs in URLs cannot grow the number of time series.
+Paths that match no route share the "unmatched" label.
+"""
+
+import logging
+import time
+from typing import Any, Callable, Dict, List, Sequence
+
+from fastapi import APIRouter, HTTPException, Response, status
+from starlette.routing import BaseRoute, Match
+
+from backend.model_management.metrics import get_metrics
+from backend.model_management.telemetry import request_models
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+    HAS_PROMETHEUS = True
+except ImportError:
+    HAS_PROMETHEUS = False
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+def route_template(routes: Sequence[BaseRoute], scope: Dict[str, Any]) -> str:
+    """Path template of the route a request will be dispatched to."""
+    partial = None
+    for route in routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", UNMATCHED_ROUTE)
+        if match == Match.PARTIAL and partial is None:
+            # Path matches but the method does not (405)
+            partial = getattr(route, "path", UNMATCHED_ROUTE)
+    return partial or UNMATCHED_ROUTE
+
+
+def model_label(models: List[str]) -> str:
+    """Model label of a request: the model it generated with, "multiple" or "none"."""
+    if not models:
+        return "none"
+    return models[0] if len(models) == 1 else "multiple"
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request by route template, status and model.
+
+    Args:
+        app: The wrapped ASGI application
+        routes: The application's routes (app.routes), used to resolve templates
+    """
+
+    def __init__(self, app: Callable, routes: Sequence[BaseRoute]):
+        self.app = app
+        self.routes = routes
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        metrics = get_metrics()
+        if scope["type"] != "http" or metrics is None:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        endpoint = route_template(self.routes, scope)
+        status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+
+        async def send_with_status(message: Dict[str, Any]) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        metrics.record_request_in_progress(method, endpoint, 1)
+        start = time.perf_counter()
+        with request_models() as models:
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                # Streaming responses are timed until their last chunk is sent
+                metrics.record_request_in_progress(method, endpoint, -1)
+                metrics.record_request_duration(
+                    method, endpoint, status_code, time.perf_counter() - start, model_label(models)
+                )
+
+
+@router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics() -> Response:
+    """Expose every registered Prometheus collector in the text exposition format."""
+    if not HAS_PROMETHEUS:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="prometheus_client is not installed"
+        )
+    # Collectors are registered when the performance metrics are first loaded
+    get_metrics()
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -6,6 +6,8 @@ import json
 import os
 from pydantic import BaseModel
 from backend.model_management.system_prompt_manager import system_prompt_manager
+from backend.model_management.admission import admission_controller
+from backend.model_management.model_lifecycle import ModelWarmupError, model_lifecycle
 
 router = APIRouter()
 
@@ -88,12 +90,46 @@ def get_current_model():
     return {"model_name": current_model}
 
 @router.post("/set-model", response_model=Dict[str, str])
-def set_model(model_name: str = Form(...)):
-    """Set model for slide generation."""
+async def set_model(model_name: str = Form(...)):
+    """Set model for slide generation, loading it into Ollama first."""
     global current_model
+    try:
+        await model_lifecycle.ensure_warm(model_name)
+    except ModelWarmupError as e:
+        raise HTTPException(status_code=502, detail=str(e))
     current_model = model_name
     return {"model_name": model_name, "message": f"Model changed to {model_name}"}
 
+@router.get("/resident", response_model=Dict[str, Any])
+async def get_resident_models():
+    """
+    Get the models currently loaded in Ollama, their keep_alive settings and recent warm-ups.
+    """
+    return await model_lifecycle.status()
+
+@router.post("/warm", response_model=Dict[str, Any])
+async def warm_model(model_name: str = Form(...), keep_alive: Optional[str] = Form(None)):
+    """
+    Load a model into Ollama's memory without switching to it.
+    
+    Parameters:
+    - model_name: The name of the Ollama model to load
+    - keep_alive: Optional keep_alive override for this model (e.g. "1h", "-1")
+    """
+    if keep_alive:
+        model_lifecycle.set_keep_alive(model_name, keep_alive)
+    try:
+        return await model_lifecycle.warm(model_name)
+    except ModelWarmupError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+
+@router.get("/admission", response_model=Dict[str, Any])
+def get_admission_stats():
+    """
+    Get per-model concurrency, queue depth and shedding counters for LLM generations.
+    """
+    return admission_controller.stats()
+
 @router.get("/system-prompt", response_model=Dict[str, str])
 def get_system_prompt():
     """
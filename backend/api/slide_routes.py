@@ -1,4 +1,5 @@
 from fastapi import APIRouter, HTTPException, Body, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
 from typing import Dict, Any, List, Optional
 from pydantic import BaseModel, Field
 import os
@@ -7,6 +8,10 @@ import logging
 
 from backend.slide_generation.slide_service import SlideGenerationService
 from backend.model_management.system_prompt_manager import system_prompt_manager
+from backend.model_management.admission import AdmissionRejected
+from backend.model_management.model_lifecycle import ModelWarmupError, model_lifecycle
+from backend.model_management.telemetry import traced
+from utils.single_flight import SingleFlight, flight_key
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -19,6 +24,9 @@ slide_service = SlideGenerationService(
     base_url=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"),
 )
 
+# Coalesces identical concurrent slide requests into one model call
+slide_flight = SingleFlight("slide generation")
+
 class SlideContent(BaseModel):
     title_text: str
     text: Optional[str] = None
@@ -31,6 +39,7 @@ class SlideRequest(BaseModel):
 
 class SlideResponse(BaseModel):
     slides: List[SlideContent]
+    debug: Optional[Dict[str, Any]] = None
 
 @router.post("/generate", response_model=SlideResponse)
 async def generate_slides(
@@ -38,7 +47,9 @@ async def generate_slides(
     num_slides: int = Form(10),
     model_name: Optional[str] = Form(None),
     documents: Optional[List[UploadFile]] = File(None),
-    system_prompt: Optional[str] = Form(None)
+    system_prompt: Optional[str] = Form(None),
+    use_cache: bool = Form(True),
+    refresh_cache: bool = Form(False)
 ) -> Dict[str, Any]:
     """
     Generate slides based on the given topic and optional documents.
@@ -49,6 +60,8 @@ async def generate_slides(
     - model_name: Optional Ollama model name to use for generation
     - documents: Optional list of file uploads to provide additional context (PDF, DOCX, or TXT)
     - system_prompt: Optional custom system prompt to use for generation
+    - use_cache: Reuse a cached model response for an identical request (default: True)
+    - refresh_cache: Ignore any cached response and store a freshly generated one
     
     Returns:
     - A dictionary containing an array of slides with titles and content
@@ -57,9 +70,8 @@ async def generate_slides(
         # Validate num_slides
         num_slides = max(1, min(20, num_slides))  # Ensure between 1 and 20
         
-        # Set model if provided
-        if model_name:
-            slide_service.set_model(model_name)
+        # Resolve the model for this request only; the shared default is left untouched
+        current_model = model_name or slide_service.get_current_model()
             
         document_content = None
         if documents:
@@ -76,12 +88,23 @@ async def generate_slides(
                     parsed_texts.append(f"---\nDocument: {doc.filename}\nError parsing document: {str(e)}")
             
             # Combine all parsed texts into one context
-            document_content = "\n\n".join(parsed_texts)          # Call the slide generation service
-        result = slide_service.generate_slides(
-            topic=topic,
-            num_slides=num_slides,
-            document_content=document_content,
-            system_prompt=system_prompt
+            document_content = "\n\n".join(parsed_texts)
+        
+        # Call the slide generation service; identical concurrent requests share one generation
+        result = await slide_flight.do(
+            flight_key("slides", topic, num_slides, document_content, system_prompt,
+                       current_model, refresh_cache),
+            lambda: traced("slides/generate", run_in_threadpool(
+                slide_service.generate_slides,
+                topic=topic,
+                num_slides=num_slides,
+                document_content=document_content,
+                system_prompt=system_prompt,
+                use_cache=use_cache,
+                refresh_cache=refresh_cache,
+                model_name=current_model
+            )),
+            enabled=use_cache
         )
         
         # Validate the result
@@ -106,6 +129,8 @@ async def generate_slides(
                 slide["text"] = "No content available"
         
         return result
+    except AdmissionRejected as e:
+        raise e.to_http_exception()
     except Exception as e:
         logger.exception(f"Error generating slides: {str(e)}")
         # Return a more graceful error response instead of raising an exception
@@ -126,7 +151,7 @@ async def get_current_model() -> Dict[str, str]:
     return {"model_name": slide_service.get_current_model()}
 
 @router.post("/set-model")
-async def set_model(model_name: str = Form(...)) -> Dict[str, str]:
+async def set_model(model_name: str = Form(...)) -> Dict[str, Any]:
     """
     Set the model to use for slide generation.
     
@@ -134,10 +159,19 @@ async def set_model(model_name: str = Form(...)) -> Dict[str, str]:
     - model_name: The name of the Ollama model to use
     
     Returns:
-    - A dictionary containing the updated model name    """
+    - A dictionary containing the updated model name and warm-up details
+    """
     try:
+        # Load the model before acknowledging so the next request doesn't pay the load time
+        warmup = await model_lifecycle.ensure_warm(model_name)
         slide_service.set_model(model_name)
-        return {"model_name": model_name, "message": f"Model changed to {model_name}"}
+        return {
+            "model_name": model_name,
+            "message": f"Model changed to {model_name}",
+            "warmup": warmup,
+        }
+    except ModelWarmupError as e:
+        raise HTTPException(status_code=502, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
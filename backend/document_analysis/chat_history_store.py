@@ -0,0 +1,269 @@
+"""Bounded in-process chat history cache with write-behind persistence."""
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from .config import (
+    MAX_CHAT_HISTORY_ITEMS,
+    CHAT_HISTORY_CACHE_MAX_BYTES,
+    CHAT_HISTORY_WRITE_BATCH_SIZE,
+    CHAT_HISTORY_FLUSH_INTERVAL,
+)
+from utils.write_behind import WriteBehindQueue
+
+logger = logging.getLogger(__name__)
+
+# Rough per-entry overhead of the dict and its fixed fields
+_ENTRY_OVERHEAD_BYTES = 256
+
+def _entry_size(entry: Dict[str, Any]) -> int:
+    return (
+        len(entry["user_query"].encode("utf-8"))
+        + len((entry.get("system_response") or "").encode("utf-8"))
+        + len(json.dumps(entry.get("meta") or {}, ensure_ascii=False).encode("utf-8"))
+        + _ENTRY_OVERHEAD_BYTES
+    )
+
+class _DocumentHistory:
+    """Most recent entries of one document; complete when they are its whole history."""
+
+    def __init__(self, entries: List[Dict[str, Any]], complete: bool):
+        self.entries = entries
+        self.complete = complete
+        self.size = sum(_entry_size(entry) for entry in entries)
+
+class ChatHistoryStore:
+    """
+    Chat history served from a size-accounted LRU cache.
+
+    With a repository, the database is the source of truth: reads of uncached
+    documents load from it, and new entries are returned immediately while a
+    write-behind queue inserts them in batches. Entries still waiting to be
+    written are merged into reads so they are never missing. Without a
+    repository the store is a bounded in-memory history.
+
+    Each document keeps at most max_items_per_document recent entries in
+    memory, and least recently used documents are evicted once the cached
+    entries exceed max_bytes in total.
+    """
+
+    def __init__(
+        self,
+        repo: Optional[Any] = None,
+        max_bytes: int = CHAT_HISTORY_CACHE_MAX_BYTES,
+        max_items_per_document: int = MAX_CHAT_HISTORY_ITEMS,
+        batch_size: int = CHAT_HISTORY_WRITE_BATCH_SIZE,
+        flush_interval: float = CHAT_HISTORY_FLUSH_INTERVAL,
+    ):
+        self.repo = repo
+        self.max_bytes = max_bytes
+        self.max_items_per_document = max_items_per_document
+        self._documents: "OrderedDict[str, _DocumentHistory]" = OrderedDict()
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        # Bumped whenever entries leave _pending (written or deleted)
+        self._flushes = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.writer = None
+        if repo is not None:
+            self.writer = WriteBehindQueue(
+                self._write,
+                name="chat-history-writer",
+                batch_size=batch_size,
+                flush_interval=flush_interval,
+                on_drop=self._forget,
+            )
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and self._documents:
+            _, history = self._documents.popitem(last=False)
+            self._bytes -= history.size
+            self.evictions += 1
+
+    def _cache(self, document_id: str, history: _DocumentHistory) -> None:
+        previous = self._documents.pop(document_id, None)
+        if previous is not None:
+            self._bytes -= previous.size
+        self._documents[document_id] = history
+        self._bytes += history.size
+        self._evict()
+
+    def _append(self, history: _DocumentHistory, entry: Dict[str, Any]) -> None:
+        history.entries.append(entry)
+        size = _entry_size(entry)
+        history.size += size
+        self._bytes += size
+        while len(history.entries) > self.max_items_per_document:
+            dropped = history.entries.pop(0)
+            dropped_size = _entry_size(dropped)
+            history.size -= dropped_size
+            self._bytes -= dropped_size
+            # Older entries are only in the database now
+            history.complete = self.repo is None
+
+    def add(
+        self,
+        document_id: str,
+        user_query: str,
+        system_response: str,
+        meta: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Record a chat entry without waiting for the database.
+
+        Returns:
+            The new entry, with the ID and timestamps it will be stored under
+        """
+        now = int(time.time())
+        entry = {
+            "id": str(uuid.uuid4()),
+            "document_id": document_id,
+            "user_query": user_query,
+            "system_response": system_response,
+            "meta": meta or {},
+            "created_at": now,
+            "updated_at": now,
+        }
+        with self._lock:
+            history = self._documents.get(document_id)
+            if history is None and self.repo is None:
+                # Nothing else holds this history, so an empty one is complete
+                history = _DocumentHistory([], complete=True)
+                self._cache(document_id, history)
+            if history is not None:
+                self._documents.move_to_end(document_id)
+                self._append(history, entry)
+                self._evict()
+            if self.repo is not None:
+                self._pending[entry["id"]] = entry
+        if self.writer is not None:
+            self.writer.submit(entry)
+        return dict(entry)
+
+    def _write(self, entries: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            # Entries of documents deleted meanwhile are no longer pending
+            live = [entry for entry in entries if entry["id"] in self._pending]
+        if live:
+            # A failed write leaves the entries pending for the writer's retry
+            self.repo.add_chat_entries(live)
+        self._forget(entries)
+
+    def _forget(self, entries: List[Dict[str, Any]]) -> None:
+        """Stop tracking entries that were written, or dropped after failing to be."""
+        with self._lock:
+            for entry in entries:
+                self._pending.pop(entry["id"], None)
+            self._flushes += 1
+
+    def _pending_for(self, document_id: str, known_ids: set) -> List[Dict[str, Any]]:
+        return [
+            entry for entry in self._pending.values()
+            if entry["document_id"] == document_id and entry["id"] not in known_ids
+        ]
+
+    @staticmethod
+    def _merge(rows: List[Dict[str, Any]], *pending: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Add pending entries missing from rows, oldest first."""
+        known = {row["id"] for row in rows}
+        for entries in pending:
+            for entry in entries:
+                if entry["id"] not in known:
+                    known.add(entry["id"])
+                    rows.append(entry)
+        rows.sort(key=lambda entry: entry["created_at"])
+        return rows
+
+    def get(self, document_id: str, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Get a document's chat history, oldest first.
+
+        Args:
+            document_id: The document ID to get history for
+            limit: Maximum number of entries to return
+            offset: Pagination offset
+        """
+        with self._lock:
+            history = self._documents.get(document_id)
+            if history is not None and history.complete:
+                self._documents.move_to_end(document_id)
+                self.hits += 1
+                return [dict(entry) for entry in history.entries[offset:offset + limit]]
+            self.misses += 1
+            # An entry written while the database is read would be in neither the rows nor
+            # _pending afterwards, so remember what is pending now
+            pending_before = self._pending_for(document_id, set())
+            flushes_before = self._flushes
+
+        if self.repo is None:
+            return []
+
+        # Load the document's recent history; cache it when it is the whole history
+        rows = self.repo.get_chat_history_by_document(document_id, limit=self.max_items_per_document + 1)
+        if len(rows) <= self.max_items_per_document:
+            with self._lock:
+                rows = self._merge(rows, pending_before, self._pending_for(document_id, set()))
+                # Entries added after the snapshot may have been written meanwhile; only
+                # cache the history when no write finished during the read
+                if self._flushes == flushes_before:
+                    history = _DocumentHistory(rows[-self.max_items_per_document:],
+                                               complete=len(rows) <= self.max_items_per_document)
+                    self._cache(document_id, history)
+                return [dict(entry) for entry in rows[offset:offset + limit]]
+
+        rows = self.repo.get_chat_history_by_document(document_id, limit=limit, offset=offset)
+        if len(rows) < limit:
+            with self._lock:
+                pending = self._pending_for(document_id, set())
+            known = {row["id"] for row in rows}
+            extra = [entry for entry in self._merge([], pending_before, pending) if entry["id"] not in known]
+            rows.extend(extra[:limit - len(rows)])
+        return rows
+
+    def get_chat_history_by_document(self, document_id: str, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """Same as get(); lets the store stand in for ChatHistoryRepository when reading."""
+        return self.get(document_id, limit, offset)
+
+    def delete_document(self, document_id: str) -> bool:
+        """Delete a document's history from the cache, the write queue and the database."""
+        with self._lock:
+            history = self._documents.pop(document_id, None)
+            if history is not None:
+                self._bytes -= history.size
+            for entry_id in [entry["id"] for entry in self._pending_for(document_id, set())]:
+                del self._pending[entry_id]
+            self._flushes += 1
+        if self.repo is not None:
+            return self.repo.delete_chat_history_by_document(document_id)
+        return history is not None
+
+    def flush(self) -> None:
+        """Wait until every queued entry has been written."""
+        if self.writer is not None:
+            self.writer.flush()
+
+    def close(self) -> None:
+        """Write queued entries and stop the writer thread."""
+        if self.writer is not None:
+            self.writer.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {
+                "documents": len(self._documents),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+        if self.writer is not None:
+            stats["writer"] = self.writer.stats()
+        return stats
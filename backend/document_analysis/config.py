@@ -1,3 +1,4 @@
+import os
 from typing import Dict, Any
 
 # Ollama Configuration
@@ -17,8 +18,40 @@ SUPPORTED_FILE_TYPES = [".pdf", ".txt", ".doc", ".docx"]
 
 # Chat History Settings
 CHAT_HISTORY_ENABLED = True
-MAX_CHAT_HISTORY_ITEMS = 50
+MAX_CHAT_HISTORY_ITEMS = 50  # Entries cached per document
+CHAT_HISTORY_CACHE_MAX_BYTES = int(os.getenv("CHAT_HISTORY_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))  # Across all documents
+CHAT_HISTORY_WRITE_BATCH_SIZE = int(os.getenv("CHAT_HISTORY_WRITE_BATCH_SIZE", "100"))  # Entries per SQLite transaction
+CHAT_HISTORY_FLUSH_INTERVAL = float(os.getenv("CHAT_HISTORY_FLUSH_INTERVAL", "0.5"))  # Max seconds an entry waits to be written
 
 # Language Settings
 FORCE_VIETNAMESE = True
-LANGUAGE_DETECTION_CONFIDENCE = 0.7  # Minimum confidence for language detection 
\ No newline at end of file
+LANGUAGE_DETECTION_CONFIDENCE = 0.7  # Minimum confidence for language detection 
+# Semantic Answer Cache Settings
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))  # Cosine similarity
+SEMANTIC_CACHE_MAX_ENTRIES_PER_SCOPE = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES_PER_SCOPE", "200"))
+SEMANTIC_CACHE_MAX_SCOPES = int(os.getenv("SEMANTIC_CACHE_MAX_SCOPES", "256"))
+SEMANTIC_CACHE_SEED_LIMIT = int(os.getenv("SEMANTIC_CACHE_SEED_LIMIT", "100"))  # Prior answers loaded per scope
+
+# Sharded Quiz Generation Settings
+QUIZ_QUESTIONS_PER_SHARD = int(os.getenv("QUIZ_QUESTIONS_PER_SHARD", "6"))  # Questions per LLM call
+QUIZ_MAX_WORKERS = int(os.getenv("QUIZ_MAX_WORKERS", "4"))  # Concurrent shard calls (admission control also applies)
+QUIZ_SHARD_CONTEXT_CHARS = int(os.getenv("QUIZ_SHARD_CONTEXT_CHARS", "6000"))  # Passage budget per shard
+QUIZ_DEDUP_THRESHOLD = float(os.getenv("QUIZ_DEDUP_THRESHOLD", "0.9"))  # Cosine similarity for near-duplicates
+QUIZ_TOP_UP_ROUNDS = int(os.getenv("QUIZ_TOP_UP_ROUNDS", "2"))  # Extra rounds to reach the requested count
+
+# Conversational Q&A Settings
+CONVERSATION_TTL_SECONDS = int(os.getenv("CONVERSATION_TTL_SECONDS", "1800"))  # Idle time before a session is dropped
+CONVERSATION_MAX_SESSIONS = int(os.getenv("CONVERSATION_MAX_SESSIONS", "64"))  # Least recently used sessions are evicted
+CONVERSATION_MAX_CONTEXT_TOKENS = int(os.getenv("CONVERSATION_MAX_CONTEXT_TOKENS", "3072"))  # Keep below the server's num_ctx
+CONVERSATION_RECENT_TURNS = int(os.getenv("CONVERSATION_RECENT_TURNS", "2"))  # Turns kept verbatim after compaction
+CONVERSATION_RETRIEVAL_K = int(os.getenv("CONVERSATION_RETRIEVAL_K", "3"))  # Chunks retrieved per question
+
+# Concurrent Ingestion Settings
+INGESTION_MAX_WORKERS = int(os.getenv("INGESTION_MAX_WORKERS", "5"))  # Files parsed and embedded at once per request
+PARSE_CACHE_MAX_ENTRIES = int(os.getenv("PARSE_CACHE_MAX_ENTRIES", "64"))  # Parsed and split files kept in memory
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "20000"))  # Chunk vectors (~1.5 KB each)
+
+# Per-Document Summary Cache Settings
+DOCUMENT_SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("DOCUMENT_SUMMARY_CACHE_MAX_ENTRIES", "512"))
+DOCUMENT_SUMMARY_MAX_WORKERS = int(os.getenv("DOCUMENT_SUMMARY_MAX_WORKERS", "4"))  # Concurrent summaries on a miss
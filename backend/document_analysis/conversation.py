@@ -0,0 +1,213 @@
+"""Per-session state for conversational Q&A that reuses Ollama's token context across turns."""
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from .config import (
+    CONVERSATION_TTL_SECONDS,
+    CONVERSATION_MAX_SESSIONS,
+    CONVERSATION_MAX_CONTEXT_TOKENS,
+    CONVERSATION_RECENT_TURNS,
+)
+
+logger = logging.getLogger(__name__)
+
+QA_GUIDELINES = """Guidelines:
+1. Answer directly and comprehensively
+2. Use evidence from the context
+3. Structure your answer clearly
+4. If the answer is not in the context, say so clearly
+5. Use bullet points for multiple items
+6. Keep language professional and clear"""
+
+SUMMARY_TEMPLATE = """Summarize the following conversation about a document so it can be continued later.
+Keep every fact, figure and conclusion the answers established, and the topics the user asked about.
+
+{summary}{turns}
+
+Summary:"""
+
+class SessionNotFound(LookupError):
+    """Raised when a conversation session is unknown or has expired."""
+
+    def __init__(self, session_id: Optional[str]):
+        self.session_id = session_id
+        super().__init__(f"Conversation session {session_id} not found or expired")
+
+def _chunk_id(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def _format_turns(turns: List[Dict[str, str]]) -> str:
+    return "\n\n".join(f"Q: {turn['question']}\nA: {turn['answer']}" for turn in turns)
+
+class ConversationSession:
+    """
+    One conversation about one document.
+
+    Holds the document's vector store (so follow-ups skip splitting and
+    embedding), the token context Ollama returned after the last turn, the
+    chunks that context already contains, and the turns so far. Once the
+    context grows past max_context_tokens the old turns are folded into a
+    running summary and the next turn starts a fresh, shorter context.
+    """
+
+    def __init__(
+        self,
+        scope: str,
+        vectorstore: Any,
+        model_name: str,
+        system_prompt: Optional[str] = None,
+        session_id: Optional[str] = None,
+    ):
+        self.session_id = session_id or str(uuid.uuid4())
+        self.scope = scope
+        self.vectorstore = vectorstore
+        self.model_name = model_name
+        self.system_prompt = system_prompt
+        self.context: List[int] = []
+        self.summary = ""
+        self.turns: List[Dict[str, str]] = []
+        self.compactions = 0
+        self.last_used = time.time()
+        self._seen_chunks: set = set()
+        # Turns must run one at a time: each continues the previous turn's context
+        self.lock = threading.Lock()
+
+    def reset_context(self, model_name: Optional[str] = None, system_prompt: Optional[str] = None) -> None:
+        """Forget the model context, e.g. after compaction or when the model or instructions change."""
+        self.context = []
+        self._seen_chunks = set()
+        if model_name is not None:
+            self.model_name = model_name
+        self.system_prompt = system_prompt
+
+    def new_chunks(self, chunks: List[str]) -> List[str]:
+        """Retrieved chunks the current model context does not contain yet."""
+        return [chunk for chunk in chunks if _chunk_id(chunk) not in self._seen_chunks]
+
+    def build_prompt(self, question: str, chunks: List[str], instructions: str) -> str:
+        """
+        Render the text to send for this turn.
+
+        With a live context only the new chunks and the question are sent. Otherwise
+        the prompt primes a new context with the instructions, the running summary,
+        the most recent turns verbatim and the retrieved chunks.
+        """
+        context_text = "\n\n".join(chunks)
+        if self.context:
+            parts = []
+            if context_text:
+                parts.append(f"Additional context:\n{context_text}")
+            parts.append(f"Question: {question}\n\nAnswer:")
+            return "\n\n" + "\n\n".join(parts)
+
+        parts = [instructions]
+        if self.summary:
+            parts.append(f"Conversation so far (summary):\n{self.summary}")
+        recent = self.turns[-CONVERSATION_RECENT_TURNS:] if CONVERSATION_RECENT_TURNS > 0 else []
+        if recent:
+            parts.append(f"Recent exchanges:\n{_format_turns(recent)}")
+        parts.append(f"Context:\n{context_text}")
+        parts.append(f"Question: {question}\n\nAnswer:")
+        return "\n\n".join(parts)
+
+    def record_turn(self, question: str, answer: str, chunks: List[str], context: List[int]) -> None:
+        """Store a completed turn and the context Ollama returned for it."""
+        self.turns.append({"question": question, "answer": answer})
+        self.context = context
+        self._seen_chunks.update(_chunk_id(chunk) for chunk in chunks)
+        self.last_used = time.time()
+
+    def needs_compaction(self) -> bool:
+        return len(self.context) > CONVERSATION_MAX_CONTEXT_TOKENS
+
+    def summary_prompt(self) -> str:
+        """Prompt asking the model to fold the summary and older turns into a new summary."""
+        older = self.turns[:-CONVERSATION_RECENT_TURNS] if CONVERSATION_RECENT_TURNS > 0 else self.turns
+        summary = f"Earlier summary:\n{self.summary}\n\n" if self.summary else ""
+        return SUMMARY_TEMPLATE.format(summary=summary, turns=_format_turns(older))
+
+    def compact(self, summary: str) -> None:
+        """Replace the older turns with a summary and start a fresh context on the next turn."""
+        self.summary = summary.strip()
+        if CONVERSATION_RECENT_TURNS > 0:
+            self.turns = self.turns[-CONVERSATION_RECENT_TURNS:]
+        else:
+            self.turns = []
+        self.compactions += 1
+        self.reset_context(system_prompt=self.system_prompt)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "scope": self.scope,
+            "model": self.model_name,
+            "turns": len(self.turns),
+            "context_tokens": len(self.context),
+            "has_summary": bool(self.summary),
+            "compactions": self.compactions,
+            "last_used": self.last_used,
+        }
+
+class ConversationManager:
+    """In-memory sessions, evicted after ttl_seconds idle or least recently used beyond max_sessions."""
+
+    def __init__(
+        self,
+        ttl_seconds: int = CONVERSATION_TTL_SECONDS,
+        max_sessions: int = CONVERSATION_MAX_SESSIONS,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float) -> None:
+        expired = [
+            session_id for session_id, session in self._sessions.items()
+            if now - session.last_used > self.ttl_seconds
+        ]
+        for session_id in expired:
+            del self._sessions[session_id]
+        if expired:
+            logger.debug(f"Expired {len(expired)} conversation sessions")
+
+    def get(self, session_id: str) -> Optional[ConversationSession]:
+        """Return a live session, or None if it never existed or has expired."""
+        with self._lock:
+            self._expire(time.time())
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def create(
+        self,
+        scope: str,
+        vectorstore: Any,
+        model_name: str,
+        system_prompt: Optional[str] = None,
+    ) -> ConversationSession:
+        session = ConversationSession(scope, vectorstore, model_name, system_prompt)
+        with self._lock:
+            self._expire(time.time())
+            self._sessions[session.session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session
+
+    def drop(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "ttl_seconds": self.ttl_seconds,
+            }
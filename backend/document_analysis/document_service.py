@@ -4,32 +4,36 @@ from typing import Optional, Union, Dict, List, Any, Tuple
 from pathlib import Path
 import tempfile
 import re
-import unicodedata
-import time
-import uuid
 
 from langchain_community.llms import Ollama
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader
 from langchain.schema import Document
 from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
-from .config import OLLAMA_CONFIG, CHAT_HISTORY_ENABLED, MAX_CHAT_HISTORY_ITEMS
+from .config import (
+    OLLAMA_CONFIG,
+    CHAT_HISTORY_ENABLED,
+    MAX_CHAT_HISTORY_ITEMS,
+    CONVERSATION_RETRIEVAL_K,
+    DOCUMENT_SUMMARY_MAX_WORKERS,
+)
 from backend.model_management.global_model_config import global_model_config
 from backend.model_management.system_prompt_manager import system_prompt_manager
-
-def is_chinese(char: str) -> bool:
-    """Check if a character is Chinese."""
-    try:
-        return 'CJK' in unicodedata.name(char)
-    except ValueError:
-        return False
-
-def contains_chinese(text: str) -> bool:
-    """Check if text contains any Chinese characters."""
-    return any(is_chinese(char) for char in text)
+from backend.model_management.llm_invoker import llm_invoker
+from backend.model_management.llm_pool import llm_pool
+from backend.model_management.model_lifecycle import model_lifecycle
+from backend.model_management.admission import AdmissionRejected, Priority
+from .quiz_engine import QuizEngine, avoid_instructions
+from .quiz_parser import format_quiz
+from .chat_history_store import ChatHistoryStore
+from .ingestion import CachedEmbeddings, DocumentIngestor
+from .summary_cache import DocumentSummaryCache
+from .text_splitter import SpanTextSplitter, TextBuffer
+from utils.fan_out import fan_out
+from utils.document_parsers import document_parsers
+from utils.text_encoding import EncodingCache, read_text_file
+from utils.text_sanitizer import remove_chinese, sanitize_text
+from .conversation import ConversationManager, ConversationSession, SessionNotFound, QA_GUIDELINES
 
 def is_predominantly_vietnamese(text: str) -> bool:
     """For debugging: Always return True to bypass Vietnamese language check."""
@@ -39,13 +43,6 @@ def ensure_vietnamese_response(response: str) -> str:
     """For debugging: Bypass Vietnamese language enforcement and return input as-is."""
     return response
 
-def sanitize_text(text: str) -> str:
-    """Remove Chinese characters and clean up text."""
-    cleaned = ''.join(char for char in text if not is_chinese(char))
-    cleaned = re.sub(r'\s+', ' ', cleaned)
-    cleaned = re.sub(r'\n+', '\n', cleaned)
-    return cleaned.strip()
-
 def sanitize_quiz_content(content: str) -> str:
     """Sanitize quiz content and ensure proper formatting."""
     lines = content.split('\n')
@@ -56,8 +53,7 @@ def sanitize_quiz_content(content: str) -> str:
             sanitized_lines.append('')
             continue
             
-        cleaned_line = ''.join(char for char in line if not is_chinese(char))
-        cleaned_line = cleaned_line.strip()
+        cleaned_line = remove_chinese(line).strip()
         
         if not cleaned_line:
             continue
@@ -92,28 +88,40 @@ class DocumentAnalysisService:
         self.model_name = model_name
         self.temperature = temperature
         self.base_url = base_url
-        self.llm = self._initialize_model()
-        self.embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-        self.chat_histories = {}
+        self.embeddings = CachedEmbeddings(HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2"))
+        # Detected text encodings by document, so re-uploads skip detection
+        self.encodings = EncodingCache()
+        self.ingestor = DocumentIngestor(self._load_document, self.embeddings)
+        self.summary_cache = DocumentSummaryCache()
+        self.quiz_engine = QuizEngine(self.embeddings)
+        # Bounded in-memory history; the API persists its own history in the database
+        self.chat_history = ChatHistoryStore()
+        self.conversations = ConversationManager()
         
-    def _initialize_model(self) -> Ollama:
-        # Check if a global model is set, and use it if available and different from current
-        global_model = global_model_config.get_model()
-        if global_model and global_model != self.model_name:
-            self.model_name = global_model
-            logging.getLogger(__name__).info(f"Updating to globally configured model: {self.model_name}")
-            
-        return Ollama(
-            model=self.model_name,
+    def _get_llm(self, model_name: Optional[str] = None, temperature: Optional[float] = None) -> Ollama:
+        """
+        Get a pooled client for this request.
+        
+        The client is shared with other requests using the same model and options,
+        so it must not be mutated; ask for a different temperature instead.
+        """
+        model_name = model_name or self.get_current_model()
+        return llm_pool.get(
+            model_name,
+            temperature=self.temperature if temperature is None else temperature,
             base_url=self.base_url,
-            temperature=self.temperature
+            keep_alive=model_lifecycle.keep_alive_for(model_name),
         )
     
+    @property
+    def llm(self) -> Ollama:
+        """Client for the current default model."""
+        return self._get_llm()
+    
     def set_model(self, model_name: str) -> None:
-        """Change the model used for generation."""
+        """Change the default model used for requests that don't name one."""
         if model_name != self.model_name:
             self.model_name = model_name
-            self.llm = self._initialize_model()
             
             # Update the global model configuration
             global_model_config.set_model(model_name)
@@ -121,45 +129,43 @@ class DocumentAnalysisService:
             logging.getLogger(__name__).info(f"Changed model to {model_name} and updated global config")
     
     def get_current_model(self) -> str:
-        """Get the current model name."""
+        """Get the current default model name."""
         # Always check global config first
         global_model = global_model_config.get_model()
         if global_model and global_model != self.model_name:
-            # Update local model to match global model
-            self.set_model(global_model)
+            # Follow the global model without rebuilding clients
+            self.model_name = global_model
             
         return self.model_name
 
-    def _load_document(self, file_path: str, start_page: int = 0, end_page: int = -1) -> List[Any]:
-        # Check if it's a PDF file or text file based on extension
-        if file_path.endswith('.pdf'):
-            loader = PyPDFLoader(file_path)
-            pages = loader.load()
+    def _load_document(
+        self,
+        file_path: str,
+        start_page: int = 0,
+        end_page: int = -1,
+        document_id: Optional[str] = None,
+    ) -> List[Any]:
+        # PDF and DOCX go through the extraction backend registered for their type
+        file_type = os.path.splitext(file_path)[1].lstrip('.').lower()
+        if file_type in ('pdf', 'docx'):
+            with open(file_path, 'rb') as f:
+                texts = document_parsers.parse_pages(file_type, f.read())
+            pages = [
+                Document(page_content=text, metadata={"source": file_path, "page": page})
+                for page, text in enumerate(texts)
+            ]
             
             if end_page == -1:
                 end_page = len(pages)
             
             return pages[start_page:end_page]
         else:
-            # Handle text files
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-            except UnicodeDecodeError:
-                # Try different encodings
-                try:
-                    with open(file_path, 'r', encoding='utf-16') as f:
-                        content = f.read()
-                except UnicodeDecodeError:
-                    try:
-                        with open(file_path, 'r', encoding='cp1258') as f:  # Vietnamese encoding
-                            content = f.read()
-                    except UnicodeDecodeError:
-                        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-                            content = f.read()
+            # Handle text files: detect the encoding once (or reuse it) and decode in one pass
+            content, encoding = read_text_file(file_path, encoding=self.encodings.get(document_id))
+            self.encodings.set(document_id, encoding)
             
             # Create a Document object similar to PDF loader output
-            doc = Document(page_content=content, metadata={"source": file_path, "page": 0})
+            doc = Document(page_content=content, metadata={"source": file_path, "page": 0, "encoding": encoding})
             return [doc]
 
     def _generate_document_id(self, file_content: bytes) -> str:
@@ -170,7 +176,7 @@ class DocumentAnalysisService:
         if not CHAT_HISTORY_ENABLED:
             return []
             
-        return self.chat_histories.get(document_id, [])
+        return self.chat_history.get(document_id, limit=MAX_CHAT_HISTORY_ITEMS)
         
     def add_to_chat_history(
         self, 
@@ -181,20 +187,7 @@ class DocumentAnalysisService:
         if not CHAT_HISTORY_ENABLED:
             return
             
-        if document_id not in self.chat_histories:
-            self.chat_histories[document_id] = []
-            
-        chat_entry = {
-            "id": str(uuid.uuid4()),
-            "timestamp": time.time(),
-            "user_query": user_query,
-            "system_response": system_response
-        }
-        
-        self.chat_histories[document_id].append(chat_entry)
-        
-        if len(self.chat_histories[document_id]) > MAX_CHAT_HISTORY_ITEMS:
-            self.chat_histories[document_id] = self.chat_histories[document_id][-MAX_CHAT_HISTORY_ITEMS:]
+        self.chat_history.add(document_id, user_query, system_response)
     
     def analyze_document(
         self,
@@ -203,25 +196,27 @@ class DocumentAnalysisService:
         user_query: Optional[str] = None,
         start_page: int = 0,
         end_page: int = -1,
-        system_prompt: Optional[str] = None,    ) -> Dict[str, str]:
+        system_prompt: Optional[str] = None,
+        use_cache: bool = True,
+        refresh_cache: bool = False,
+        model_name: Optional[str] = None,
+    ) -> Dict[str, str]:
         document_id = self._generate_document_id(file_content)
+        llm = self._get_llm(model_name)
         
         # Detect file type by examining the first few bytes
-        if file_content.startswith(b'%PDF'):
-            file_extension = ".pdf"
-        else:
-            file_extension = ".txt"
+        file_extension = "." + document_parsers.detect(file_content)
         
         with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file:
             temp_file.write(file_content)
             temp_path = temp_file.name
 
         try:
-            pages = self._load_document(temp_path, start_page, end_page)
-            text_splitter = RecursiveCharacterTextSplitter()
-            texts = text_splitter.split_documents(pages)
+            pages = self._load_document(temp_path, start_page, end_page, document_id=document_id)
+            buffer = TextBuffer.from_pages(pages, doc_id=document_id)
             
-            combined_text = "\n\n".join([doc.page_content for doc in texts])
+            # The summary reads the whole text; chunks are only needed for retrieval
+            combined_text = buffer.text
             
             if query_type == "summary":
                 summary_template = """Analyze and summarize the following text. 
@@ -249,8 +244,12 @@ Summary:"""
                     template=summary_template
                 )
                 
-                chain = LLMChain(llm=self.llm, prompt=summary_prompt)
-                result = chain.invoke({"text": combined_text})["text"]
+                result = llm_invoker.invoke(
+                    llm,
+                    summary_prompt.format(text=combined_text),
+                    use_cache=use_cache,
+                    refresh_cache=refresh_cache,
+                )
                 
                 if user_query:
                     self.add_to_chat_history(document_id, user_query, result)
@@ -261,6 +260,7 @@ Summary:"""
                 if not user_query:
                     return {"result": "Please provide a question for Q&A mode."}
                 
+                texts = SpanTextSplitter().split_buffer(buffer).to_documents()
                 vectorstore = FAISS.from_documents(texts, self.embeddings)
                 relevant_docs = vectorstore.similarity_search(user_query, k=3)
                 
@@ -294,8 +294,13 @@ Answer:"""
                     template=qa_template
                 )
                 
-                chain = LLMChain(llm=self.llm, prompt=qa_prompt)
-                result = chain.invoke({"context": relevant_text, "question": user_query})["text"]
+                result = llm_invoker.invoke(
+                    llm,
+                    qa_prompt.format(context=relevant_text, question=user_query),
+                    use_cache=use_cache,
+                    refresh_cache=refresh_cache,
+                    priority=Priority.INTERACTIVE,
+                )
                 
                 self.add_to_chat_history(document_id, user_query, result)
                 
@@ -307,33 +312,141 @@ Answer:"""
         
         return {"result": "Analysis completed successfully"}
         
+    def _split_document(self, file_content: bytes, document_id: Optional[str] = None) -> List[Document]:
+        """Load an uploaded PDF or text file and split it into chunks."""
+        file_extension = "." + document_parsers.detect(file_content)
+        with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file:
+            temp_file.write(file_content)
+            temp_path = temp_file.name
+        
+        try:
+            pages = self._load_document(temp_path, document_id=document_id)
+            return SpanTextSplitter().split_pages(pages).to_documents()
+        finally:
+            os.unlink(temp_path)
+    
+    def chat(
+        self,
+        user_query: str,
+        session_id: Optional[str] = None,
+        file_content: Optional[bytes] = None,
+        document_id: Optional[str] = None,
+        system_prompt: Optional[str] = None,
+        model_name: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Answer a question as one turn of a conversation about a document.
+        
+        The first turn indexes the document and primes Ollama with instructions,
+        retrieved chunks and the question. Follow-up turns continue from the
+        token context Ollama returned, sending only the question and chunks the
+        conversation has not seen yet, so the server prefills just that text.
+        When the context grows too long, earlier turns are compacted into a
+        running summary and the next turn starts a fresh context.
+        
+        Args:
+            user_query: The question for this turn
+            session_id: Session returned by an earlier turn, if continuing
+            file_content: The document; required to start a session
+            document_id: ID to record the conversation under (defaults to a content hash)
+            system_prompt: Optional custom instructions
+            model_name: Model for this turn (a change restarts the model context)
+            
+        Returns:
+            Dictionary with the answer, session_id, document_id and conversation debug info
+            
+        Raises:
+            SessionNotFound: If the session is unknown or expired and no document was given
+        """
+        model_name = model_name or self.get_current_model()
+        llm = self._get_llm(model_name)
+        
+        session = self.conversations.get(session_id) if session_id else None
+        if file_content is not None:
+            scope = document_id or self._generate_document_id(file_content)
+            if session is None or session.scope != scope:
+                texts = self._split_document(file_content, document_id=scope)
+                vectorstore = FAISS.from_documents(texts, self.embeddings)
+                session = self.conversations.create(scope, vectorstore, model_name, system_prompt)
+                logging.getLogger(__name__).info(f"Started conversation {session.session_id} on {len(texts)} chunks")
+        elif session is None:
+            raise SessionNotFound(session_id)
+        
+        with session.lock:
+            if model_name != session.model_name or system_prompt != session.system_prompt:
+                # Context tokens belong to one model and one set of instructions
+                session.reset_context(model_name, system_prompt)
+            
+            continued = bool(session.context)
+            relevant_docs = session.vectorstore.similarity_search(user_query, k=CONVERSATION_RETRIEVAL_K)
+            new_chunks = session.new_chunks([doc.page_content for doc in relevant_docs])
+            
+            instructions = f"""You are answering questions about a document in an ongoing conversation.
+Answer each question based on the provided context.
+
+{QA_GUIDELINES}"""
+            if system_prompt:
+                instructions = system_prompt_manager.apply_system_prompt(instructions,
+                                                                         {"custom_instructions": system_prompt})
+            
+            prompt = session.build_prompt(user_query, new_chunks, instructions)
+            result, context = llm_invoker.generate_with_context(llm, prompt, session.context or None)
+            session.record_turn(user_query, result, new_chunks, context)
+            
+            compacted = False
+            if session.needs_compaction():
+                compacted = self._compact_conversation(session, llm)
+            debug = dict(session.describe(), continued=continued, retrieved_chunks=len(relevant_docs),
+                         new_chunks=len(new_chunks), prompt_chars=len(prompt), compacted=compacted)
+        
+        self.add_to_chat_history(session.scope, user_query, result)
+        
+        return {
+            "result": result,
+            "session_id": session.session_id,
+            "document_id": session.scope,
+            "debug": {"conversation": debug},
+        }
+    
+    def _compact_conversation(self, session: ConversationSession, llm: Ollama) -> bool:
+        """Fold older turns into the session's running summary; the answer already given is kept either way."""
+        try:
+            summary = llm_invoker.invoke(llm, session.summary_prompt(), use_cache=False, priority=Priority.BATCH)
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"Could not compact conversation {session.session_id}: {str(e)}")
+            # Start over from the recent turns rather than overflow the model context
+            session.reset_context(system_prompt=session.system_prompt)
+            return False
+        session.compact(summary)
+        return True
+    
     def generate_quiz(
         self,
         file_content: bytes,
         num_questions: int = 5,
         difficulty: str = "medium",
         system_prompt: Optional[str] = None,
+        use_cache: bool = True,
+        refresh_cache: bool = False,
+        model_name: Optional[str] = None,
     ) -> Dict[str, Any]:
         """Generate quiz questions from a single document using RAG."""
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
+        document_id = self._generate_document_id(file_content)
+        file_extension = "." + document_parsers.detect(file_content)
+        with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file:
             temp_file.write(file_content)
             temp_path = temp_file.name
 
         try:
             # Load the document
-            loader = PyPDFLoader(temp_path)
-            pages = loader.load()
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1000,
-                chunk_overlap=200
-            )
-            texts = text_splitter.split_documents(pages)
+            pages = self._load_document(temp_path, document_id=document_id)
+            spans = SpanTextSplitter(chunk_size=1000, chunk_overlap=200).split_pages(pages)
             
             # Create vector store for better retrieval
-            vectorstore = FAISS.from_documents(texts, self.embeddings)
+            vectorstore = FAISS.from_documents(spans.to_documents(), self.embeddings)
             
             # Get the overall content for global understanding
-            combined_text = "\n\n".join([doc.page_content for doc in texts[:5]])
+            combined_text = "\n\n".join(spans[:5].texts())
             
             # Create quiz prompt template
             quiz_template = """Generate exactly {num_questions} multiple-choice questions based on the document content provided below. 
@@ -373,14 +486,16 @@ Continue in this format until Câu {num_questions}."""
                 "What specific details should quizzes about this document focus on?"
             ]
             
+            # Retrieve more passages when the quiz is split across several shards
+            k = 2 * len(self.quiz_engine.plan_shards(num_questions))
             relevant_chunks = []
             for prompt in topic_prompts:
-                results = vectorstore.similarity_search(prompt, k=2)
+                results = vectorstore.similarity_search(prompt, k=min(k, len(spans)))
                 relevant_chunks.extend([doc.page_content for doc in results])
             
-            # Remove duplicates and join
-            relevant_chunks = list(set(relevant_chunks))
-            relevant_text = "\n\n---\n\n".join(relevant_chunks)
+            # Remove duplicates (keeping order so prompts stay cacheable), then add the
+            # remaining passages so later shards still have fresh material
+            passages = list(dict.fromkeys(relevant_chunks + list(spans.texts())))
             
             # If a custom system prompt is provided, use it
             if system_prompt:
@@ -396,18 +511,22 @@ Continue in this format until Câu {num_questions}."""
                 template=quiz_template
             )
             
-            self.llm.temperature = max(0.1, min(self.temperature, 0.7))
+            # Quizzes use a clamped temperature via a separate pooled client
+            llm = self._get_llm(model_name, temperature=max(0.1, min(self.temperature, 0.7)))
             
-            chain = LLMChain(llm=self.llm, prompt=quiz_prompt)
-            result = chain.invoke({
-                "text": combined_text[:5000],
-                "relevant_chunks": relevant_text[:10000],
-                "num_questions": num_questions,
-                "difficulty": difficulty
-            })["text"]
+            def build_prompt(count: int, passages_text: str, avoid: List[str]) -> str:
+                return quiz_prompt.format(
+                    text=combined_text[:5000],
+                    relevant_chunks=passages_text,
+                    num_questions=count,
+                    difficulty=difficulty,
+                ) + avoid_instructions(avoid)
             
-            sanitized_result = sanitize_quiz_content(result)
-            return {"result": sanitized_result}
+            generation = self.quiz_engine.generate(
+                llm, build_prompt, passages, num_questions,
+                use_cache=use_cache, refresh_cache=refresh_cache,
+            )
+            return self._quiz_result(generation)
         finally:
             os.unlink(temp_path)
     
@@ -418,38 +537,29 @@ Continue in this format until Câu {num_questions}."""
         num_questions: int = 5,
         difficulty: str = "medium",
         system_prompt: Optional[str] = None,
+        use_cache: bool = True,
+        refresh_cache: bool = False,
+        model_name: Optional[str] = None,
     ) -> Dict[str, Any]:
         """Generate a quiz from multiple documents using RAG."""
-        import tempfile, os
         all_chunks = []
         docs_overview = []
         
-        for content, filename in zip(file_contents, filenames):
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tf:
-                tf.write(content)
-                temp_path = tf.name
-                
-            try:
-                # Load the document
-                loader = PyPDFLoader(temp_path)
-                pages = loader.load()
-                splitter = RecursiveCharacterTextSplitter(
-                    chunk_size=1000,
-                    chunk_overlap=200
-                )
-                chunks = splitter.split_documents(pages)
-                
-                # Add document reference to each chunk for traceability
-                for chunk in chunks:
-                    chunk.metadata["source"] = filename
-                
-                all_chunks.extend(chunks)
-                
-                # Create a brief overview of this document for the prompt
-                doc_preview = "\n".join([doc.page_content for doc in chunks[:2]])
-                docs_overview.append(f"### Document: {filename}\n{doc_preview[:1000]}...")
-            finally:
-                os.unlink(temp_path)
+        # Parse, split and embed all files concurrently
+        for ingested in self.ingestor.ingest(file_contents, filenames, chunk_size=1000, chunk_overlap=200):
+            if ingested.error:
+                continue
+            filename, chunks = ingested.filename, ingested.chunks
+            
+            # Add document reference to each chunk for traceability
+            for chunk in chunks:
+                chunk.metadata["source"] = filename
+            
+            all_chunks.extend(chunks)
+            
+            # Create a brief overview of this document for the prompt
+            doc_preview = "\n".join([doc.page_content for doc in chunks[:2]])
+            docs_overview.append(f"### Document: {filename}\n{doc_preview[:1000]}...")
         
         # Create a vector store from all document chunks
         if not all_chunks:
@@ -497,16 +607,20 @@ Continue in this format until Câu {num_questions}."""
             "What specific details should quizzes about these documents focus on?"
         ]
         
+        # Retrieve more passages when the quiz is split across several shards
+        k = 3 * len(self.quiz_engine.plan_shards(num_questions))
         relevant_chunks = []
         for prompt in topic_prompts:
-            results = vectorstore.similarity_search(prompt, k=3)
+            results = vectorstore.similarity_search(prompt, k=min(k, len(all_chunks)))
             for doc in results:
                 source = doc.metadata.get("source", "unknown")
                 relevant_chunks.append(f"From {source}:\n{doc.page_content}")
         
-        # Remove duplicates and join
-        relevant_chunks = list(set(relevant_chunks))
-        relevant_text = "\n\n---\n\n".join(relevant_chunks)
+        # Remove duplicates (keeping order so prompts stay cacheable), then add the
+        # remaining passages so later shards still have fresh material
+        passages = list(dict.fromkeys(relevant_chunks + [
+            f"From {doc.metadata.get('source', 'unknown')}:\n{doc.page_content}" for doc in all_chunks
+        ]))
         
         # If a custom system prompt is provided, use it
         if system_prompt:
@@ -522,18 +636,41 @@ Continue in this format until Câu {num_questions}."""
             template=quiz_template
         )
         
-        self.llm.temperature = max(0.1, min(self.temperature, 0.7))
-        chain = LLMChain(llm=self.llm, prompt=quiz_prompt)
+        # Quizzes use a clamped temperature via a separate pooled client
+        llm = self._get_llm(model_name, temperature=max(0.1, min(self.temperature, 0.7)))
+        
+        def build_prompt(count: int, passages_text: str, avoid: List[str]) -> str:
+            return quiz_prompt.format(
+                all_docs_overview=all_docs_overview[:5000],
+                relevant_chunks=passages_text,
+                num_questions=count,
+                difficulty=difficulty,
+            ) + avoid_instructions(avoid)
         
-        result = chain.invoke({
-            "all_docs_overview": all_docs_overview[:5000], 
-            "relevant_chunks": relevant_text[:10000],
-            "num_questions": num_questions, 
-            "difficulty": difficulty
-        })["text"]
+        generation = self.quiz_engine.generate(
+            llm, build_prompt, passages, num_questions,
+            use_cache=use_cache, refresh_cache=refresh_cache,
+        )
+        return self._quiz_result(generation)
+    
+    def _quiz_result(self, generation: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the quiz response (structured questions plus rendered text) from a QuizEngine generation."""
+        questions = generation["questions"]
+        for question in questions:
+            question.question = sanitize_text(question.question)
+            question.options = {letter: sanitize_text(option) for letter, option in question.options.items()}
         
-        sanitized = sanitize_quiz_content(result)
-        return {"result": sanitized}
+        if questions:
+            text = format_quiz(questions)
+        else:
+            # Nothing matched the expected format; return the model output as before
+            logging.getLogger(__name__).warning("No quiz questions could be parsed, returning raw output")
+            text = sanitize_quiz_content("\n\n".join(generation["responses"]))
+        return {
+            "result": text,
+            "questions": [question.to_dict() for question in questions],
+            "debug": {"quiz": generation["details"]},
+        }
         
     def analyze_multiple_documents(
         self,
@@ -544,124 +681,103 @@ Continue in this format until Câu {num_questions}."""
         system_prompt: Optional[str] = None,
         start_page: int = 0,
         end_page: int = -1,
+        use_cache: bool = True,
+        refresh_cache: bool = False,
+        model_name: Optional[str] = None,
     ) -> Dict[str, Any]:
         import hashlib
-        import os
-        import tempfile
         
         combined_hash = hashlib.md5(b"".join(file_contents)).hexdigest()
         
         documents = []
-        temp_paths = []
         
-        try:
-            for i, (content, filename) in enumerate(zip(file_contents, filenames)):
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
-                    temp_file.write(content)
-                    temp_path = temp_file.name
-                    temp_paths.append(temp_path)
-                
-                try:
-                    doc_hash = hashlib.md5(content).hexdigest()[:10]
-                    doc_id = f"doc_{i+1}_{doc_hash}"
-                    
-                    pages = self._load_document(temp_path, start_page, end_page)
-                    
-                    if not pages:
-                        documents.append({
-                            "id": doc_id,
-                            "filename": filename,
-                            "status": "error",
-                            "error": "No content could be extracted",
-                            "content": ""
-                        })
-                        continue
-                    
-                    text_splitter = RecursiveCharacterTextSplitter()
-                    doc_chunks = text_splitter.split_documents(pages)
-                    
-                    for chunk in doc_chunks:
-                        chunk.metadata["doc_id"] = doc_id
-                        chunk.metadata["doc_index"] = i+1
-                        chunk.metadata["filename"] = filename
-                    
-                    doc_text = "\n\n".join([chunk.page_content for chunk in doc_chunks])
-                    
-                    documents.append({
-                        "id": doc_id,
-                        "filename": filename,
-                        "status": "processed",
-                        "chunks": doc_chunks,
-                        "content": doc_text,
-                        "page_count": len(pages)
-                    })
-                    
-                except Exception as e:
-                    documents.append({
-                        "id": f"doc_{i+1}",
-                        "filename": filename,
-                        "status": "error",
-                        "error": str(e),
-                        "content": ""
-                    })
+        # Parse, split and embed all files concurrently; failures stay in their own slot.
+        # Chunks are only embedded up front when a Q&A index will be built over them.
+        ingested_files = self.ingestor.ingest(
+            file_contents, filenames, start_page, end_page, embed=(query_type == "qa")
+        )
+        for i, (content, ingested) in enumerate(zip(file_contents, ingested_files)):
+            filename = ingested.filename
+            if ingested.error:
+                documents.append({
+                    "id": f"doc_{i+1}",
+                    "filename": filename,
+                    "status": "error",
+                    "error": ingested.error,
+                    "content": ""
+                })
+                continue
             
-            if query_type == "summary":
-                return self._generate_multi_document_summary(documents, combined_hash, system_prompt)
-            elif query_type == "qa":
-                if not user_query:
-                    return {"result": "Please provide a question for Q&A mode."}
-                return self._answer_question_from_documents(documents, user_query, combined_hash, system_prompt)
-            else:
-                raise ValueError(f"Unknown query type: {query_type}")
-                
-        finally:
-            for temp_path in temp_paths:
-                try:
-                    os.unlink(temp_path)
-                except:
-                    pass
+            doc_hash = hashlib.md5(content).hexdigest()[:10]
+            doc_id = f"doc_{i+1}_{doc_hash}"
+            
+            if not ingested.page_count:
+                documents.append({
+                    "id": doc_id,
+                    "filename": filename,
+                    "status": "error",
+                    "error": "No content could be extracted",
+                    "content": ""
+                })
+                continue
+            
+            doc_chunks = ingested.chunks
+            for chunk in doc_chunks:
+                chunk.metadata["doc_id"] = doc_id
+                chunk.metadata["doc_index"] = i+1
+                chunk.metadata["filename"] = filename
+            
+            doc_text = "\n\n".join([chunk.page_content for chunk in doc_chunks])
+            
+            documents.append({
+                "id": doc_id,
+                "filename": filename,
+                "status": "processed",
+                "chunks": doc_chunks,
+                "content": doc_text,
+                "page_count": ingested.page_count
+            })
+        
+        if query_type == "summary":
+            return self._generate_multi_document_summary(
+                documents, combined_hash, system_prompt,
+                use_cache=use_cache, refresh_cache=refresh_cache, model_name=model_name
+            )
+        elif query_type == "qa":
+            if not user_query:
+                return {"result": "Please provide a question for Q&A mode."}
+            return self._answer_question_from_documents(
+                documents, user_query, combined_hash, system_prompt,
+                use_cache=use_cache, refresh_cache=refresh_cache, model_name=model_name
+            )
+        else:
+            raise ValueError(f"Unknown query type: {query_type}")
     
-    def _generate_multi_document_summary(self, documents: List[Dict[str, Any]], combined_hash: str, system_prompt: Optional[str] = None) -> Dict[str, Any]:
+    def _generate_multi_document_summary(
+        self,
+        documents: List[Dict[str, Any]],
+        combined_hash: str,
+        system_prompt: Optional[str] = None,
+        use_cache: bool = True,
+        refresh_cache: bool = False,
+        model_name: Optional[str] = None,
+    ) -> Dict[str, Any]:
         valid_docs = [doc for doc in documents if doc["status"] == "processed"]
         if not valid_docs:
             return {"result": "No content could be extracted from any document."}
         
+        llm = self._get_llm(model_name)
+        summaries, details = self._summarize_documents(
+            valid_docs, llm, system_prompt, use_cache=use_cache, refresh_cache=refresh_cache
+        )
+        
         if len(valid_docs) == 1:
-            doc = valid_docs[0]
-            summary_template = """Analyze and summarize the following text. 
-Focus on key points and main ideas.
-
-Text to analyze:
-{text}
-
-Requirements:
-1. Provide a comprehensive summary
-2. Highlight key points and important findings
-3. Use clear and professional language
-4. Structure the summary with bullet points when appropriate
-5. Include important details but avoid unnecessary information
-
-Summary:"""
-            
-            # If a custom system prompt is provided, use it
-            if system_prompt:
-                summary_template = system_prompt_manager.apply_system_prompt(summary_template, 
-                                                                           {"custom_instructions": system_prompt})
-            
-            prompt = PromptTemplate(
-                input_variables=["text"],
-                template=summary_template
-            )
-            
-            chain = LLMChain(llm=self.llm, prompt=prompt)
-            result = chain.invoke({"text": doc["content"]})["text"]
-            
-            return {"result": result, "document_id": combined_hash}
+            return {"result": summaries[0], "document_id": combined_hash, "debug": {"summaries": details}}
         
-        multi_doc_template = """Analyze and summarize multiple documents.
-Each document is provided with its own identifier for citation.
+        multi_doc_template = """Combine the summaries of multiple documents into one analysis.
+Each document summary is provided with its own identifier for citation.
 
-Documents:
+Document summaries:
 {documents}
 
 Requirements:
@@ -679,10 +795,9 @@ Summary:"""
                                                                          {"custom_instructions": system_prompt})
         
         document_texts = []
-        for doc in valid_docs:
+        for doc, summary in zip(valid_docs, summaries):
             file_info = f"[{doc['id']}] {doc['filename']}"
-            doc_preview = doc["content"][:1000] + "..." if len(doc["content"]) > 1000 else doc["content"]
-            document_texts.append(f"{file_info}\n\n{doc_preview}\n\n---")
+            document_texts.append(f"{file_info}\n\n{summary}\n\n---")
         
         formatted_docs = "\n\n".join(document_texts)
         
@@ -691,21 +806,118 @@ Summary:"""
             template=multi_doc_template
         )
         
-        chain = LLMChain(llm=self.llm, prompt=prompt)
-        result = chain.invoke({"documents": formatted_docs})["text"]
+        result = llm_invoker.invoke(
+            llm,
+            prompt.format(documents=formatted_docs),
+            use_cache=use_cache,
+            refresh_cache=refresh_cache,
+        )
         
         return {
             "result": result, 
             "document_id": combined_hash,
             "document_count": len(valid_docs),
-            "documents": [{"id": doc["id"], "filename": doc["filename"]} for doc in valid_docs]
+            "documents": [{"id": doc["id"], "filename": doc["filename"]} for doc in valid_docs],
+            "debug": {"summaries": details}
+        }
+    
+    def _summarize_documents(
+        self,
+        documents: List[Dict[str, Any]],
+        llm: Ollama,
+        system_prompt: Optional[str] = None,
+        use_cache: bool = True,
+        refresh_cache: bool = False,
+    ) -> Tuple[List[str], Dict[str, int]]:
+        """
+        Summarize each document on its own, reusing summaries cached from earlier requests.
+        
+        Missing summaries are generated concurrently. A document whose summary fails
+        is represented by the start of its text instead, unless every summary failed.
+        
+        Returns:
+            Tuple of (summary per document in input order, cached/generated/failed counts)
+        """
+        summary_template = """Analyze and summarize the following text. 
+Focus on key points and main ideas.
+
+Text to analyze:
+{text}
+
+Requirements:
+1. Provide a comprehensive summary
+2. Highlight key points and important findings
+3. Use clear and professional language
+4. Structure the summary with bullet points when appropriate
+5. Include important details but avoid unnecessary information
+
+Summary:"""
+        
+        # If a custom system prompt is provided, use it
+        if system_prompt:
+            summary_template = system_prompt_manager.apply_system_prompt(summary_template, 
+                                                                       {"custom_instructions": system_prompt})
+        
+        prompt = PromptTemplate(
+            input_variables=["text"],
+            template=summary_template
+        )
+        
+        keys = [self.summary_cache.make_key(doc["content"], llm.model, system_prompt) for doc in documents]
+        summaries: List[Optional[str]] = [None] * len(documents)
+        if use_cache and not refresh_cache:
+            summaries = [self.summary_cache.get(key) for key in keys]
+        missing = [index for index, summary in enumerate(summaries) if summary is None]
+        
+        def summarize(index: int) -> str:
+            return llm_invoker.invoke(
+                llm,
+                prompt.format(text=documents[index]["content"]),
+                use_cache=use_cache,
+                refresh_cache=refresh_cache,
+            )
+        
+        failed = 0
+        for index, result in zip(missing, fan_out(summarize, missing, max_workers=DOCUMENT_SUMMARY_MAX_WORKERS)):
+            if isinstance(result, AdmissionRejected):
+                raise result
+            if isinstance(result, Exception):
+                logging.getLogger(__name__).warning(
+                    f"Could not summarize {documents[index]['filename']}: {str(result)}"
+                )
+                failed += 1
+                if failed == len(documents):
+                    # Nothing to combine
+                    raise result
+                content = documents[index]["content"]
+                summaries[index] = content[:1000] + "..." if len(content) > 1000 else content
+                continue
+            summaries[index] = result
+            if use_cache or refresh_cache:
+                self.summary_cache.set(keys[index], result)
+        
+        return summaries, {
+            "cached": len(documents) - len(missing),
+            "generated": len(missing) - failed,
+            "failed": failed,
         }
     
-    def _answer_question_from_documents(self, documents: List[Dict[str, Any]], user_query: str, combined_hash: str, system_prompt: Optional[str] = None) -> Dict[str, Any]:
+    def _answer_question_from_documents(
+        self,
+        documents: List[Dict[str, Any]],
+        user_query: str,
+        combined_hash: str,
+        system_prompt: Optional[str] = None,
+        use_cache: bool = True,
+        refresh_cache: bool = False,
+        model_name: Optional[str] = None,
+    ) -> Dict[str, Any]:
         valid_docs = [doc for doc in documents if doc["status"] == "processed"]
         if not valid_docs:
             return {"result": "No content could be extracted from any document."}
         
+        llm = self._get_llm(model_name)
+        
         all_chunks = []
         for doc in valid_docs:
             all_chunks.extend(doc["chunks"])
@@ -743,8 +955,13 @@ Answer:"""
                 template=qa_template
             )
             
-            chain = LLMChain(llm=self.llm, prompt=prompt)
-            result = chain.invoke({"context": relevant_text, "question": user_query})["text"]
+            result = llm_invoker.invoke(
+                llm,
+                prompt.format(context=relevant_text, question=user_query),
+                use_cache=use_cache,
+                refresh_cache=refresh_cache,
+                priority=Priority.INTERACTIVE,
+            )
             
             self.add_to_chat_history(combined_hash, user_query, result)
             
@@ -787,8 +1004,13 @@ Answer:"""
             template=multi_doc_qa_template
         )
         
-        chain = LLMChain(llm=self.llm, prompt=prompt)
-        result = chain.invoke({"context": relevant_text, "question": user_query})["text"]
+        result = llm_invoker.invoke(
+            llm,
+            prompt.format(context=relevant_text, question=user_query),
+            use_cache=use_cache,
+            refresh_cache=refresh_cache,
+            priority=Priority.INTERACTIVE,
+        )
         
         self.add_to_chat_history(combined_hash, user_query, result)
         
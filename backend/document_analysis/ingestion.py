@@ -0,0 +1,202 @@
+"""Concurrent parsing, splitting and embedding of uploaded files, backed by shared caches."""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional, Tuple
+
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+
+from .config import (
+    INGESTION_MAX_WORKERS,
+    PARSE_CACHE_MAX_ENTRIES,
+    EMBEDDING_CACHE_MAX_ENTRIES,
+)
+from .text_splitter import ChunkSpans, SpanTextSplitter
+from utils.cache_versions import EXTRACTOR, SPLITTER, cache_versions
+from utils.document_parsers import document_parsers
+from utils.fan_out import fan_out
+
+logger = logging.getLogger(__name__)
+
+# load_pages(path, start_page, end_page, document_id=...) -> pages
+PageLoader = Callable[..., List[Document]]
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that remembers the vector of every text it embedded.
+
+    Vectors are stored as float32 arrays in an LRU of max_entries texts, so
+    re-uploaded documents and chunks shared between requests are embedded once.
+    """
+
+    def __init__(self, embeddings: Embeddings, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self._vectors: "OrderedDict[str, array]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        with self._lock:
+            for index, key in enumerate(keys):
+                vector = self._vectors.get(key)
+                if vector is not None:
+                    self._vectors.move_to_end(key)
+                    vectors[index] = vector.tolist()
+        missing = [index for index, vector in enumerate(vectors) if vector is None]
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            # Embed each distinct missing text once
+            unique = list(dict.fromkeys(keys[index] for index in missing))
+            first_text = {keys[index]: texts[index] for index in reversed(missing)}
+            computed = self.embeddings.embed_documents([first_text[key] for key in unique])
+            by_key = dict(zip(unique, computed))
+            with self._lock:
+                for key, vector in by_key.items():
+                    self._vectors[key] = array("f", vector)
+                    self._vectors.move_to_end(key)
+                while len(self._vectors) > self.max_entries:
+                    self._vectors.popitem(last=False)
+            for index in missing:
+                vectors[index] = list(by_key[keys[index]])
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._vectors), "hits": self.hits, "misses": self.misses}
+
+@dataclass
+class IngestedFile:
+    """Outcome of ingesting one uploaded file."""
+    filename: str
+    chunks: List[Document] = field(default_factory=list)
+    page_count: int = 0
+    error: Optional[str] = None
+
+class DocumentIngestor:
+    """
+    Turns the files of a request into chunks concurrently.
+
+    Each file is parsed, split and (optionally) embedded on its own worker,
+    up to max_workers at a time. Parsed chunks are cached by content, page
+    range and splitter settings, and chunk vectors go through the shared
+    CachedEmbeddings, so a later FAISS index over the chunks only looks the
+    vectors up. A file that fails is reported in its slot without affecting
+    the others, and results keep the order of the request.
+    """
+
+    def __init__(
+        self,
+        load_pages: PageLoader,
+        embeddings: Optional[CachedEmbeddings] = None,
+        max_workers: int = INGESTION_MAX_WORKERS,
+        max_cached_files: int = PARSE_CACHE_MAX_ENTRIES,
+    ):
+        self.load_pages = load_pages
+        self.embeddings = embeddings
+        self.max_workers = max_workers
+        self.max_cached_files = max_cached_files
+        self._parsed: "OrderedDict[Tuple[Any, ...], Tuple[ChunkSpans, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _parse(
+        self,
+        content: bytes,
+        start_page: int,
+        end_page: int,
+        chunk_size: Optional[int],
+        chunk_overlap: Optional[int],
+    ) -> Tuple[List[Document], int]:
+        # Same content ID the service uses, so per-document state such as the text encoding is shared
+        document_id = hashlib.md5(content).hexdigest()
+        key = (document_id, start_page, end_page, chunk_size, chunk_overlap,
+               cache_versions.token(EXTRACTOR, SPLITTER))
+        with self._lock:
+            cached = self._parsed.get(key)
+            if cached is not None:
+                self._parsed.move_to_end(key)
+        if cached is None:
+            suffix = "." + document_parsers.detect(content)
+            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+                temp_file.write(content)
+                temp_path = temp_file.name
+            try:
+                pages = self.load_pages(temp_path, start_page, end_page, document_id=document_id)
+            finally:
+                os.unlink(temp_path)
+
+            splitter_options = {}
+            if chunk_size is not None:
+                splitter_options["chunk_size"] = chunk_size
+            if chunk_overlap is not None:
+                splitter_options["chunk_overlap"] = chunk_overlap
+            # Cached as offsets into one text buffer rather than per-chunk strings
+            cached = (SpanTextSplitter(**splitter_options).split_pages(pages), len(pages))
+            with self._lock:
+                self._parsed[key] = cached
+                while len(self._parsed) > self.max_cached_files:
+                    self._parsed.popitem(last=False)
+
+        spans, page_count = cached
+        # Callers tag chunk metadata per request, so every call materializes fresh Documents
+        return spans.to_documents(), page_count
+
+    def ingest(
+        self,
+        file_contents: List[bytes],
+        filenames: List[str],
+        start_page: int = 0,
+        end_page: int = -1,
+        chunk_size: Optional[int] = None,
+        chunk_overlap: Optional[int] = None,
+        embed: bool = True,
+    ) -> List[IngestedFile]:
+        """
+        Parse and split every file concurrently.
+
+        Args:
+            file_contents: Raw bytes of each file
+            filenames: Name of each file, in the same order
+            start_page: The page to start from (0-based)
+            end_page: The page to end at (-1 for all pages)
+            chunk_size: Splitter chunk size (splitter default when None)
+            chunk_overlap: Splitter chunk overlap (splitter default when None)
+            embed: Whether to embed the chunks into the shared embedding cache
+
+        Returns:
+            One IngestedFile per input, in input order
+        """
+        def ingest_one(index: int) -> IngestedFile:
+            chunks, page_count = self._parse(file_contents[index], start_page, end_page, chunk_size, chunk_overlap)
+            if embed and self.embeddings is not None and chunks:
+                self.embeddings.embed_documents([chunk.page_content for chunk in chunks])
+            return IngestedFile(filenames[index], chunks, page_count)
+
+        results = fan_out(ingest_one, list(range(len(file_contents))), max_workers=self.max_workers)
+        ingested = []
+        for filename, result in zip(filenames, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Could not ingest {filename}: {str(result)}")
+                ingested.append(IngestedFile(filename, error=str(result)))
+            else:
+                ingested.append(result)
+        return ingested
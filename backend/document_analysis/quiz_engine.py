@@ -0,0 +1,223 @@
+"""Sharded quiz generation: parallel LLM calls, near-duplicate removal and top-up."""
+import logging
+import math
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+from langchain_community.llms import Ollama
+
+from .config import (
+    QUIZ_QUESTIONS_PER_SHARD,
+    QUIZ_MAX_WORKERS,
+    QUIZ_SHARD_CONTEXT_CHARS,
+    QUIZ_DEDUP_THRESHOLD,
+    QUIZ_TOP_UP_ROUNDS,
+)
+from .quiz_parser import QuizQuestion, parse_quiz
+from backend.model_management.admission import AdmissionRejected, Priority
+from backend.model_management.llm_invoker import LLMInvoker, llm_invoker
+from utils.fan_out import fan_out
+
+logger = logging.getLogger(__name__)
+
+# Questions listed in a top-up prompt so the model avoids repeating them
+MAX_AVOID_QUESTIONS = 30
+
+# build_prompt(question_count, passages_text, questions_to_avoid) -> final prompt
+PromptBuilder = Callable[[int, str, List[str]], str]
+
+def avoid_instructions(avoid: List[str]) -> str:
+    """Prompt suffix listing existing questions a top-up shard must not repeat."""
+    if not avoid:
+        return ""
+    listed = "\n".join(f"- {question}" for question in avoid)
+    return f"\n\nDo not repeat or rephrase any of these existing questions:\n{listed}"
+
+class QuizEngine:
+    """
+    Generates a quiz as several smaller concurrent generations.
+
+    The requested count is split into shards of at most questions_per_shard;
+    each shard gets a different round-robin subset of the retrieved passages so
+    the shards cover different parts of the material. Shard outputs are parsed,
+    near-duplicates (by question embedding similarity) are removed, and further
+    shards top the quiz up until it has the requested number of questions.
+    """
+
+    def __init__(
+        self,
+        embeddings: Any,
+        invoker: LLMInvoker = llm_invoker,
+        questions_per_shard: int = QUIZ_QUESTIONS_PER_SHARD,
+        max_workers: int = QUIZ_MAX_WORKERS,
+        shard_context_chars: int = QUIZ_SHARD_CONTEXT_CHARS,
+        dedup_threshold: float = QUIZ_DEDUP_THRESHOLD,
+        top_up_rounds: int = QUIZ_TOP_UP_ROUNDS,
+    ):
+        self.embeddings = embeddings
+        self.invoker = invoker
+        self.questions_per_shard = max(1, questions_per_shard)
+        self.max_workers = max_workers
+        self.shard_context_chars = shard_context_chars
+        self.dedup_threshold = dedup_threshold
+        self.top_up_rounds = top_up_rounds
+
+    def plan_shards(self, num_questions: int) -> List[int]:
+        """Split a question count into near-equal shard sizes."""
+        shards = max(1, math.ceil(num_questions / self.questions_per_shard))
+        base, extra = divmod(num_questions, shards)
+        return [base + (1 if i < extra else 0) for i in range(shards)]
+
+    def _passage_subsets(self, passages: List[str], shards: int, offset: int = 0) -> List[List[str]]:
+        """Deal passages round-robin into one subset per shard, within the char budget."""
+        subsets: List[List[str]] = [[] for _ in range(shards)]
+        sizes = [0] * shards
+        for index, passage in enumerate(passages):
+            shard = (index + offset) % shards
+            if sizes[shard] + len(passage) > self.shard_context_chars and subsets[shard]:
+                continue
+            subsets[shard].append(passage)
+            sizes[shard] += len(passage)
+        return subsets
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def deduplicate(
+        self,
+        kept: List[QuizQuestion],
+        candidates: List[QuizQuestion],
+    ) -> Tuple[List[QuizQuestion], int]:
+        """
+        Add candidates that are not near-duplicates of kept questions or each other.
+
+        Returns:
+            Tuple of (kept questions including accepted candidates, number dropped)
+        """
+        if not candidates:
+            return kept, 0
+
+        vectors = self._embed([question.question for question in kept + candidates])
+        kept_vectors = list(vectors[:len(kept)])
+        result = list(kept)
+        dropped = 0
+        for question, vector in zip(candidates, vectors[len(kept):]):
+            if kept_vectors and float(np.max(np.stack(kept_vectors) @ vector)) >= self.dedup_threshold:
+                dropped += 1
+                continue
+            result.append(question)
+            kept_vectors.append(vector)
+        return result, dropped
+
+    def _attach_sources(self, questions: List[QuizQuestion], passages: List[str]) -> None:
+        """Set each question's source to the shard passage most similar to it and its answer."""
+        if not questions or not passages:
+            return
+        texts = [
+            f"{question.question} {question.options.get(question.answer, '')}" for question in questions
+        ]
+        vectors = self._embed(texts + passages)
+        question_vectors, passage_vectors = vectors[:len(texts)], vectors[len(texts):]
+        best = np.argmax(question_vectors @ passage_vectors.T, axis=1)
+        for question, index in zip(questions, best):
+            question.source = passages[int(index)]
+
+    def _run_shards(
+        self,
+        llm: Ollama,
+        build_prompt: PromptBuilder,
+        sizes: List[int],
+        contexts: List[List[str]],
+        avoid: List[str],
+        use_cache: bool,
+        refresh_cache: bool,
+    ) -> Tuple[List[QuizQuestion], List[str]]:
+        def run(shard: int) -> str:
+            passages_text = "\n\n---\n\n".join(contexts[shard])[:self.shard_context_chars]
+            prompt = build_prompt(sizes[shard], passages_text, avoid)
+            return self.invoker.invoke(
+                llm, prompt, use_cache=use_cache, refresh_cache=refresh_cache, priority=Priority.BATCH,
+                validate=lambda text: bool(parse_quiz(text))
+            )
+
+        questions: List[QuizQuestion] = []
+        responses: List[str] = []
+        for shard, result in enumerate(fan_out(run, list(range(len(sizes))), max_workers=self.max_workers)):
+            if isinstance(result, AdmissionRejected):
+                raise result
+            if isinstance(result, Exception):
+                logger.warning(f"Quiz shard {shard + 1}/{len(sizes)} failed: {str(result)}")
+                continue
+            responses.append(result)
+            parsed = parse_quiz(result)
+            if len(parsed) < sizes[shard]:
+                logger.info(f"Quiz shard {shard + 1} returned {len(parsed)}/{sizes[shard]} questions")
+            # A shard may over-produce; keep what was asked of it
+            parsed = parsed[:sizes[shard]]
+            self._attach_sources(parsed, contexts[shard])
+            questions.extend(parsed)
+        return questions, responses
+
+    def generate(
+        self,
+        llm: Ollama,
+        build_prompt: PromptBuilder,
+        passages: List[str],
+        num_questions: int,
+        use_cache: bool = True,
+        refresh_cache: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Generate exactly num_questions questions where the model allows.
+
+        Args:
+            llm: Client to generate with
+            build_prompt: Renders the final prompt for a shard
+            passages: Document passages, most relevant first
+            num_questions: Number of questions requested
+            use_cache: Whether to reuse cached shard responses
+            refresh_cache: Whether to ignore cached shard responses and store new ones
+
+        Returns:
+            Dictionary with the questions, raw shard responses and generation details
+        """
+        sizes = self.plan_shards(num_questions)
+        contexts = self._passage_subsets(passages, len(sizes))
+        candidates, responses = self._run_shards(
+            llm, build_prompt, sizes, contexts, [], use_cache, refresh_cache
+        )
+        questions, duplicates = self.deduplicate([], candidates)
+
+        rounds = 0
+        while len(questions) < num_questions and rounds < self.top_up_rounds:
+            rounds += 1
+            missing = num_questions - len(questions)
+            top_up_sizes = self.plan_shards(missing)
+            logger.info(f"Topping up quiz with {missing} questions (round {rounds})")
+            # Rotate passages so top-up shards see different material than before
+            top_up_contexts = self._passage_subsets(passages, len(top_up_sizes), offset=rounds)
+            avoid = [question.question for question in questions][-MAX_AVOID_QUESTIONS:]
+            extra, extra_responses = self._run_shards(
+                llm, build_prompt, top_up_sizes, top_up_contexts, avoid, use_cache, refresh_cache
+            )
+            responses.extend(extra_responses)
+            questions, dropped = self.deduplicate(questions, extra)
+            duplicates += dropped
+
+        if len(questions) < num_questions:
+            logger.warning(f"Quiz has {len(questions)}/{num_questions} questions after {rounds} top-up rounds")
+
+        return {
+            "questions": questions[:num_questions],
+            "responses": responses,
+            "details": {
+                "shards": len(sizes),
+                "top_up_rounds": rounds,
+                "duplicates_removed": duplicates,
+                "questions_generated": min(len(questions), num_questions),
+                "questions_requested": num_questions,
+            },
+        }
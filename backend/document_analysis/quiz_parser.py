@@ -0,0 +1,91 @@
+"""Single-pass parser for multiple-choice quizzes in the "Câu n: / A. / Đáp án đúng:" format."""
+import re
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+OPTION_LETTERS = ("A", "B", "C", "D")
+
+_QUESTION = re.compile(r"^(?:Câu|Question)\s*(\d+)\s*[:.)]\s*(.*)$", re.IGNORECASE)
+_OPTION = re.compile(r"^([A-D])\s*[.)]\s*(.+)$")
+_ANSWER = re.compile(r"^(?:Đáp án đúng|Đáp án|Correct answer|Answer)\s*:\s*\(?([A-D])\b", re.IGNORECASE)
+
+@dataclass
+class QuizQuestion:
+    """A multiple-choice question with lettered options, the correct letter and its source passage."""
+    question: str
+    options: Dict[str, str] = field(default_factory=dict)
+    answer: Optional[str] = None
+    source: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable form used by the API and the quizzes table."""
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "QuizQuestion":
+        return cls(
+            question=data.get("question", ""),
+            options=dict(data.get("options") or {}),
+            answer=data.get("answer"),
+            source=data.get("source"),
+        )
+
+    def is_valid(self) -> bool:
+        """A usable question has text, every option and an answer among them."""
+        return bool(self.question) and all(self.options.get(letter) for letter in OPTION_LETTERS) \
+            and self.answer in self.options
+
+def _clean_line(line: str) -> str:
+    # Models often bold the labels ("**Câu 1:**") or indent the options
+    return line.replace("**", "").replace("__", "").strip()
+
+def parse_quiz(text: str) -> List[QuizQuestion]:
+    """
+    Parse quiz text into questions in one pass over its lines.
+
+    Lines that continue a question before its first option are appended to the
+    question text. Incomplete questions (missing options or answer) are dropped.
+    """
+    questions: List[QuizQuestion] = []
+    current: Optional[QuizQuestion] = None
+
+    for raw_line in text.splitlines():
+        line = _clean_line(raw_line)
+        if not line:
+            continue
+
+        match = _QUESTION.match(line)
+        if match:
+            if current is not None:
+                questions.append(current)
+            current = QuizQuestion(question=match.group(2).strip())
+            continue
+        if current is None:
+            continue
+
+        match = _OPTION.match(line)
+        if match:
+            current.options[match.group(1).upper()] = match.group(2).strip()
+            continue
+
+        match = _ANSWER.match(line)
+        if match:
+            current.answer = match.group(1).upper()
+            continue
+
+        if not current.options:
+            current.question = f"{current.question} {line}".strip()
+
+    if current is not None:
+        questions.append(current)
+    return [question for question in questions if question.is_valid()]
+
+def format_quiz(questions: List[QuizQuestion]) -> str:
+    """Render questions back to the numbered quiz text format."""
+    blocks = []
+    for number, question in enumerate(questions, start=1):
+        lines = [f"Câu {number}: {question.question}"]
+        lines.extend(f"{letter}. {question.options[letter]}" for letter in OPTION_LETTERS if letter in question.options)
+        lines.append(f"Đáp án đúng: {question.answer}")
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
@@ -0,0 +1,234 @@
+"""Semantic answer cache for repeated Q&A questions about the same documents."""
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .config import (
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_MAX_ENTRIES_PER_SCOPE,
+    SEMANTIC_CACHE_MAX_SCOPES,
+    SEMANTIC_CACHE_SEED_LIMIT,
+)
+from backend.model_management.metrics import get_metrics
+from utils.cache_versions import MODEL, SYSTEM_PROMPT, cache_versions, document_dependency
+
+logger = logging.getLogger(__name__)
+
+class _ScopeEntries:
+    """Question embeddings and answers for one (document set, model) scope."""
+
+    def __init__(self, dimension: int):
+        self.vectors = np.empty((0, dimension), dtype=np.float32)
+        self.entries: List[Dict[str, Any]] = []
+
+    def add(self, vector: np.ndarray, entry: Dict[str, Any], max_entries: int) -> None:
+        self.vectors = np.vstack([self.vectors, vector[np.newaxis, :]])
+        self.entries.append(entry)
+        if len(self.entries) > max_entries:
+            self.vectors = self.vectors[-max_entries:]
+            self.entries = self.entries[-max_entries:]
+
+    def best_match(self, vector: np.ndarray) -> Tuple[int, float]:
+        similarities = self.vectors @ vector
+        index = int(np.argmax(similarities))
+        return index, float(similarities[index])
+
+class SemanticAnswerCache:
+    """
+    Returns a stored answer when a new question is close enough to one already answered.
+
+    Scopes are keyed by the database document ID (or multi-document ID) and model
+    name, so answers are only reused for the same document set and model. A scope is
+    seeded lazily from ChatHistoryRepository the first time it is queried, from answers
+    given under the current default system prompt. Scope keys also carry the document,
+    model and system prompt generations, so deleting the document or changing the
+    defaults starts over with a new scope.
+    """
+
+    def __init__(
+        self,
+        embeddings: Any,
+        chat_history_repo: Optional[Any] = None,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        max_entries_per_scope: int = SEMANTIC_CACHE_MAX_ENTRIES_PER_SCOPE,
+        max_scopes: int = SEMANTIC_CACHE_MAX_SCOPES,
+        seed_limit: int = SEMANTIC_CACHE_SEED_LIMIT,
+        enabled: bool = SEMANTIC_CACHE_ENABLED,
+    ):
+        self.embeddings = embeddings
+        self.chat_history_repo = chat_history_repo
+        self.threshold = threshold
+        self.max_entries_per_scope = max_entries_per_scope
+        self.max_scopes = max_scopes
+        self.seed_limit = seed_limit
+        self.enabled = enabled
+        self._scopes: "OrderedDict[Tuple[str, str, str], _ScopeEntries]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _load_scope(self, document_key: str, model_name: str) -> Optional[_ScopeEntries]:
+        """Build a scope from previously stored Q&A answers for this document and model."""
+        if self.chat_history_repo is None:
+            return None
+
+        try:
+            history = self.chat_history_repo.get_chat_history_by_document(
+                document_key, limit=self.seed_limit
+            )
+        except Exception as e:
+            logger.warning(f"Could not seed semantic cache for {document_key}: {e}")
+            return None
+
+        system_prompt_version = cache_versions.static_version(SYSTEM_PROMPT)
+        prior = [
+            entry for entry in history
+            if entry.get("system_response")
+            and (entry.get("meta") or {}).get("query_type") == "qa"
+            and (entry.get("meta") or {}).get("model") == model_name
+            and not (entry.get("meta") or {}).get("system_prompt_override")
+            and (entry.get("meta") or {}).get("system_prompt_version") == system_prompt_version
+        ]
+        if not prior:
+            return None
+
+        vectors = self._embed([entry["user_query"] for entry in prior])
+        scope = _ScopeEntries(vectors.shape[1])
+        for vector, entry in zip(vectors, prior):
+            scope.add(vector, {
+                "question": entry["user_query"],
+                "answer": entry["system_response"],
+                "chat_id": entry.get("id"),
+            }, self.max_entries_per_scope)
+        logger.debug(f"Seeded semantic cache for {document_key} with {len(prior)} prior answers")
+        return scope
+
+    @staticmethod
+    def _scope_key(document_key: str, model_name: str) -> Tuple[str, str, str]:
+        """Scope of a document set and model; bumping any folded generation starts a new, empty scope."""
+        versions = cache_versions.token(document_dependency(document_key), MODEL, SYSTEM_PROMPT)
+        return (document_key, model_name, versions)
+
+    def _get_scope(self, document_key: str, model_name: str) -> Optional[_ScopeEntries]:
+        scope_key = self._scope_key(document_key, model_name)
+        with self._lock:
+            scope = self._scopes.get(scope_key)
+            if scope is not None:
+                self._scopes.move_to_end(scope_key)
+                return scope
+
+        scope = self._load_scope(document_key, model_name)
+        if scope is not None:
+            self._put_scope(scope_key, scope)
+        return scope
+
+    def _put_scope(self, scope_key: Tuple[str, str, str], scope: _ScopeEntries) -> _ScopeEntries:
+        with self._lock:
+            existing = self._scopes.get(scope_key)
+            if existing is not None:
+                return existing
+            self._scopes[scope_key] = scope
+            while len(self._scopes) > self.max_scopes:
+                self._scopes.popitem(last=False)
+            return scope
+
+    def _record(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+
+        metrics = get_metrics()
+        if metrics is not None:
+            if hit:
+                metrics.record_cache_hit("semantic", "qa")
+            else:
+                metrics.record_cache_miss("semantic", "qa")
+
+    def lookup(self, document_key: str, model_name: str, user_query: str) -> Optional[Dict[str, Any]]:
+        """
+        Find a stored answer for a semantically equivalent question.
+
+        Returns:
+            Dictionary with answer, matched question, similarity and chat_id, or None
+        """
+        if not self.enabled or not user_query.strip():
+            return None
+
+        scope = self._get_scope(document_key, model_name)
+        if scope is None or not scope.entries:
+            self._record(False)
+            return None
+
+        query_vector = self._embed([user_query])[0]
+        with self._lock:
+            index, similarity = scope.best_match(query_vector)
+            entry = scope.entries[index]
+
+        if similarity < self.threshold:
+            self._record(False)
+            return None
+
+        self._record(True)
+        logger.info(f"Semantic cache hit for {document_key} (similarity {similarity:.3f})")
+        return {
+            "answer": entry["answer"],
+            "matched_question": entry["question"],
+            "similarity": similarity,
+            "chat_id": entry.get("chat_id"),
+        }
+
+    def store(
+        self,
+        document_key: str,
+        model_name: str,
+        user_query: str,
+        answer: str,
+        chat_id: Optional[str] = None,
+    ) -> None:
+        """Remember an answer so later paraphrases of the question can reuse it."""
+        if not self.enabled or not user_query.strip() or not answer:
+            return
+
+        vector = self._embed([user_query])[0]
+        scope = self._get_scope(document_key, model_name)
+        if scope is None:
+            scope = self._put_scope(self._scope_key(document_key, model_name), _ScopeEntries(vector.shape[0]))
+
+        with self._lock:
+            scope.add(vector, {
+                "question": user_query,
+                "answer": answer,
+                "chat_id": chat_id,
+            }, self.max_entries_per_scope)
+
+    def invalidate(self, document_key: str) -> None:
+        """Drop every cached answer for a document, across all models."""
+        with self._lock:
+            for scope_key in [key for key in self._scopes if key[0] == document_key]:
+                del self._scopes[scope_key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and occupancy."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "threshold": self.threshold,
+                "scopes": len(self._scopes),
+                "entries": sum(len(scope.entries) for scope in self._scopes.values()),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": (self._hits / lookups) if lookups else 0.0,
+            }
@@ -0,0 +1,63 @@
+"""Cache of per-document summaries reused across multi-document summaries."""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .config import DOCUMENT_SUMMARY_CACHE_MAX_ENTRIES
+from utils.cache_versions import EXTRACTOR, MODEL, SYSTEM_PROMPT, cache_versions
+
+logger = logging.getLogger(__name__)
+
+class DocumentSummaryCache:
+    """
+    LRU of document summaries keyed by document text, model and custom instructions,
+    and by the generations of the default model, system prompt and text extractor.
+
+    The key depends only on the document itself, so a summary made for one set
+    of documents is reused by every other set containing the same document.
+    """
+
+    def __init__(self, max_entries: int = DOCUMENT_SUMMARY_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._summaries: "OrderedDict[Tuple[str, str, str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(content: str, model_name: str, system_prompt: Optional[str] = None) -> Tuple[str, str, str, str]:
+        content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        prompt_hash = hashlib.sha256((system_prompt or "").encode("utf-8")).hexdigest()[:16]
+        return (content_hash, model_name, prompt_hash, cache_versions.token(MODEL, SYSTEM_PROMPT, EXTRACTOR))
+
+    def get(self, key: Tuple[str, str, str, str]) -> Optional[str]:
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                self.misses += 1
+                return None
+            self._summaries.move_to_end(key)
+            self.hits += 1
+            return summary
+
+    def set(self, key: Tuple[str, str, str, str], summary: str) -> None:
+        with self._lock:
+            self._summaries[key] = summary
+            self._summaries.move_to_end(key)
+            while len(self._summaries) > self.max_entries:
+                self._summaries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._summaries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._summaries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,181 @@
+"""Single-pass text splitter producing chunks as offset spans over one shared text buffer."""
+from array import array
+from bisect import bisect_right
+from typing import Any, Iterator, List, Optional, Sequence, Union
+
+from langchain.schema import Document
+
+from utils.cache_versions import SPLITTER, cache_versions
+
+# Preferred break points, strongest first
+DEFAULT_SEPARATORS = ("\n\n", "\n", ". ", " ")
+
+# Bump when chunk boundaries change, so chunks cached by older splitters are dropped
+SPLITTER_VERSION = 1
+cache_versions.set_static(SPLITTER, SPLITTER_VERSION)
+
+class TextBuffer:
+    """The full text of one document with the offset at which each page starts."""
+    __slots__ = ("doc_id", "source", "text", "page_starts", "page_numbers")
+
+    def __init__(self, text: str, page_starts: Sequence[int] = (0,), page_numbers: Sequence[int] = (0,),
+                 doc_id: Optional[str] = None, source: Optional[str] = None):
+        self.doc_id = doc_id
+        self.source = source
+        self.text = text
+        self.page_starts = array("l", page_starts)
+        self.page_numbers = array("l", page_numbers)
+
+    @classmethod
+    def from_pages(cls, pages: List[Document], doc_id: Optional[str] = None, separator: str = "\n\n") -> "TextBuffer":
+        """Join loaded pages into one buffer, remembering where every page begins."""
+        parts = []
+        starts = []
+        numbers = []
+        offset = 0
+        for index, page in enumerate(pages):
+            if index:
+                parts.append(separator)
+                offset += len(separator)
+            starts.append(offset)
+            numbers.append(int(page.metadata.get("page", index)))
+            parts.append(page.page_content)
+            offset += len(page.page_content)
+        source = pages[0].metadata.get("source") if pages else None
+        return cls("".join(parts), starts or (0,), numbers or (0,), doc_id=doc_id, source=source)
+
+    def page_at(self, offset: int) -> int:
+        return self.page_numbers[max(0, bisect_right(self.page_starts, offset) - 1)]
+
+class ChunkSpan:
+    """One chunk as (buffer, start, end); its text is only sliced out when asked for."""
+    __slots__ = ("buffer", "start", "end")
+
+    def __init__(self, buffer: TextBuffer, start: int, end: int):
+        self.buffer = buffer
+        self.start = start
+        self.end = end
+
+    @property
+    def text(self) -> str:
+        return self.buffer.text[self.start:self.end]
+
+    @property
+    def page(self) -> int:
+        return self.buffer.page_at(self.start)
+
+    def to_document(self, **metadata: Any) -> Document:
+        """Materialize the chunk as a LangChain Document (for vector stores)."""
+        base = {"source": self.buffer.source, "page": self.page, "start": self.start, "end": self.end}
+        if self.buffer.doc_id is not None:
+            base["doc_id"] = self.buffer.doc_id
+        base.update(metadata)
+        return Document(page_content=self.text, metadata=base)
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def __repr__(self) -> str:
+        return f"ChunkSpan({self.start}, {self.end})"
+
+class ChunkSpans(Sequence):
+    """The chunks of one buffer, stored as two integer arrays of offsets."""
+
+    def __init__(self, buffer: TextBuffer, starts: array, ends: array):
+        self.buffer = buffer
+        self.starts = starts
+        self.ends = ends
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[ChunkSpan, "ChunkSpans"]:
+        if isinstance(index, slice):
+            return ChunkSpans(self.buffer, self.starts[index], self.ends[index])
+        return ChunkSpan(self.buffer, self.starts[index], self.ends[index])
+
+    def __iter__(self) -> Iterator[ChunkSpan]:
+        for start, end in zip(self.starts, self.ends):
+            yield ChunkSpan(self.buffer, start, end)
+
+    def texts(self) -> Iterator[str]:
+        """Chunk texts, sliced one at a time."""
+        text = self.buffer.text
+        for start, end in zip(self.starts, self.ends):
+            yield text[start:end]
+
+    def to_documents(self, **metadata: Any) -> List[Document]:
+        return [span.to_document(**metadata) for span in self]
+
+class SpanTextSplitter:
+    """
+    Splits text into overlapping chunks of at most chunk_size characters in one pass.
+
+    Each chunk ends at the strongest separator found in the second half of its
+    window (paragraph, line, sentence, word), falling back to a hard cut. The
+    next chunk starts chunk_overlap characters before that end, moved forward to
+    a word boundary. The search per chunk is bounded by the chunk size, so the
+    work is linear in the text length. Defaults match RecursiveCharacterTextSplitter.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = 4000,
+        chunk_overlap: int = 200,
+        separators: Sequence[str] = DEFAULT_SEPARATORS,
+    ):
+        if chunk_overlap >= chunk_size:
+            raise ValueError(f"Chunk overlap ({chunk_overlap}) must be smaller than chunk size ({chunk_size})")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = tuple(separators)
+
+    def split_buffer(self, buffer: TextBuffer) -> ChunkSpans:
+        text = buffer.text
+        length = len(text)
+        starts = array("l")
+        ends = array("l")
+
+        pos = _skip_whitespace(text, 0, length)
+        while pos < length:
+            limit = pos + self.chunk_size
+            if limit >= length:
+                end = length
+            else:
+                end = limit
+                floor = pos + self.chunk_size // 2
+                for separator in self.separators:
+                    found = text.rfind(separator, floor, limit)
+                    if found != -1:
+                        end = found + len(separator)
+                        break
+
+            chunk_end = end
+            while chunk_end > pos and text[chunk_end - 1].isspace():
+                chunk_end -= 1
+            if chunk_end > pos:
+                starts.append(pos)
+                ends.append(chunk_end)
+            if end >= length:
+                break
+
+            next_pos = end - self.chunk_overlap
+            if next_pos <= pos:
+                next_pos = end
+            # Begin the overlap on a word boundary
+            while next_pos < end and not text[next_pos - 1].isspace():
+                next_pos += 1
+            pos = _skip_whitespace(text, next_pos, length)
+
+        return ChunkSpans(buffer, starts, ends)
+
+    def split_text(self, text: str, doc_id: Optional[str] = None) -> ChunkSpans:
+        return self.split_buffer(TextBuffer(text, doc_id=doc_id))
+
+    def split_pages(self, pages: List[Document], doc_id: Optional[str] = None) -> ChunkSpans:
+        return self.split_buffer(TextBuffer.from_pages(pages, doc_id=doc_id))
+
+def _skip_whitespace(text: str, pos: int, length: int) -> int:
+    while pos < length and text[pos].isspace():
+        pos += 1
+    return pos
@@ -0,0 +1,197 @@
+"""Admission control for generations sent to Ollama."""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from enum import IntEnum
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from .config import ADMISSION_CONFIG
+from .metrics import get_metrics
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class Priority(IntEnum):
+    """Priority classes for queued generations; lower values are admitted first."""
+    INTERACTIVE = 0  # Q&A turns a user is waiting on
+    STANDARD = 1  # Summaries
+    BATCH = 2  # Quizzes and slide decks
+
+class AdmissionRejected(Exception):
+    """Raised when a generation is shed because the model's queue is full or timed out."""
+
+    def __init__(self, model: str, reason: str, retry_after: int):
+        super().__init__(f"Model {model} is overloaded ({reason}), retry in {retry_after}s")
+        self.model = model
+        self.reason = reason
+        self.retry_after = retry_after
+
+    def to_http_exception(self) -> HTTPException:
+        """Convert to a 503 response carrying a Retry-After header."""
+        return HTTPException(
+            status_code=503,
+            detail=str(self),
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+class _ModelQueue:
+    """Concurrency slots and waiting generations for a single model."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.waiting: List[Tuple[int, int]] = []  # (priority, sequence) heap
+        self.condition = threading.Condition()
+
+class AdmissionController:
+    """
+    Limits concurrent generations per model.
+
+    Requests beyond the model's concurrency limit wait in a priority queue
+    (interactive before standard before batch, FIFO within a class). When the
+    queue is at its bounded depth, or a request waits longer than the queue
+    timeout, it is shed with AdmissionRejected.
+    """
+
+    def __init__(
+        self,
+        default_concurrency: int = ADMISSION_CONFIG["default_concurrency"],
+        model_concurrency: Optional[Dict[str, int]] = None,
+        max_queue_depth: int = ADMISSION_CONFIG["max_queue_depth"],
+        queue_timeout_seconds: float = ADMISSION_CONFIG["queue_timeout_seconds"],
+        retry_after_seconds: int = ADMISSION_CONFIG["retry_after_seconds"],
+        enabled: bool = ADMISSION_CONFIG["enabled"],
+    ):
+        self.default_concurrency = default_concurrency
+        self.model_concurrency = dict(
+            ADMISSION_CONFIG["model_concurrency"] if model_concurrency is None else model_concurrency
+        )
+        self.max_queue_depth = max_queue_depth
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.retry_after_seconds = retry_after_seconds
+        self.enabled = enabled
+        self._queues: Dict[str, _ModelQueue] = {}
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+        self._admitted = 0
+        self._rejected = 0
+
+    def _queue_for(self, model: str) -> _ModelQueue:
+        with self._lock:
+            queue = self._queues.get(model)
+            if queue is None:
+                limit = self.model_concurrency.get(model, self.default_concurrency)
+                queue = _ModelQueue(max(1, limit))
+                self._queues[model] = queue
+            return queue
+
+    def _reject(self, model: str, priority: Priority, reason: str) -> AdmissionRejected:
+        with self._lock:
+            self._rejected += 1
+        metrics = get_metrics()
+        if metrics is not None:
+            metrics.record_llm_rejection(model, priority.name.lower())
+        logger.warning(f"Shedding {priority.name.lower()} generation for {model}: {reason}")
+        return AdmissionRejected(model, reason, self.retry_after_seconds)
+
+    def _report_depth(self, model: str, queue: _ModelQueue) -> None:
+        metrics = get_metrics()
+        if metrics is not None:
+            metrics.record_llm_queue_depth(model, len(queue.waiting))
+
+    def acquire(self, model: str, priority: Priority = Priority.STANDARD) -> float:
+        """
+        Block until a generation slot for the model is free.
+
+        Returns:
+            Seconds spent waiting in the queue
+
+        Raises:
+            AdmissionRejected: If the queue is full or the wait times out
+        """
+        queue = self._queue_for(model)
+        start = time.monotonic()
+
+        with queue.condition:
+            if queue.active < queue.limit and not queue.waiting:
+                queue.active += 1
+                waited = 0.0
+            else:
+                if len(queue.waiting) >= self.max_queue_depth:
+                    raise self._reject(model, priority, "queue full")
+
+                ticket = (int(priority), next(self._sequence))
+                heapq.heappush(queue.waiting, ticket)
+                self._report_depth(model, queue)
+                deadline = start + self.queue_timeout_seconds
+                try:
+                    while not (queue.waiting[0] == ticket and queue.active < queue.limit):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise self._reject(model, priority, "queue wait timed out")
+                        queue.condition.wait(remaining)
+                    heapq.heappop(queue.waiting)
+                    queue.active += 1
+                finally:
+                    if ticket in queue.waiting:
+                        queue.waiting.remove(ticket)
+                        heapq.heapify(queue.waiting)
+                    self._report_depth(model, queue)
+                    # The head of the queue may have changed; let the next waiter re-check
+                    queue.condition.notify_all()
+                waited = time.monotonic() - start
+
+        with self._lock:
+            self._admitted += 1
+        metrics = get_metrics()
+        if metrics is not None:
+            metrics.record_llm_queue_wait(model, priority.name.lower(), waited)
+        return waited
+
+    def release(self, model: str) -> None:
+        """Free a generation slot taken by acquire()."""
+        queue = self._queue_for(model)
+        with queue.condition:
+            queue.active = max(0, queue.active - 1)
+            queue.condition.notify_all()
+
+    @contextmanager
+    def admit(self, model: str, priority: Priority = Priority.STANDARD) -> Iterator[float]:
+        """Context manager holding a generation slot; yields the queue wait in seconds."""
+        if not self.enabled:
+            yield 0.0
+            return
+
+        waited = self.acquire(model, priority)
+        try:
+            yield waited
+        finally:
+            self.release(model)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return per-model slot usage and queue depth."""
+        with self._lock:
+            queues = dict(self._queues)
+            summary = {
+                "enabled": self.enabled,
+                "admitted": self._admitted,
+                "rejected": self._rejected,
+                "max_queue_depth": self.max_queue_depth,
+            }
+        summary["models"] = {
+            model: {
+                "limit": queue.limit,
+                "active": queue.active,
+                "queued": len(queue.waiting),
+            }
+            for model, queue in queues.items()
+        }
+        return summary
+
+# Global singleton instance
+admission_controller = AdmissionController()
@@ -1,4 +1,5 @@
 """Model configuration module."""
+import os
 from typing import Dict, Any, List, Optional
 from pydantic import BaseModel
 
@@ -8,6 +9,55 @@ OLLAMA_API_BASE_URL = "http://localhost:11434"
 # Maximum allowed parallel downloads
 MAX_PARALLEL_DOWNLOADS = 3
 
+# LLM response cache settings
+LLM_CACHE_CONFIG: Dict[str, Any] = {
+    "enabled": os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true",
+    # "local" keeps entries in-process, "cache_manager" delegates to utils.performance.CacheManager
+    "backend": os.getenv("LLM_CACHE_BACKEND", "local"),
+    "ttl_seconds": int(os.getenv("LLM_CACHE_TTL", "86400")),  # 24 hours
+    "max_entries": int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512")),
+    "max_bytes": int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),  # 64MB
+}
+
+def _parse_model_limits(value: str) -> Dict[str, int]:
+    """Parse "model=limit,model=limit" into a dictionary."""
+    limits = {}
+    for item in value.split(","):
+        if "=" in item:
+            model, limit = item.rsplit("=", 1)
+            limits[model.strip()] = int(limit)
+    return limits
+
+# Admission control for generations sent to Ollama
+ADMISSION_CONFIG: Dict[str, Any] = {
+    "enabled": os.getenv("LLM_ADMISSION_ENABLED", "true").lower() == "true",
+    "default_concurrency": int(os.getenv("LLM_MAX_CONCURRENCY", "2")),  # Per model
+    "model_concurrency": _parse_model_limits(os.getenv("LLM_MODEL_CONCURRENCY", "")),
+    "max_queue_depth": int(os.getenv("LLM_MAX_QUEUE_DEPTH", "32")),  # Per model
+    "queue_timeout_seconds": float(os.getenv("LLM_QUEUE_TIMEOUT", "120")),
+    "retry_after_seconds": int(os.getenv("LLM_RETRY_AFTER", "10")),
+}
+
+def _parse_model_settings(value: str) -> Dict[str, str]:
+    """Parse "model=value,model=value" into a dictionary of strings."""
+    settings = {}
+    for item in value.split(","):
+        if "=" in item:
+            model, setting = item.rsplit("=", 1)
+            settings[model.strip()] = setting.strip()
+    return settings
+
+# Model warm-up and residency management
+MODEL_LIFECYCLE_CONFIG: Dict[str, Any] = {
+    "base_url": os.getenv("OLLAMA_BASE_URL", OLLAMA_API_BASE_URL),
+    "preload_on_startup": os.getenv("LLM_PRELOAD_ON_STARTUP", "true").lower() == "true",
+    # Ollama keep_alive: duration string ("30m"), seconds, or -1 to keep loaded indefinitely
+    "default_keep_alive": os.getenv("LLM_KEEP_ALIVE", "30m"),
+    "model_keep_alive": _parse_model_settings(os.getenv("LLM_MODEL_KEEP_ALIVE", "")),
+    "warmup_timeout_seconds": float(os.getenv("LLM_WARMUP_TIMEOUT", "300")),
+    "residency_ttl_seconds": float(os.getenv("LLM_RESIDENCY_TTL", "15")),  # /api/ps poll cache
+}
+
 class ModelInfo(BaseModel):
     """Model information."""
     name: str
@@ -2,6 +2,8 @@
 import logging
 from typing import Optional
 
+from utils.cache_versions import MODEL, cache_versions
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -21,6 +23,9 @@ class GlobalModelConfig:
         """Set the global model name."""
         if model_name != self._model_name:
             self._model_name = model_name
+            # Responses cached for the previous default model must not be served
+            cache_versions.set_static(MODEL, model_name)
+            cache_versions.bump(MODEL)
             logger.info(f"Global model changed to {model_name}")
     
     def get_model(self) -> Optional[str]:
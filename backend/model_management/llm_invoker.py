@@ -0,0 +1,208 @@
+"""Shared invocation layer for Ollama LLM calls."""
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import requests
+from langchain_community.llms import Ollama
+
+from .admission import AdmissionController, Priority, admission_controller
+from .response_cache import LLMResponseCache, response_cache
+from .telemetry import record_generation
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Ollama client attributes that change the generated text besides model and temperature
+DECODING_OPTION_FIELDS = (
+    "mirostat",
+    "mirostat_eta",
+    "mirostat_tau",
+    "num_ctx",
+    "num_predict",
+    "repeat_last_n",
+    "repeat_penalty",
+    "stop",
+    "tfs_z",
+    "top_k",
+    "top_p",
+    "format",
+    "system",
+    "template",
+    "raw",
+)
+
+class LLMInvoker:
+    """
+    Runs prompts through an Ollama client.
+
+    The response cache is consulted first; cache misses wait for an admission
+    slot for the model before the request is sent to Ollama. Token counts and
+    timings Ollama reports are recorded for every generation.
+    """
+
+    def __init__(
+        self,
+        cache: LLMResponseCache = response_cache,
+        admission: AdmissionController = admission_controller,
+    ):
+        self.cache = cache
+        self.admission = admission
+
+    @staticmethod
+    def decoding_options(llm: Ollama) -> Dict[str, Any]:
+        """Collect the decoding options set on a client, skipping unset ones."""
+        options = {}
+        for field in DECODING_OPTION_FIELDS:
+            value = getattr(llm, field, None)
+            if value not in (None, "", []):
+                options[field] = value
+        return options
+
+    def invoke(
+        self,
+        llm: Ollama,
+        prompt: str,
+        use_cache: bool = True,
+        refresh_cache: bool = False,
+        priority: Priority = Priority.STANDARD,
+        response_format: Optional[Union[str, Dict[str, Any]]] = None,
+        validate: Optional[Callable[[str], bool]] = None,
+    ) -> str:
+        """
+        Generate text for a fully rendered prompt.
+
+        Args:
+            llm: The Ollama client to use
+            prompt: Final prompt, including any applied system prompt
+            use_cache: When False, do not read from the cache (nor write to it,
+                unless refresh_cache is set)
+            refresh_cache: When True, skip the cached value and store a fresh one
+            priority: Admission priority class for the generation
+            response_format: Ollama output constraint for this call, either "json"
+                or a JSON schema; overrides the client's format
+            validate: Whether the caller can use a response; responses it rejects are
+                neither stored nor served from the cache, so a retry generates anew
+
+        Returns:
+            The generated text
+
+        Raises:
+            AdmissionRejected: If the model's queue is full
+        """
+        options = self.decoding_options(llm)
+        generate_kwargs: Dict[str, Any] = {}
+        if response_format is not None:
+            options["format"] = response_format
+            generate_kwargs["format"] = response_format
+
+        cache_key = None
+        if use_cache or refresh_cache:
+            cache_key = self.cache.make_key(llm.model, llm.temperature, prompt, options)
+
+        if use_cache and not refresh_cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None and validate is not None and not validate(cached):
+                cached = None
+            if cached is not None:
+                logger.debug(f"LLM response cache hit for model {llm.model}")
+                record_generation(llm.model, cached=True)
+                return cached
+
+        with self.admission.admit(llm.model, priority) as queue_wait:
+            start = time.monotonic()
+            try:
+                # generate() keeps the final chunk's eval counts and durations that invoke() drops
+                llm_result = llm.generate([prompt], **generate_kwargs)
+            except Exception:
+                record_generation(
+                    llm.model,
+                    queue_wait_seconds=queue_wait,
+                    wall_seconds=time.monotonic() - start,
+                    status="error",
+                )
+                raise
+            elapsed = time.monotonic() - start
+
+        generation = llm_result.generations[0][0]
+        result = generation.text
+        record_generation(
+            llm.model,
+            generation.generation_info,
+            queue_wait_seconds=queue_wait,
+            wall_seconds=elapsed,
+        )
+
+        if cache_key is not None:
+            if validate is None or validate(result):
+                self.cache.set(cache_key, result)
+            else:
+                logger.info(f"Not caching a response from {llm.model} the caller could not use")
+
+        return result
+
+    def generate_with_context(
+        self,
+        llm: Ollama,
+        prompt: str,
+        context: Optional[List[int]] = None,
+        priority: Priority = Priority.INTERACTIVE,
+    ) -> Tuple[str, List[int]]:
+        """
+        Continue a conversation from the token context Ollama returned for its previous turn.
+
+        Ollama keeps the KV state for a prompt that extends the last one, so passing
+        the previous context makes the server prefill only the new prompt text.
+        The Ollama client does not expose the context field, so this calls
+        /api/generate directly with the client's model and options. Results are
+        never cached since each turn depends on the conversation so far.
+
+        Args:
+            llm: The Ollama client whose model and options to use
+            prompt: New text for this turn only
+            context: Context returned by the previous turn, or None to start over
+            priority: Admission priority class for the generation
+
+        Returns:
+            Tuple of (generated text, context to pass to the next turn)
+
+        Raises:
+            AdmissionRejected: If the model's queue is full
+        """
+        payload: Dict[str, Any] = {
+            "model": llm.model,
+            "prompt": prompt,
+            "stream": False,
+            "options": {
+                name: value for name, value in llm._default_params["options"].items()
+                if value is not None
+            },
+        }
+        for field in ("system", "template", "keep_alive"):
+            value = getattr(llm, field, None)
+            if value not in (None, ""):
+                payload[field] = value
+        if context:
+            payload["context"] = context
+
+        with self.admission.admit(llm.model, priority) as queue_wait:
+            start = time.monotonic()
+            try:
+                response = requests.post(f"{llm.base_url}/api/generate", json=payload, timeout=llm.timeout)
+                response.raise_for_status()
+                body = response.json()
+            except Exception:
+                record_generation(
+                    llm.model,
+                    queue_wait_seconds=queue_wait,
+                    wall_seconds=time.monotonic() - start,
+                    status="error",
+                )
+                raise
+            elapsed = time.monotonic() - start
+
+        record_generation(llm.model, body, queue_wait_seconds=queue_wait, wall_seconds=elapsed)
+        return body.get("response", ""), body.get("context") or []
+
+# Global singleton instance
+llm_invoker = LLMInvoker()
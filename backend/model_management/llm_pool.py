@@ -0,0 +1,88 @@
+"""Pool of shared Ollama clients keyed by model and generation options."""
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from langchain_community.llms import Ollama
+
+from .config import OLLAMA_API_BASE_URL
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class LLMClientPool:
+    """
+    Hands out Ollama clients per request instead of swapping a shared one.
+
+    Clients are built once per (model, base_url, temperature, options) combination
+    and reused by every request asking for the same configuration, so toggling
+    between models never rebuilds clients. Pooled clients are shared across
+    threads and must be treated as immutable; callers wanting different options
+    ask the pool for another client rather than setting attributes.
+    """
+
+    def __init__(self, base_url: str = OLLAMA_API_BASE_URL, max_clients: int = 32):
+        self.base_url = base_url
+        self.max_clients = max_clients
+        self._clients: "OrderedDict[Tuple[Any, ...], Ollama]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(model_name: str, base_url: str, temperature: Optional[float], options: Dict[str, Any]) -> Tuple[Any, ...]:
+        frozen_options = tuple(sorted(
+            (name, tuple(value) if isinstance(value, list) else value)
+            for name, value in options.items()
+        ))
+        return (model_name, base_url, temperature, frozen_options)
+
+    def get(
+        self,
+        model_name: str,
+        temperature: Optional[float] = None,
+        base_url: Optional[str] = None,
+        **options: Any,
+    ) -> Ollama:
+        """
+        Return the shared client for a model and option set, creating it on first use.
+
+        Args:
+            model_name: Ollama model name
+            temperature: Sampling temperature
+            base_url: Ollama server URL (defaults to the pool's base URL)
+            **options: Additional Ollama client fields (e.g. num_ctx, top_p, keep_alive)
+        """
+        base_url = base_url or self.base_url
+        key = self._key(model_name, base_url, temperature, options)
+
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                return client
+
+        client = Ollama(model=model_name, base_url=base_url, temperature=temperature, **options)
+
+        with self._lock:
+            # Another thread may have built the same client meanwhile; keep the first one
+            existing = self._clients.get(key)
+            if existing is not None:
+                return existing
+            self._clients[key] = client
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+        logger.debug(f"Created pooled Ollama client for {model_name} (temperature={temperature})")
+        return client
+
+    def clear(self) -> None:
+        """Drop every pooled client."""
+        with self._lock:
+            self._clients.clear()
+
+    def size(self) -> int:
+        """Number of pooled clients."""
+        with self._lock:
+            return len(self._clients)
+
+# Global singleton instance
+llm_pool = LLMClientPool()
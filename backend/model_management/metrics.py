@@ -0,0 +1,33 @@
+"""Lazy access to the shared performance metrics collector."""
+import logging
+import threading
+from typing import Any, Optional
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+_metrics: Optional[Any] = None
+_resolved = False
+_lock = threading.Lock()
+
+def get_metrics() -> Optional[Any]:
+    """
+    Return the PerformanceMetrics instance from utils.performance.
+
+    The performance module pulls in optional monitoring dependencies, so it is
+    imported on first use and None is returned when it cannot be loaded.
+    """
+    global _metrics, _resolved
+    if _resolved:
+        return _metrics
+
+    with _lock:
+        if not _resolved:
+            try:
+                from utils.performance import performance_optimizer
+                _metrics = performance_optimizer.metrics
+            except Exception as e:
+                logger.warning(f"Performance metrics unavailable: {e}")
+                _metrics = None
+            _resolved = True
+    return _metrics
@@ -0,0 +1,183 @@
+"""Model warm-up, keep-alive and residency tracking for Ollama models."""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Union
+
+import aiohttp
+
+from .config import MODEL_LIFECYCLE_CONFIG
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class ModelWarmupError(Exception):
+    """Raised when Ollama fails to load a model into memory."""
+
+    def __init__(self, model: str, reason: str):
+        super().__init__(f"Failed to load model {model}: {reason}")
+        self.model = model
+        self.reason = reason
+
+class ModelLifecycleManager:
+    """
+    Keeps selected models loaded in Ollama.
+
+    A model is warmed by sending Ollama an empty prompt, which loads the weights
+    without generating anything and applies the model's keep_alive. Concurrent
+    warm-ups of the same model share one request. Residency is read from
+    /api/ps and cached briefly so status checks don't hit Ollama every time.
+    """
+
+    def __init__(
+        self,
+        base_url: str = MODEL_LIFECYCLE_CONFIG["base_url"],
+        default_keep_alive: Union[str, int] = MODEL_LIFECYCLE_CONFIG["default_keep_alive"],
+        model_keep_alive: Optional[Dict[str, str]] = None,
+        warmup_timeout_seconds: float = MODEL_LIFECYCLE_CONFIG["warmup_timeout_seconds"],
+        residency_ttl_seconds: float = MODEL_LIFECYCLE_CONFIG["residency_ttl_seconds"],
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.default_keep_alive = default_keep_alive
+        self.model_keep_alive = dict(
+            MODEL_LIFECYCLE_CONFIG["model_keep_alive"] if model_keep_alive is None else model_keep_alive
+        )
+        self.warmup_timeout_seconds = warmup_timeout_seconds
+        self.residency_ttl_seconds = residency_ttl_seconds
+        self._warmups: Dict[str, asyncio.Task] = {}
+        self._last_warmup: Dict[str, Dict[str, Any]] = {}
+        self._resident: List[Dict[str, Any]] = []
+        self._resident_checked_at: Optional[float] = None
+
+    @staticmethod
+    def _normalize_keep_alive(value: Union[str, int]) -> Union[str, int]:
+        """Ollama accepts durations like "30m" or plain seconds; pass numbers as ints."""
+        if isinstance(value, str) and value.lstrip("-").isdigit():
+            return int(value)
+        return value
+
+    def keep_alive_for(self, model: str) -> Union[str, int]:
+        """Return the keep_alive setting to send with requests for a model."""
+        return self._normalize_keep_alive(self.model_keep_alive.get(model, self.default_keep_alive))
+
+    def set_keep_alive(self, model: str, keep_alive: Union[str, int]) -> None:
+        """Override keep_alive for one model; applied on its next request or warm-up."""
+        self.model_keep_alive[model] = str(keep_alive)
+
+    async def _load(self, model: str) -> Dict[str, Any]:
+        payload = {
+            "model": model,
+            "prompt": "",
+            "stream": False,
+            "keep_alive": self.keep_alive_for(model),
+        }
+        start = time.monotonic()
+        timeout = aiohttp.ClientTimeout(total=self.warmup_timeout_seconds)
+        try:
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                async with session.post(f"{self.base_url}/api/generate", json=payload) as response:
+                    if response.status != 200:
+                        raise ModelWarmupError(model, f"Ollama returned status {response.status}: {await response.text()}")
+                    data = await response.json()
+        except asyncio.TimeoutError:
+            raise ModelWarmupError(model, f"timed out after {self.warmup_timeout_seconds:.0f}s")
+        except aiohttp.ClientError as e:
+            raise ModelWarmupError(model, str(e))
+
+        elapsed = time.monotonic() - start
+        # load_duration is reported in nanoseconds and is ~0 when the model was already resident
+        load_seconds = (data.get("load_duration") or 0) / 1e9
+        result = {
+            "model": model,
+            "keep_alive": payload["keep_alive"],
+            "warmup_seconds": round(elapsed, 3),
+            "load_seconds": round(load_seconds, 3),
+            "warmed_at": time.time(),
+        }
+        self._last_warmup[model] = result
+        self._resident_checked_at = None  # Residency changed; refresh on next check
+        logger.info(f"Model {model} warm (took {elapsed:.2f}s, load {load_seconds:.2f}s, keep_alive={payload['keep_alive']})")
+        return result
+
+    async def warm(self, model: str) -> Dict[str, Any]:
+        """
+        Load a model into Ollama's memory and apply its keep_alive.
+
+        Returns:
+            Dictionary with warm-up and load durations
+
+        Raises:
+            ModelWarmupError: If Ollama cannot load the model
+        """
+        task = self._warmups.get(model)
+        if task is None:
+            task = asyncio.ensure_future(self._load(model))
+            self._warmups[model] = task
+            task.add_done_callback(lambda _task, _model=model: self._warmups.pop(_model, None))
+        return await asyncio.shield(task)
+
+    async def resident_models(self, refresh: bool = False) -> List[Dict[str, Any]]:
+        """Return the models Ollama currently holds in memory (from /api/ps)."""
+        now = time.monotonic()
+        if (
+            not refresh
+            and self._resident_checked_at is not None
+            and now - self._resident_checked_at < self.residency_ttl_seconds
+        ):
+            return self._resident
+
+        try:
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
+                async with session.get(f"{self.base_url}/api/ps") as response:
+                    if response.status != 200:
+                        logger.error(f"Failed to fetch resident models from Ollama: Status {response.status}")
+                        return self._resident
+                    data = await response.json()
+        except Exception as e:
+            logger.error(f"Error fetching resident models: {str(e)}")
+            return self._resident
+
+        self._resident = [
+            {
+                "name": model.get("name") or model.get("model"),
+                "size_vram": model.get("size_vram", 0),
+                "expires_at": model.get("expires_at"),
+            }
+            for model in data.get("models", [])
+        ]
+        self._resident_checked_at = now
+        return self._resident
+
+    async def is_resident(self, model: str) -> bool:
+        """Check whether a model is currently loaded in Ollama."""
+        resident = await self.resident_models()
+        # Ollama reports untagged models with the implicit ":latest" tag
+        wanted = model if ":" in model else f"{model}:latest"
+        return any(entry["name"] in (model, wanted) for entry in resident)
+
+    async def ensure_warm(self, model: str) -> Dict[str, Any]:
+        """Warm a model unless /api/ps already reports it as resident."""
+        if await self.is_resident(model):
+            return {"model": model, "keep_alive": self.keep_alive_for(model), "already_resident": True}
+        result = await self.warm(model)
+        return {**result, "already_resident": False}
+
+    async def preload(self, model: str) -> None:
+        """Warm a model in the background at startup; failures are logged, not raised."""
+        try:
+            await self.ensure_warm(model)
+        except ModelWarmupError as e:
+            logger.warning(f"Startup preload skipped: {e}")
+
+    async def status(self) -> Dict[str, Any]:
+        """Return resident models, keep_alive settings and the last warm-up per model."""
+        return {
+            "resident": await self.resident_models(),
+            "warming": sorted(self._warmups),
+            "default_keep_alive": self._normalize_keep_alive(self.default_keep_alive),
+            "model_keep_alive": dict(self.model_keep_alive),
+            "last_warmup": dict(self._last_warmup),
+        }
+
+# Global singleton instance
+model_lifecycle = ModelLifecycleManager()
@@ -0,0 +1,165 @@
+"""Generation cache for LLM responses."""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .config import LLM_CACHE_CONFIG
+from utils.cache_versions import MODEL, SYSTEM_PROMPT, cache_versions
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class LLMResponseCache:
+    """
+    In-process cache for generated LLM text.
+
+    Entries are keyed by a hash of the model name, temperature, decoding options
+    and the final rendered prompt (system prompt included), plus the generations
+    of the default model and system prompt so changing either drops every
+    response cached before (see utils.cache_versions). Entries expire after a TTL
+    and are evicted least-recently-used once the entry or byte budget is exceeded.
+    When the backend is "cache_manager", storage is delegated to the shared
+    CacheManager from utils.performance instead.
+    """
+
+    KEY_PREFIX = "llm_response:"
+
+    def __init__(
+        self,
+        ttl_seconds: int = LLM_CACHE_CONFIG["ttl_seconds"],
+        max_entries: int = LLM_CACHE_CONFIG["max_entries"],
+        max_bytes: int = LLM_CACHE_CONFIG["max_bytes"],
+        backend: str = LLM_CACHE_CONFIG["backend"],
+        enabled: bool = LLM_CACHE_CONFIG["enabled"],
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, Tuple[str, float, int]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._cache_manager = self._load_cache_manager() if backend == "cache_manager" else None
+
+    def _load_cache_manager(self):
+        """Resolve the shared CacheManager, falling back to local storage if unavailable."""
+        try:
+            from utils.performance import performance_optimizer
+            logger.info("LLM response cache backed by CacheManager")
+            return performance_optimizer.cache_manager
+        except Exception as e:
+            logger.warning(f"CacheManager unavailable, using local LLM response cache: {e}")
+            return None
+
+    @staticmethod
+    def make_key(
+        model_name: str,
+        temperature: Optional[float],
+        prompt: str,
+        options: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """Build a stable cache key for a generation request."""
+        payload = json.dumps(
+            {
+                "model": model_name,
+                "temperature": temperature,
+                "options": options or {},
+                "versions": cache_versions.token(MODEL, SYSTEM_PROMPT),
+            },
+            sort_keys=True,
+            default=str,
+        )
+        digest = hashlib.sha256()
+        digest.update(payload.encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(prompt.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for a key, or None if missing or expired."""
+        if not self.enabled:
+            return None
+
+        if self._cache_manager is not None:
+            value = self._cache_manager.get(self.KEY_PREFIX + key)
+            with self._lock:
+                if value is None:
+                    self._misses += 1
+                else:
+                    self._hits += 1
+            return value
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            value, expires_at, size = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._total_bytes -= size
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        """Store a response under a key."""
+        if not self.enabled:
+            return
+
+        if self._cache_manager is not None:
+            self._cache_manager.set(self.KEY_PREFIX + key, value, self.ttl_seconds)
+            return
+
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            logger.debug(f"Skipping LLM cache store for oversized response ({size} bytes)")
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._total_bytes -= previous[2]
+
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds, size)
+            self._total_bytes += size
+
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes
+            ):
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_size
+                self._evictions += 1
+
+    def clear(self) -> None:
+        """Drop every locally cached response."""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache counters for monitoring."""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "backend": "cache_manager" if self._cache_manager is not None else "local",
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
+
+# Global singleton instance
+response_cache = LLMResponseCache()
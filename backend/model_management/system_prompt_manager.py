@@ -8,6 +8,8 @@ from typing import Dict, Optional, Any
 import logging
 from datetime import datetime
 
+from utils.cache_versions import SYSTEM_PROMPT, cache_versions, fingerprint
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
@@ -39,6 +41,7 @@ class SystemPromptManager:
         
         # Initialize or load configuration
         self.config = self._load_config()
+        cache_versions.set_static(SYSTEM_PROMPT, fingerprint(self.get_system_prompt()))
     
     def _load_config(self) -> Dict[str, Any]:
         """Load configuration from file or create default."""
@@ -76,8 +79,12 @@ class SystemPromptManager:
     
     def set_system_prompt(self, prompt: str) -> None:
         """Set the system prompt."""
+        changed = prompt != self.get_system_prompt()
         self.config["system_prompt"] = prompt
         self._save_config(self.config)
+        if changed:
+            cache_versions.set_static(SYSTEM_PROMPT, fingerprint(prompt))
+            cache_versions.bump(SYSTEM_PROMPT)
     
     def apply_system_prompt(self, prompt: str, variables: Optional[Dict[str, str]] = None) -> str:
         """
@@ -0,0 +1,175 @@
+"""Token and timing telemetry for Ollama generations."""
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Dict, Iterator, List, Optional
+
+from .metrics import get_metrics
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Ollama reports durations in nanoseconds
+_NANOSECONDS = 1e9
+
+def parse_generation_info(info: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Extract token counts and timings from the final chunk Ollama returns.
+
+    Returns:
+        Dictionary with prompt/output tokens, load, prefill and decode seconds,
+        and decode tokens per second (zeros when Ollama did not report them)
+    """
+    info = info or {}
+    prompt_tokens = int(info.get("prompt_eval_count") or 0)
+    output_tokens = int(info.get("eval_count") or 0)
+    decode_seconds = (info.get("eval_duration") or 0) / _NANOSECONDS
+    return {
+        "prompt_tokens": prompt_tokens,
+        "output_tokens": output_tokens,
+        "load_seconds": (info.get("load_duration") or 0) / _NANOSECONDS,
+        "prefill_seconds": (info.get("prompt_eval_duration") or 0) / _NANOSECONDS,
+        "decode_seconds": decode_seconds,
+        "ollama_total_seconds": (info.get("total_duration") or 0) / _NANOSECONDS,
+        "decode_tokens_per_second": (output_tokens / decode_seconds) if decode_seconds > 0 else 0.0,
+    }
+
+class GenerationTrace:
+    """Generations made while handling one request, for the response debug block."""
+
+    def __init__(self, route: str):
+        self.route = route
+        self.generations: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self.generations.append(record)
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals across the request's generations plus the per-call breakdown."""
+        with self._lock:
+            generations = list(self.generations)
+
+        def total(field: str) -> float:
+            return sum(record.get(field, 0) for record in generations)
+
+        return {
+            "route": self.route,
+            "calls": len(generations),
+            "cached_calls": sum(1 for record in generations if record.get("cached")),
+            "prompt_tokens": int(total("prompt_tokens")),
+            "output_tokens": int(total("output_tokens")),
+            "queue_wait_seconds": round(total("queue_wait_seconds"), 3),
+            "load_seconds": round(total("load_seconds"), 3),
+            "prefill_seconds": round(total("prefill_seconds"), 3),
+            "decode_seconds": round(total("decode_seconds"), 3),
+            "wall_seconds": round(total("wall_seconds"), 3),
+            "generations": generations,
+        }
+
+_current_trace: ContextVar[Optional[GenerationTrace]] = ContextVar("generation_trace", default=None)
+
+@contextmanager
+def generation_trace(route: str) -> Iterator[GenerationTrace]:
+    """Collect every generation made in this context (including thread pool work started from it)."""
+    trace = GenerationTrace(route)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+async def traced(route: str, awaitable: Awaitable[Any]) -> Any:
+    """Await a service call and attach its generation breakdown to result["debug"]."""
+    with generation_trace(route) as trace:
+        result = await awaitable
+    if isinstance(result, dict):
+        debug = result.get("debug")
+        if not isinstance(debug, dict):
+            debug = {}
+            result["debug"] = debug
+        debug["generation"] = trace.summary()
+    return result
+
+_request_models: ContextVar[Optional[List[str]]] = ContextVar("request_models", default=None)
+
+@contextmanager
+def request_models() -> Iterator[List[str]]:
+    """Collect the models generated with while handling one HTTP request."""
+    models: List[str] = []
+    token = _request_models.set(models)
+    try:
+        yield models
+    finally:
+        _request_models.reset(token)
+
+def current_route() -> str:
+    """Route label of the active trace, or "unknown" outside a traced request."""
+    trace = _current_trace.get()
+    return trace.route if trace is not None else "unknown"
+
+def record_generation(
+    model: str,
+    generation_info: Optional[Dict[str, Any]] = None,
+    queue_wait_seconds: float = 0.0,
+    wall_seconds: float = 0.0,
+    cached: bool = False,
+    status: str = "success",
+) -> Dict[str, Any]:
+    """
+    Record one generation in Prometheus and the active request trace.
+
+    Args:
+        model: Ollama model name
+        generation_info: Final-chunk fields returned by Ollama (eval counts and durations)
+        queue_wait_seconds: Time spent waiting for an admission slot
+        wall_seconds: Time spent in the Ollama call
+        cached: Whether the response came from the LLM response cache
+        status: "success" or "error"
+
+    Returns:
+        The recorded per-generation breakdown
+    """
+    route = current_route()
+    record = {
+        "model": model,
+        "cached": cached,
+        "status": status,
+        "queue_wait_seconds": round(queue_wait_seconds, 3),
+        "wall_seconds": round(wall_seconds, 3),
+    }
+    if not cached:
+        usage = parse_generation_info(generation_info)
+        record.update({
+            key: round(value, 3) if isinstance(value, float) else value
+            for key, value in usage.items()
+        })
+
+        metrics = get_metrics()
+        if metrics is not None:
+            metrics.record_llm_generation(
+                model=model,
+                route=route,
+                status=status,
+                duration=wall_seconds,
+                prompt_tokens=usage["prompt_tokens"],
+                output_tokens=usage["output_tokens"],
+                prefill_seconds=usage["prefill_seconds"],
+                decode_tokens_per_second=usage["decode_tokens_per_second"],
+            )
+
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(record)
+    models = _request_models.get()
+    if models is not None and model not in models:
+        models.append(model)
+    if not cached and status == "success":
+        logger.debug(
+            f"Generation on {model} for {route}: {record['prompt_tokens']} prompt tokens, "
+            f"{record['output_tokens']} output tokens, prefill {record['prefill_seconds']}s, "
+            f"{record['decode_tokens_per_second']:.1f} tok/s, queue {record['queue_wait_seconds']}s"
+        )
+    return record
@@ -1,3 +1,4 @@
+import os
 from typing import Dict, Any
 from pathlib import Path
 
@@ -14,6 +15,43 @@ OLLAMA_CONFIG: Dict[str, Any] = {
     "max_tokens": 2000,
 }
 
+# Structured output: constrain generation to SLIDE_SCHEMA with Ollama's format parameter
+STRUCTURED_OUTPUT = os.getenv("SLIDE_STRUCTURED_OUTPUT", "true").lower() == "true"
+
+# JSON schema for a slide deck; minItems/maxItems are set per request
+SLIDE_SCHEMA: Dict[str, Any] = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "title": {"type": "string"},
+            "content": {"type": "array", "items": {"type": "string"}},
+        },
+        "required": ["title", "content"],
+    },
+}
+
+# Outline-then-fan-out generation: a short outline call, then one call per slide in parallel
+FAN_OUT_CONFIG: Dict[str, Any] = {
+    "enabled": os.getenv("SLIDE_FAN_OUT", "true").lower() == "true",
+    "min_slides": int(os.getenv("SLIDE_FAN_OUT_MIN_SLIDES", "4")),  # Smaller decks use one call
+    "max_workers": int(os.getenv("SLIDE_FAN_OUT_WORKERS", "4")),
+    "slide_retries": int(os.getenv("SLIDE_FAN_OUT_RETRIES", "2")),  # Per failed slide
+}
+
+# JSON schema for the outline: one entry per slide
+OUTLINE_SCHEMA: Dict[str, Any] = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "title": {"type": "string"},
+            "summary": {"type": "string"},
+        },
+        "required": ["title", "summary"],
+    },
+}
+
 # Slide Generation Settings
 MAX_SLIDES = 10
 SLIDE_TEMPLATE = "default"  # or "modern", "classic", etc.
@@ -51,4 +89,35 @@ Guidelines:
 5. Keep the language clear and professional
 6. Ensure the response is in Vietnamese
 7. Make sure the JSON is valid and properly formatted with double quotes
-"""
\ No newline at end of file
+"""
+
+OUTLINE_PROMPT = """
+Create an outline for a Vietnamese presentation of exactly {num_slides} slides about {topic}.
+Return a JSON array with one object per slide, in order. Each object has a "title" field
+(the slide title) and a "summary" field (one sentence describing what the slide covers).
+
+IMPORTANT:
+- Return only the JSON array, with no explanations
+- The first slide is an introduction and the last slide is a summary or conclusion
+- Titles and summaries must be in Vietnamese
+"""
+
+SLIDE_CONTENT_PROMPT = """
+You are writing slide {slide_number} of {num_slides} in a Vietnamese presentation about {topic}.
+
+Presentation outline:
+{outline}
+
+Write the content for this slide only:
+Title: {title}
+Covers: {summary}
+
+Return a JSON object with a "title" field and a "content" field. The content is a list
+of bullet points, each starting with '-'.
+
+IMPORTANT:
+- Return only the JSON object, with no explanations
+- Maximum 5 bullet points, each limited to 10 words
+- Do not repeat points that belong to other slides in the outline
+- Ensure the response is in Vietnamese
+"""
@@ -0,0 +1,123 @@
+"""Tolerant incremental parser for JSON arrays of objects produced by a model."""
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_DANGLING_SEPARATOR = re.compile(r"[,:]\s*$")
+_DANGLING_KEY = re.compile(r'([,{])\s*"(?:[^"\\]|\\.)*"\s*$')
+_CLOSERS = {"{": "}", "[": "]"}
+
+class StreamingJSONArrayParser:
+    """
+    Extracts the objects of a JSON array as text arrives.
+
+    Text outside objects (prose, code fences, array brackets and commas) is
+    skipped, so a response wrapped in explanations still yields its objects.
+    Each object is decoded as soon as its closing brace arrives; raw newlines
+    inside strings and trailing commas are repaired, and a final object cut
+    off mid-way (e.g. by the token limit) is closed and salvaged by close().
+    """
+
+    def __init__(self):
+        self.items: List[Dict[str, Any]] = []
+        self.repaired = 0
+        self.dropped = 0
+        self._buffer: List[str] = []
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        Consume more model output.
+
+        Returns:
+            Objects completed by this chunk
+        """
+        completed = []
+        for char in chunk:
+            if not self._stack:
+                # Between objects: wait for the next one to open
+                if char == "{":
+                    self._stack.append(char)
+                    self._buffer = [char]
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                elif char == "\n":
+                    # Raw newlines are invalid inside JSON strings
+                    char = "\\n"
+                self._buffer.append(char)
+                continue
+
+            self._buffer.append(char)
+            if char == '"':
+                self._in_string = True
+            elif char in _CLOSERS:
+                self._stack.append(char)
+            elif char in "}]":
+                if self._stack and _CLOSERS[self._stack[-1]] == char:
+                    self._stack.pop()
+                if not self._stack:
+                    item = self._decode("".join(self._buffer))
+                    self._buffer = []
+                    if item is not None:
+                        completed.append(item)
+
+        self.items.extend(completed)
+        return completed
+
+    def close(self) -> List[Dict[str, Any]]:
+        """
+        Finish the stream, salvaging a truncated final object if possible.
+
+        Returns:
+            Every object parsed from the stream
+        """
+        if self._stack:
+            text = "".join(self._buffer)
+            if self._in_string:
+                text += '"'
+            text = _DANGLING_SEPARATOR.sub("", text)
+            if self._stack[-1] == "{":
+                # A key with no value yet cannot be kept
+                text = _DANGLING_SEPARATOR.sub("", _DANGLING_KEY.sub(r"\1", text))
+            text += "".join(_CLOSERS[opener] for opener in reversed(self._stack))
+            item = self._decode(text)
+            if item is not None:
+                self.repaired += 1
+                self.items.append(item)
+            self._buffer = []
+            self._stack = []
+            self._in_string = False
+            self._escape = False
+        return self.items
+
+    def _decode(self, text: str) -> Optional[Dict[str, Any]]:
+        try:
+            item = json.loads(text)
+        except json.JSONDecodeError:
+            try:
+                item = json.loads(_TRAILING_COMMA.sub(r"\1", text))
+                self.repaired += 1
+            except json.JSONDecodeError:
+                self.dropped += 1
+                logger.debug(f"Dropping unparseable object: {text[:200]}")
+                return None
+        return item if isinstance(item, dict) else None
+
+def parse_json_objects(text: str) -> List[Dict[str, Any]]:
+    """Parse every object from a complete response with StreamingJSONArrayParser."""
+    parser = StreamingJSONArrayParser()
+    parser.feed(text)
+    return parser.close()
@@ -1,51 +1,35 @@
 ﻿import os
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import json
 from datetime import datetime
 import logging
 import re
-import unicodedata
-import io
 import requests
 import time
 
 from langchain_community.llms import Ollama
-from pypdf import PdfReader
-import docx
 from .pptx_generator import PowerPointGenerator
 
-from .config import OLLAMA_CONFIG, PROMPT, OUTPUT_DIR
+from .config import (
+    OLLAMA_CONFIG, PROMPT, OUTPUT_DIR, STRUCTURED_OUTPUT, SLIDE_SCHEMA,
+    FAN_OUT_CONFIG, OUTLINE_SCHEMA, OUTLINE_PROMPT, SLIDE_CONTENT_PROMPT,
+)
+from .json_stream import StreamingJSONArrayParser, parse_json_objects
 from backend.model_management.global_model_config import global_model_config
 from backend.model_management.system_prompt_manager import system_prompt_manager
+from backend.model_management.llm_invoker import llm_invoker
+from backend.model_management.llm_pool import llm_pool
+from backend.model_management.model_lifecycle import model_lifecycle
+from backend.model_management.admission import AdmissionRejected, Priority
+from utils.fan_out import fan_out
+from utils.document_parsers import document_parsers
+from utils.text_sanitizer import contains_chinese, sanitize_text
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def is_chinese(char: str) -> bool:
-    """Check if a character is Chinese."""
-    try:
-        # Check specifically for Chinese range, excluding Vietnamese
-        character_name = unicodedata.name(char)
-        return "CJK" in character_name and not any(viet_name in character_name for viet_name in ["LATIN", "VIETNAMESE"])
-    except ValueError:
-        return False
-
-def contains_chinese(text: str) -> bool:
-    """Check if text contains any Chinese characters."""
-    return any(is_chinese(char) for char in text)
-
-def sanitize_text(text: str) -> str:
-    """Remove unwanted characters and clean up text, preserving Vietnamese."""
-    # Remove Chinese characters, but keep Vietnamese
-    cleaned = "".join(char for char in text if not is_chinese(char))
-    # Remove multiple spaces
-    cleaned = re.sub(r"\s+", " ", cleaned)
-    # Replace multiple newlines with a single one for readability
-    cleaned = re.sub(r"\n+", "\n", cleaned)
-    return cleaned.strip()
-
 def validate_slide_content(slides_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """Validate and clean slide content."""
     cleaned_slides = []
@@ -83,6 +67,10 @@ def _sanitize_filename(name: str) -> str:
     # Limit to 256 characters to ensure compatibility with most filesystems
     return sanitized[:100]  # Windows and most Unix filesystems have a 255-260 character limit
 
+def _has_json_items(response_text: str) -> bool:
+    """Whether a response holds at least one JSON object; others are not worth caching."""
+    return bool(parse_json_objects(response_text))
+
 class SlideGenerationService:
     def __init__(self, model_name: str = OLLAMA_CONFIG["model_name"], base_url: str = OLLAMA_CONFIG["base_url"]):
         # Check if a global model is set, and use it if available
@@ -93,28 +81,28 @@ class SlideGenerationService:
             
         self.model_name = model_name
         self.base_url = base_url
-        self.llm = self._initialize_model()
         self.pptx_generator = PowerPointGenerator()
         logger.info(f"Initialized SlideGenerationService with model {model_name} at {base_url}")
         
-    def _initialize_model(self) -> Ollama:
-        # Check if a global model is set, and use it if available and different from current
-        global_model = global_model_config.get_model()
-        if global_model and global_model != self.model_name:
-            self.model_name = global_model
-            logger.info(f"Updating to globally configured model: {self.model_name}")
-            
-        return Ollama(
-            model=self.model_name,
+    def _get_llm(self, model_name: Optional[str] = None) -> Ollama:
+        """Get a pooled client for this request; pooled clients must not be mutated."""
+        model_name = model_name or self.get_current_model()
+        return llm_pool.get(
+            model_name,
+            temperature=OLLAMA_CONFIG["temperature"],
             base_url=self.base_url,
-            temperature=OLLAMA_CONFIG["temperature"]
+            keep_alive=model_lifecycle.keep_alive_for(model_name),
         )
     
+    @property
+    def llm(self) -> Ollama:
+        """Client for the current default model."""
+        return self._get_llm()
+    
     def set_model(self, model_name: str) -> None:
-        """Change the model used for generation."""
+        """Change the default model used for requests that don't name one."""
         if model_name != self.model_name:
             self.model_name = model_name
-            self.llm = self._initialize_model()
             
             # Update the global model configuration
             global_model_config.set_model(model_name)
@@ -126,58 +114,25 @@ class SlideGenerationService:
         # Always check global config first
         global_model = global_model_config.get_model()
         if global_model and global_model != self.model_name:
-            # Update local model to match global model
-            self.set_model(global_model)
+            # Follow the global model without rebuilding clients
+            self.model_name = global_model
             
         return self.model_name
     
     def parse_document(self, file_content: bytes, file_type: str) -> str:
-        """Parse document content based on file type."""
-        if file_type == "pdf":
-            return self._parse_pdf(file_content)
-        elif file_type == "docx":
-            return self._parse_docx(file_content)
-        elif file_type in ["txt", "text"]:
-            return self._parse_txt(file_content)
-        else:
-            raise ValueError(f"Unsupported file type: {file_type}")
-
-    def _parse_pdf(self, file_content: bytes) -> str:
-        """Extract text from a PDF file."""
-        with io.BytesIO(file_content) as f:
-            reader = PdfReader(f)
-            text = ""
-            for page in reader.pages:
-                page_text = page.extract_text()
-                if page_text:  # Some pages might not have extractable text
-                    text += page_text + "\n\n"
-            return text
-
-    def _parse_docx(self, file_content: bytes) -> str:
-        """Extract text from a DOCX file."""
-        with io.BytesIO(file_content) as f:
-            doc = docx.Document(f)
-            text = ""
-            for paragraph in doc.paragraphs:
-                if paragraph.text:
-                    text += paragraph.text + "\n"
-            return text
-
-    def _parse_txt(self, file_content: bytes) -> str:
-        """Extract text from a TXT file."""
-        # Try to decode with UTF-8 first, fall back to other encodings if needed
-        try:
-            return file_content.decode("utf-8")
-        except UnicodeDecodeError:
-            try:
-                return file_content.decode("utf-16")
-            except UnicodeDecodeError:
-                try:
-                    return file_content.decode("cp1258")  # Vietnamese encoding
-                except UnicodeDecodeError:
-                    return file_content.decode("utf-8", errors="replace")
+        """Parse document content based on file type (see utils.document_parsers)."""
+        return document_parsers.parse(file_type, file_content)
     
-    def generate_slides(self, topic: str, num_slides: int, document_content: Optional[str] = None, system_prompt: Optional[str] = None) -> Dict[str, List[Dict[str, str]]]:
+    def generate_slides(
+        self,
+        topic: str,
+        num_slides: int,
+        document_content: Optional[str] = None,
+        system_prompt: Optional[str] = None,
+        use_cache: bool = True,
+        refresh_cache: bool = False,
+        model_name: Optional[str] = None,
+    ) -> Dict[str, List[Dict[str, str]]]:
         """Generate slides for a given topic.
         
         Args:
@@ -185,11 +140,15 @@ class SlideGenerationService:
             num_slides: Number of slides to generate
             document_content: Optional content from uploaded document to use as context
             system_prompt: Optional custom system prompt to override the default
+            use_cache: Whether to reuse a cached model response
+            refresh_cache: Whether to ignore any cached response and store a new one
+            model_name: Optional model for this request; defaults to the current model
             
         Returns:
             Dictionary containing the generated slides
         """
         try:
+            llm = self._get_llm(model_name)
             logger.info(f"Generating {num_slides} slides about topic: {topic}")
             # Add document content to the prompt if available
             additional_context = ""
@@ -208,6 +167,39 @@ class SlideGenerationService:
             intro = additional_context + "\n" if additional_context else ""
             prompt = f"{intro}{formatted_prompt}"
             
+            # Larger decks: outline first, then generate each slide concurrently
+            if FAN_OUT_CONFIG["enabled"] and num_slides >= FAN_OUT_CONFIG["min_slides"]:
+                try:
+                    slides_data, details = self._generate_fan_out(
+                        topic, num_slides, additional_context, system_prompt, use_cache, refresh_cache, llm
+                    )
+                    if slides_data:
+                        return self._finalize_slides(
+                            topic, slides_data, attempts=1, output_mode="fan_out", details=details
+                        )
+                    logger.warning("Outline produced no slides, falling back to single-call generation")
+                except AdmissionRejected:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Fan-out generation failed, falling back to single-call generation: {str(e)}")
+            
+            # Structured output constrains decoding to the slide schema, so the
+            # prompted retries below are only needed if it yields nothing usable
+            structured_attempts = 0
+            if STRUCTURED_OUTPUT:
+                structured_attempts = 1
+                try:
+                    slides_data = self._generate_structured(
+                        prompt, num_slides, system_prompt, use_cache, refresh_cache, llm
+                    )
+                    if slides_data:
+                        return self._finalize_slides(topic, slides_data, attempts=1, output_mode="structured")
+                    logger.warning("Structured output produced no slides, falling back to prompted JSON")
+                except AdmissionRejected:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Structured output failed, falling back to prompted JSON: {str(e)}")
+            
             # Try up to 3 times with increasing timeout/different approaches
             max_attempts = 3
             for attempt in range(max_attempts):
@@ -220,9 +212,9 @@ class SlideGenerationService:
                     if attempt > 0:
                         # Add a stronger reminder to provide valid JSON
                         enhanced_prompt = prompt + f"\n\nIMPORTANT: Your response must be ONLY a valid JSON array. No explanations, no additional text. ONLY valid JSON array like: [{{'title': 'Title', 'content': ['- Point 1', '- Point 2']}}]"
-                        response = self._invoke_model(enhanced_prompt, system_prompt)
+                        response = self._invoke_model(enhanced_prompt, system_prompt, use_cache, refresh_cache, llm)
                     else:
-                        response = self._invoke_model(prompt, system_prompt)
+                        response = self._invoke_model(prompt, system_prompt, use_cache, refresh_cache, llm)
                     
                     # Parse and validate JSON - catch potential issues early
                     try:
@@ -248,48 +240,13 @@ class SlideGenerationService:
                         else:
                             raise ValueError("Model returned empty slides array")
                     
-                    # Clean and validate content
-                    slides_data = validate_slide_content(slides_data)
-                    
-                    # Normalize slide dictionaries to use "title_text" for PPTX generator
-                    for slide in slides_data:
-                        # Map "title" to "title_text"
-                        if "title_text" not in slide and "title" in slide:
-                            slide["title_text"] = slide.pop("title")
-                        # Fallback: use any other key (except "text" and "images") as title
-                        if "title_text" not in slide:
-                            for key in list(slide.keys()):
-                                if key not in ("text", "images", "content"):
-                                    slide["title_text"] = slide.pop(key)
-                                    logger.debug(f"Falling back using \"{key}\" as title_text")
-                                    break
-                            
-                            # If still no title, add a default one
-                            if "title_text" not in slide:
-                                slide["title_text"] = f"Slide {slides_data.index(slide) + 1}"
-                        
-                        # Convert "content" list to "text" string for PowerPoint compatibility
-                        if "content" in slide and isinstance(slide["content"], list) and "text" not in slide:
-                            slide["text"] = "\n".join(slide["content"])
-                            logger.debug(f"Converted content list to text string: {slide['text']}")
-                        
-                        # Ensure each slide has content
-                        if "content" not in slide and "text" not in slide:
-                            slide["content"] = ["- No content available"]
-                            slide["text"] = "- No content available"
-                    
-                    logger.info(f"Successfully generated slides on attempt {attempt + 1}")
-                    
-                    # Save the slides without returning the path
-                    try:
-                        self._save_slides(topic, {"slides": slides_data})
-                    except Exception as save_error:
-                        logger.error(f"Error saving slides: {str(save_error)}")
-                        # Continue even if saving fails
-                    
-                    # Return only the slides data
-                    return {"slides": slides_data}
+                    return self._finalize_slides(
+                        topic, slides_data, attempts=structured_attempts + attempt + 1, output_mode="prompted"
+                    )
                     
+                except AdmissionRejected:
+                    # Overload is reported to the client rather than masked by fallback slides
+                    raise
                 except Exception as e:
                     logger.error(f"Attempt {attempt + 1} failed: {str(e)}")
                     if attempt == max_attempts - 1:
@@ -306,8 +263,13 @@ class SlideGenerationService:
                             pass
                             
                         # Return fallback slides
-                        return {"slides": fallback_slides}
+                        return {
+                            "slides": fallback_slides,
+                            "debug": {"attempts": structured_attempts + max_attempts, "output_mode": "fallback"},
+                        }
                     continue
+        except AdmissionRejected:
+            raise
         except Exception as e:
             logger.error(f"Error in generate_slides: {str(e)}", exc_info=True)
             # Return minimal fallback slides instead of raising
@@ -316,12 +278,233 @@ class SlideGenerationService:
             ]
             return {"slides": fallback_slides}
 
-    def _invoke_model(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+    def _finalize_slides(
+        self,
+        topic: str,
+        slides_data: List[Dict[str, Any]],
+        attempts: int,
+        output_mode: str,
+        details: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Normalize parsed slides for the PPTX generator, save them and build the result."""
+        # Clean and validate content
+        slides_data = validate_slide_content(slides_data)
+        
+        # Normalize slide dictionaries to use "title_text" for PPTX generator
+        for slide in slides_data:
+            # Map "title" to "title_text"
+            if "title_text" not in slide and "title" in slide:
+                slide["title_text"] = slide.pop("title")
+            # Fallback: use any other key (except "text" and "images") as title
+            if "title_text" not in slide:
+                for key in list(slide.keys()):
+                    if key not in ("text", "images", "content"):
+                        slide["title_text"] = slide.pop(key)
+                        logger.debug(f"Falling back using \"{key}\" as title_text")
+                        break
+        
+                # If still no title, add a default one
+                if "title_text" not in slide:
+                    slide["title_text"] = f"Slide {slides_data.index(slide) + 1}"
+        
+            # Convert "content" list to "text" string for PowerPoint compatibility
+            if "content" in slide and isinstance(slide["content"], list) and "text" not in slide:
+                slide["text"] = "\n".join(slide["content"])
+                logger.debug(f"Converted content list to text string: {slide['text']}")
+        
+            # Ensure each slide has content
+            if "content" not in slide and "text" not in slide:
+                slide["content"] = ["- No content available"]
+                slide["text"] = "- No content available"
+        
+        logger.info(f"Successfully generated slides on attempt {attempts} ({output_mode} output)")
+        
+        # Save the slides without returning the path
+        try:
+            self._save_slides(topic, {"slides": slides_data})
+        except Exception as save_error:
+            logger.error(f"Error saving slides: {str(save_error)}")
+            # Continue even if saving fails
+        
+        # Return the slides with the attempt count for the debug block
+        debug = {"attempts": attempts, "output_mode": output_mode}
+        debug.update(details or {})
+        return {"slides": slides_data, "debug": debug}
+        
+    def _generate_json(
+        self,
+        prompt: str,
+        schema: Dict[str, Any],
+        use_cache: bool,
+        refresh_cache: bool,
+        llm: Optional[Ollama] = None,
+    ) -> List[Dict[str, Any]]:
+        """Run a prompt through the invoker and parse the objects in the response.
+        
+        Decoding is constrained to the schema when structured output is enabled; the
+        tolerant parser covers prose around the JSON and output cut off by the token limit.
+        """
+        final_prompt = system_prompt_manager.apply_system_prompt(prompt, variables={"topic": "presentation"})
+        response_text = llm_invoker.invoke(
+            llm or self.llm, final_prompt, use_cache=use_cache, refresh_cache=refresh_cache,
+            priority=Priority.BATCH, response_format=schema if STRUCTURED_OUTPUT else None,
+            validate=_has_json_items
+        )
+        
+        parser = StreamingJSONArrayParser()
+        parser.feed(response_text)
+        items = parser.close()
+        if parser.repaired or parser.dropped:
+            logger.info(f"Slide JSON output needed repair (repaired={parser.repaired}, dropped={parser.dropped})")
+        return items
+
+    def _generate_fan_out(
+        self,
+        topic: str,
+        num_slides: int,
+        additional_context: str,
+        system_prompt: Optional[str] = None,
+        use_cache: bool = True,
+        refresh_cache: bool = False,
+        llm: Optional[Ollama] = None,
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Generate a deck as an outline call followed by concurrent per-slide calls.
+        
+        Slides whose call fails or returns nothing usable are retried individually;
+        a slide that still fails is built from its outline entry instead of
+        discarding the deck.
+        
+        Args:
+            topic: The topic to generate slides about
+            num_slides: Number of slides to generate
+            additional_context: Document context prepended to every prompt
+            system_prompt: Optional custom system prompt to override the default
+            use_cache: Whether to reuse cached model responses
+            refresh_cache: Whether to ignore cached responses and store new ones
+            llm: Client to use; defaults to the current model's client
+        
+        Returns:
+            Tuple of (slides, details for the debug block); slides is empty if the
+            outline could not be generated
+        """
+        intro = additional_context + "\n" if additional_context else ""
+        outline_prompt = OUTLINE_PROMPT.replace("{num_slides}", str(num_slides)).replace("{topic}", topic)
+        outline_schema = dict(OUTLINE_SCHEMA, minItems=num_slides, maxItems=num_slides)
+        outline = [
+            entry for entry in self._generate_json(
+                f"{intro}{outline_prompt}", outline_schema, use_cache, refresh_cache, llm
+            )
+            if entry.get("title")
+        ][:num_slides]
+        if not outline:
+            return [], {}
+        logger.info(f"Generated outline with {len(outline)} slides, generating content concurrently")
+        
+        outline_text = "\n".join(f"{i + 1}. {entry['title']}" for i, entry in enumerate(outline))
+        
+        def generate_slide(index: int) -> Dict[str, Any]:
+            entry = outline[index]
+            prompt = SLIDE_CONTENT_PROMPT.format(
+                slide_number=index + 1,
+                num_slides=len(outline),
+                topic=topic,
+                outline=outline_text,
+                title=entry["title"],
+                summary=entry.get("summary", ""),
+            )
+            items = self._generate_json(
+                f"{intro}{prompt}", SLIDE_SCHEMA["items"], use_cache, refresh_cache, llm
+            )
+            slide = next((item for item in items if item.get("content")), None)
+            if slide is None:
+                raise ValueError(f"No content generated for slide {index + 1}")
+            # Keep the outline's title so the deck stays consistent with it
+            slide["title"] = entry["title"]
+            return slide
+        
+        slides: List[Optional[Dict[str, Any]]] = [None] * len(outline)
+        pending = list(range(len(outline)))
+        retries = 0
+        for round_number in range(FAN_OUT_CONFIG["slide_retries"] + 1):
+            if round_number > 0:
+                retries += len(pending)
+                logger.info(f"Retrying {len(pending)} failed slides (round {round_number})")
+            results = fan_out(generate_slide, pending, max_workers=FAN_OUT_CONFIG["max_workers"])
+            failed = []
+            for index, result in zip(pending, results):
+                if isinstance(result, AdmissionRejected):
+                    raise result
+                if isinstance(result, Exception):
+                    logger.warning(f"Slide {index + 1} failed: {str(result)}")
+                    failed.append(index)
+                else:
+                    slides[index] = result
+            pending = failed
+            if not pending:
+                break
+        
+        # Slides that never succeeded fall back to their outline entry
+        for index in pending:
+            entry = outline[index]
+            slides[index] = {"title": entry["title"], "content": [f"- {entry.get('summary') or entry['title']}"]}
+        
+        details = {
+            "outline_slides": len(outline),
+            "slide_retries": retries,
+            "slides_from_outline": len(pending),
+        }
+        return [slide for slide in slides if slide is not None], details
+
+    def _generate_structured(
+        self,
+        prompt: str,
+        num_slides: int,
+        system_prompt: Optional[str] = None,
+        use_cache: bool = True,
+        refresh_cache: bool = False,
+        llm: Optional[Ollama] = None,
+    ) -> List[Dict[str, Any]]:
+        """Generate slides with decoding constrained to the slide JSON schema.
+        
+        Args:
+            prompt: The slide generation prompt
+            num_slides: Number of slides the schema requires
+            system_prompt: Optional custom system prompt to override the default
+            use_cache: Whether to reuse a cached model response
+            refresh_cache: Whether to ignore any cached response and store a new one
+            llm: Client to use; defaults to the current model's client
+        
+        Returns:
+            Parsed slide dictionaries; empty if nothing usable was generated
+        """
+        schema = dict(SLIDE_SCHEMA, minItems=num_slides, maxItems=num_slides)
+        items = self._generate_json(prompt, schema, use_cache, refresh_cache, llm)
+        
+        slides = []
+        for item in items:
+            # Some models wrap the array in an object despite the schema
+            if isinstance(item.get("slides"), list):
+                slides.extend(slide for slide in item["slides"] if isinstance(slide, dict))
+            else:
+                slides.append(item)
+        return [slide for slide in slides if slide.get("title") or slide.get("content")]
+
+    def _invoke_model(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        use_cache: bool = True,
+        refresh_cache: bool = False,
+        llm: Optional[Ollama] = None,
+    ) -> str:
         """Invoke the Ollama model with the given prompt.
         
         Args:
             prompt: The prompt to send to the model
             system_prompt: Optional custom system prompt to override the default
+            use_cache: Whether to reuse a cached model response
+            refresh_cache: Whether to ignore any cached response and store a new one
+            llm: Client to use; defaults to the current model's client
         
         Returns:
             Model response as a string
@@ -337,8 +520,11 @@ class SlideGenerationService:
                 final_prompt = system_prompt_manager.apply_system_prompt(prompt, variables={"topic": "presentation"})
                 logger.debug("Using default system prompt")
             
-            # Use the LangChain Ollama wrapper to invoke the model
-            response_text = self.llm(final_prompt)
+            # Invoke the model through the shared invocation layer (response cache aware)
+            response_text = llm_invoker.invoke(
+                llm or self.llm, final_prompt, use_cache=use_cache, refresh_cache=refresh_cache,
+                priority=Priority.BATCH, validate=_has_json_items
+            )
             
             # Clean the response text to extract valid JSON
             response_text = response_text.strip()
@@ -418,6 +604,8 @@ class SlideGenerationService:
             
             return response_text
             
+        except AdmissionRejected:
+            raise
         except Exception as e:
             logger.error(f"Failed to invoke model: {str(e)}")
             # Return a minimal valid JSON array as fallback instead of raising an exception
@@ -1,28 +1,35 @@
 """
-Measure model set/get latency for slide generation service.
+Measure model set/get latency for slide generation service, and first-token
+latency of the newly selected model right after each switch.
 """
 from __future__ import annotations
 
 import argparse
 import csv
+import json
 import time
 from pathlib import Path
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 import requests
 
 DEFAULT_BASE_URL = "http://localhost:8000/api"
+DEFAULT_OLLAMA_URL = "http://localhost:11434"
+DEFAULT_PROMPT = "Say hello."
 RESULT_DIR = Path(__file__).parent / "results"
 
 
-def set_model(base_url: str, model: str) -> Tuple[float, str]:
+def set_model(base_url: str, model: str, timeout: float) -> Tuple[float, Optional[float], str]:
+    """Switch models; /set-model now waits for the model to load, so allow for load time."""
     url = base_url.rstrip("/") + "/slides/set-model"
     start = time.perf_counter()
-    resp = requests.post(url, data={"model_name": model}, timeout=30)
+    resp = requests.post(url, data={"model_name": model}, timeout=timeout)
     elapsed_ms = (time.perf_counter() - start) * 1000
     if resp.status_code != 200:
-        return elapsed_ms, f"http {resp.status_code}: {resp.text[:200]}"
-    return elapsed_ms, "ok"
+        return elapsed_ms, None, f"http {resp.status_code}: {resp.text[:200]}"
+    warmup = resp.json().get("warmup") or {}
+    load_s = warmup.get("load_seconds")
+    return elapsed_ms, (load_s * 1000 if load_s is not None else None), "ok"
 
 
 def get_model(base_url: str) -> Tuple[str, float, str]:
@@ -36,11 +43,46 @@ def get_model(base_url: str) -> Tuple[str, float, str]:
     return str(payload.get("model_name", "")), elapsed_ms, "ok"
 
 
+def first_token(ollama_url: str, model: str, prompt: str, timeout: float) -> Tuple[float, float, float, str]:
+    """
+    Stream a short generation from Ollama and time the first non-empty token.
+
+    Returns (first_token_ms, total_ms, load_ms, status); load_ms is Ollama's reported
+    load_duration, which is ~0 when the model was already resident.
+    """
+    url = ollama_url.rstrip("/") + "/api/generate"
+    payload = {"model": model, "prompt": prompt, "stream": True, "options": {"num_predict": 16}}
+    first_ms = -1.0
+    load_ms = -1.0
+    start = time.perf_counter()
+    try:
+        with requests.post(url, json=payload, stream=True, timeout=timeout) as resp:
+            if resp.status_code != 200:
+                return -1.0, (time.perf_counter() - start) * 1000, -1.0, f"http {resp.status_code}: {resp.text[:200]}"
+            for line in resp.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if first_ms < 0 and chunk.get("response"):
+                    first_ms = (time.perf_counter() - start) * 1000
+                if chunk.get("done"):
+                    load_ms = chunk.get("load_duration", 0) / 1e6
+                    break
+    except requests.RequestException as e:
+        return -1.0, (time.perf_counter() - start) * 1000, -1.0, f"error: {e}"
+    total_ms = (time.perf_counter() - start) * 1000
+    return first_ms, total_ms, load_ms, "ok" if first_ms >= 0 else "no tokens"
+
+
 def main() -> None:
     parser = argparse.ArgumentParser()
     parser.add_argument("--base-url", default=DEFAULT_BASE_URL, help="Backend base URL (default: %(default)s)")
     parser.add_argument("--models", nargs="+", required=True, help="Models to toggle between (e.g., qwen3:4b-instruct-2507-q4_K_M llama3.1:8b)")
     parser.add_argument("--runs", type=int, default=10, help="Number of set/get cycles")
+    parser.add_argument("--ollama-url", default=DEFAULT_OLLAMA_URL, help="Ollama URL used to measure first-token latency (default: %(default)s)")
+    parser.add_argument("--prompt", default=DEFAULT_PROMPT, help="Prompt used for the first-token probe")
+    parser.add_argument("--skip-first-token", action="store_true", help="Only measure set/get latency")
+    parser.add_argument("--timeout", type=float, default=600, help="Timeout in seconds for set-model and generation (default: %(default)s)")
     args = parser.parse_args()
 
     RESULT_DIR.mkdir(parents=True, exist_ok=True)
@@ -48,12 +90,23 @@ def main() -> None:
 
     with out_csv.open("w", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
-        writer.writerow(["run_id", "model", "set_latency_ms", "get_latency_ms", "model_after_get", "status_set", "status_get"])
+        writer.writerow([
+            "run_id", "model", "set_latency_ms", "set_load_ms", "get_latency_ms", "model_after_get",
+            "first_token_ms", "generate_total_ms", "generate_load_ms", "status_set", "status_get", "status_generate",
+        ])
         for i in range(args.runs):
             model = args.models[i % len(args.models)]
-            set_ms, status_set = set_model(args.base_url, model)
+            set_ms, set_load_ms, status_set = set_model(args.base_url, model, args.timeout)
             current, get_ms, status_get = get_model(args.base_url)
-            writer.writerow([i, model, round(set_ms, 2), round(get_ms, 2), current, status_set, status_get])
+            if args.skip_first_token:
+                first_ms, total_ms, load_ms, status_generate = -1.0, -1.0, -1.0, "skipped"
+            else:
+                first_ms, total_ms, load_ms, status_generate = first_token(args.ollama_url, model, args.prompt, args.timeout)
+            writer.writerow([
+                i, model, round(set_ms, 2), round(set_load_ms, 2) if set_load_ms is not None else "",
+                round(get_ms, 2), current, round(first_ms, 2), round(total_ms, 2), round(load_ms, 2),
+                status_set, status_get, status_generate,
+            ])
             f.flush()
 
     print(f"Wrote results to {out_csv}")
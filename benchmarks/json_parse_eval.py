@@ -1,5 +1,6 @@
 """
-Benchmark JSON parse success rate for slide generation.
+Benchmark JSON parse success rate for slide generation, with generation attempts
+and tokens spent per run (read from the response debug block).
 Dataset format (JSONL): {"topic": "...", "num_slides": 8}
 """
 from __future__ import annotations
@@ -9,12 +10,13 @@ import csv
 import json
 import time
 from pathlib import Path
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 
 import requests
 
 DEFAULT_BASE_URL = "http://localhost:8000/api"
 RESULT_DIR = Path(__file__).parent / "results"
+FALLBACK_TITLE = "Error in Generation"
 
 
 def load_dataset(path: Path) -> List[dict]:
@@ -39,15 +41,29 @@ def validate_slides(payload: dict) -> Tuple[bool, str]:
             return False, f"slide_{i}_not_dict"
         if "title_text" not in slide:
             return False, f"slide_{i}_missing_title"
+        if slide["title_text"] == FALLBACK_TITLE:
+            return False, "fallback_slides"
         content = slide.get("content") or slide.get("text")
         if content is None:
             return False, f"slide_{i}_missing_content"
     return True, "ok"
 
 
-def call_generate(base_url: str, topic: str, num_slides: int) -> Tuple[dict, float, str]:
+def generation_stats(payload: dict) -> Dict[str, object]:
+    """Attempts, output mode and token counts from the response debug block."""
+    debug = payload.get("debug") or {}
+    generation = debug.get("generation") or {}
+    return {
+        "attempts": int(debug.get("attempts") or generation.get("calls") or 0),
+        "output_mode": debug.get("output_mode", ""),
+        "prompt_tokens": int(generation.get("prompt_tokens") or 0),
+        "output_tokens": int(generation.get("output_tokens") or 0),
+    }
+
+
+def call_generate(base_url: str, topic: str, num_slides: int, use_cache: bool) -> Tuple[dict, float, str]:
     url = base_url.rstrip("/") + "/slides/generate"
-    data = {"topic": topic, "num_slides": num_slides}
+    data = {"topic": topic, "num_slides": num_slides, "use_cache": str(use_cache).lower()}
     start = time.perf_counter()
     resp = requests.post(url, data=data, timeout=180)
     elapsed_ms = (time.perf_counter() - start) * 1000
@@ -65,6 +81,7 @@ def main() -> None:
     parser.add_argument("--dataset", required=True, help="Path to JSONL with topic/num_slides")
     parser.add_argument("--base-url", default=DEFAULT_BASE_URL, help="Backend base URL (default: %(default)s)")
     parser.add_argument("--runs", type=int, default=30, help="Total runs (if larger than dataset, cycles over)")
+    parser.add_argument("--use-cache", action="store_true", help="Allow cached responses (off by default so every run generates)")
     args = parser.parse_args()
 
     samples = load_dataset(Path(args.dataset))
@@ -76,17 +93,36 @@ def main() -> None:
 
     with out_csv.open("w", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
-        writer.writerow(["run_id", "topic", "num_slides", "latency_ms", "valid", "status"])
+        writer.writerow([
+            "run_id", "topic", "num_slides", "latency_ms", "valid", "status",
+            "attempts", "output_mode", "prompt_tokens", "output_tokens", "total_tokens",
+        ])
+        successes = 0
+        total_attempts = 0
+        total_tokens = 0
         for i in range(args.runs):
             sample = samples[i % len(samples)]
             topic = sample.get("topic") or ""
             num_slides = int(sample.get("num_slides", 10))
-            payload, latency_ms, status = call_generate(args.base_url, topic, num_slides)
+            payload, latency_ms, status = call_generate(args.base_url, topic, num_slides, args.use_cache)
             is_valid, reason = validate_slides(payload)
-            writer.writerow([i, topic, num_slides, round(latency_ms, 2), int(is_valid), reason if status == "ok" else status])
+            stats = generation_stats(payload)
+            tokens = stats["prompt_tokens"] + stats["output_tokens"]
+            successes += int(is_valid)
+            total_attempts += stats["attempts"]
+            total_tokens += tokens
+            writer.writerow([
+                i, topic, num_slides, round(latency_ms, 2), int(is_valid), reason if status == "ok" else status,
+                stats["attempts"], stats["output_mode"], stats["prompt_tokens"], stats["output_tokens"], tokens,
+            ])
             f.flush()
 
     print(f"Wrote results to {out_csv}")
+    print(f"Valid: {successes}/{args.runs}")
+    if successes:
+        print(f"Attempts per success: {total_attempts / successes:.2f}")
+        print(f"Tokens per success: {total_tokens / successes:.0f}")
+    print(f"Total tokens spent: {total_tokens}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,93 @@
+"""
+Benchmark document extraction backends: pages/sec and characters extracted
+for every installed backend registered for each file's MIME type.
+Runs in-process against utils.document_parsers; no backend server needed.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.document_parsers import MIME_FILE_TYPES, document_parsers  # noqa: E402
+
+RESULT_DIR = Path(__file__).parent / "results"
+SUPPORTED_SUFFIXES = {".pdf", ".docx", ".txt", ".md"}
+
+
+def collect_files(paths: List[str]) -> List[Path]:
+    files = []
+    for raw in paths:
+        path = Path(raw)
+        if path.is_dir():
+            files.extend(sorted(p for p in path.rglob("*") if p.suffix.lower() in SUPPORTED_SUFFIXES))
+        elif path.is_file():
+            files.append(path)
+    return files
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("paths", nargs="+", help="Files or folders of PDF/DOCX/TXT documents")
+    parser.add_argument("--repeats", type=int, default=3, help="Extractions per backend and file (default: %(default)s)")
+    args = parser.parse_args()
+
+    files = collect_files(args.paths)
+    if not files:
+        raise SystemExit("No documents found")
+
+    RESULT_DIR.mkdir(parents=True, exist_ok=True)
+    out_csv = RESULT_DIR / f"parser_backend_eval_{int(time.time())}.csv"
+
+    totals = {}
+    with out_csv.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow([
+            "file", "mime_type", "backend", "pages", "chars", "median_ms", "pages_per_sec", "status",
+        ])
+        for path in files:
+            content = path.read_bytes()
+            mime_type = document_parsers.detect_mime(content, path.name)
+            for backend in document_parsers.backends(mime_type):
+                if not backend.available():
+                    writer.writerow([path.name, mime_type, backend.name, 0, 0, "", "", "not_installed"])
+                    continue
+                timings = []
+                pages: List[str] = []
+                status = "ok"
+                try:
+                    for _ in range(max(1, args.repeats)):
+                        start = time.perf_counter()
+                        pages = backend.extract(content)
+                        timings.append(time.perf_counter() - start)
+                except Exception as exc:  # noqa: BLE001
+                    status = f"error: {exc}"
+                if status != "ok":
+                    writer.writerow([path.name, mime_type, backend.name, 0, 0, "", "", status])
+                    continue
+                median = statistics.median(timings)
+                pages_per_sec = len(pages) / median if median > 0 else 0.0
+                writer.writerow([
+                    path.name, mime_type, backend.name, len(pages), sum(len(page) for page in pages),
+                    round(median * 1000, 2), round(pages_per_sec, 1), status,
+                ])
+                f.flush()
+                total = totals.setdefault((mime_type, backend.name), [0, 0.0])
+                total[0] += len(pages)
+                total[1] += median
+
+    print(f"Wrote results to {out_csv}")
+    for (mime_type, name), (page_count, seconds) in sorted(totals.items()):
+        rate = page_count / seconds if seconds > 0 else 0.0
+        file_type = MIME_FILE_TYPES.get(mime_type, mime_type)
+        print(f"{file_type:<5} {name:<12} {page_count:>6} pages  {rate:>9.1f} pages/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -228,6 +228,7 @@ if st.button("🚀 Tạo Bài Trắc Nghiệm", type="primary"):
     else:
         # Biến để lưu trữ kết quả bên ngoài status block
         quiz_result = None
+        structured_questions = []
         elapsed_time = 0
         actual_questions = 0
         is_multi_document = False
@@ -277,6 +278,9 @@ if st.button("🚀 Tạo Bài Trắc Nghiệm", type="primary"):
                     st.json(quiz_result)
                     st.stop()
 
+                # Câu hỏi có cấu trúc từ backend (câu hỏi, phương án, đáp án, đoạn nguồn)
+                structured_questions = quiz_result.get("questions") or []
+                
                 # Đếm câu hỏi - kiểm tra cả định dạng tiếng Anh và tiếng Việt
                 english_questions = quiz_text.count("Question ")
                 vietnamese_questions = quiz_text.count("Câu ")
@@ -284,6 +288,8 @@ if st.button("🚀 Tạo Bài Trắc Nghiệm", type="primary"):
                 actual_questions = max(english_questions, vietnamese_questions)
                 if actual_questions == 0 and option_count > 0:
                     actual_questions = option_count
+                if structured_questions:
+                    actual_questions = len(structured_questions)
 
             except Exception as e:
                 status.update(label="❌ Lỗi", state="error", expanded=True)
@@ -305,11 +311,12 @@ if st.button("🚀 Tạo Bài Trắc Nghiệm", type="primary"):
                 </div>
             """, unsafe_allow_html=True)
 
+            # Định dạng văn bản cũ: tách câu hỏi từ nội dung thô
             quiz_content = quiz_text
             questions = []
             current = ""
 
-            lines = quiz_content.split('\n')
+            lines = quiz_content.split('\n') if not structured_questions else []
             for line in lines:
                 if re.match(r'^Question\s+\d+', line.strip()) or line.strip().startswith("Câu "):
                     if current:
@@ -329,7 +336,22 @@ if st.button("🚀 Tạo Bài Trắc Nghiệm", type="primary"):
                     continue
                 cleaned_questions.append(q)
 
-            if cleaned_questions:
+            if structured_questions:
+                for i, item in enumerate(structured_questions, 1):
+                    options = item.get("options", {})
+                    option_lines = "\n".join(f"{letter}. {options[letter]}" for letter in sorted(options))
+                    st.markdown(f"""
+                        <div style='background-color: #1e2130; padding: 15px; 
+                             border-radius: 10px; border-left: 4px solid var(--primary-color); 
+                             margin: 15px 0; box-shadow: 0 2px 4px rgba(0,0,0,0.2);'>
+                            <h4 style='color: var(--primary-color); margin-top: 0;'>Câu Hỏi {i}</h4>
+                            <div style='font-size: 1.1em; white-space: pre-line; color: #e6e6e6;'>{item.get("question", "")}\n{option_lines}\nĐáp án đúng: {item.get("answer", "")}</div>
+                        </div>
+                    """, unsafe_allow_html=True)
+                    if item.get("source"):
+                        with st.expander(f"📄 Đoạn nguồn của câu {i}"):
+                            st.text(item["source"])
+            elif cleaned_questions:
                 for i, question in enumerate(cleaned_questions, 1):
                     st.markdown(f"""
                         <div style='background-color: #1e2130; padding: 15px; 
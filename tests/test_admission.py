@@ -0,0 +1,69 @@
+"""AdmissionController slots, priorities and shedding."""
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from backend.model_management.admission import AdmissionController, AdmissionRejected, Priority  # noqa: E402
+
+
+def make_controller(**overrides):
+    options = dict(
+        default_concurrency=1,
+        model_concurrency={},
+        max_queue_depth=2,
+        queue_timeout_seconds=2.0,
+        retry_after_seconds=5,
+        enabled=True,
+    )
+    options.update(overrides)
+    return AdmissionController(**options)
+
+
+def test_full_queue_is_shed():
+    controller = make_controller(max_queue_depth=0)
+    controller.acquire("m")
+    with pytest.raises(AdmissionRejected) as excinfo:
+        controller.acquire("m")
+    assert excinfo.value.retry_after == 5
+    controller.release("m")
+    assert controller.acquire("m") == 0.0
+
+
+def test_queue_wait_times_out():
+    controller = make_controller(queue_timeout_seconds=0.05)
+    controller.acquire("m")
+    with pytest.raises(AdmissionRejected):
+        controller.acquire("m")
+
+
+def test_models_have_independent_slots():
+    controller = make_controller(max_queue_depth=0)
+    controller.acquire("a")
+    assert controller.acquire("b") == 0.0
+
+
+def test_higher_priority_waiter_is_admitted_first():
+    controller = make_controller(max_queue_depth=5)
+    controller.acquire("m")
+    order = []
+
+    def wait(priority):
+        with controller.admit("m", priority):
+            order.append(priority)
+
+    batch = threading.Thread(target=wait, args=(Priority.BATCH,))
+    batch.start()
+    while controller.stats()["models"]["m"]["queued"] < 1:
+        time.sleep(0.001)
+    interactive = threading.Thread(target=wait, args=(Priority.INTERACTIVE,))
+    interactive.start()
+    while controller.stats()["models"]["m"]["queued"] < 2:
+        time.sleep(0.001)
+
+    controller.release("m")
+    batch.join(2)
+    interactive.join(2)
+    assert order == [Priority.INTERACTIVE, Priority.BATCH]
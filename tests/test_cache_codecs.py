@@ -0,0 +1,96 @@
+"""Framed encoding of L2 cache values."""
+import fractions
+import os
+
+import pytest
+
+from utils import cache_codecs
+from utils.cache_codecs import CODEC_IDS, CacheCodec
+
+
+def codec_of(data: bytes) -> int:
+    return data[3]
+
+
+def compressor_of(data: bytes) -> int:
+    return data[4]
+
+
+def test_round_trips_with_the_cheapest_codec():
+    codec = CacheCodec()
+    assert codec.decode(codec.encode(b"\x00bytes")) == b"\x00bytes"
+    assert codec_of(codec.encode(b"x")) == CODEC_IDS["raw"]
+    assert codec.decode(codec.encode("Xin chào")) == "Xin chào"
+    assert codec_of(codec.encode("x")) == CODEC_IDS["text"]
+    value = {"answer": [1, 2.5, None, True, "ok"], "nested": {"k": "v"}}
+    assert codec.decode(codec.encode(value)) == value
+
+
+def test_json_fallback_returns_tuples_as_lists(monkeypatch):
+    monkeypatch.setattr(cache_codecs, "HAS_MSGPACK", False)
+    codec = CacheCodec()
+    data = codec.encode({"pair": (1, 2)})
+    assert codec_of(data) == CODEC_IDS["json"]
+    assert codec.decode(data) == {"pair": [1, 2]}
+
+
+def test_pickle_only_when_allowed():
+    value = fractions.Fraction(1, 3)
+    with pytest.raises(TypeError):
+        CacheCodec().encode(value)
+    pickling = CacheCodec(allow_pickle=True)
+    data = pickling.encode(value)
+    assert codec_of(data) == CODEC_IDS["pickle"]
+    assert pickling.decode(data) == value
+    # A reader without pickle refuses entries written by one with it
+    with pytest.raises(ValueError):
+        CacheCodec().decode(data)
+
+
+def test_large_compressible_payloads_are_compressed():
+    codec = CacheCodec(compression_min_bytes=1024)
+    text = "lặp lại " * 1000
+    data = codec.encode(text)
+    assert compressor_of(data) != 0
+    assert len(data) < len(text.encode("utf-8"))
+    assert codec.decode(data) == text
+    assert compressor_of(codec.encode("short")) == 0
+    assert compressor_of(CacheCodec(compression=False).encode(text)) == 0
+
+
+def test_incompressible_payload_is_stored_as_is():
+    codec = CacheCodec(compression_min_bytes=16)
+    data = codec.encode(os.urandom(4096))
+    assert compressor_of(data) == 0
+
+
+def test_unrecognized_frames_are_rejected():
+    codec = CacheCodec()
+    with pytest.raises(ValueError):
+        codec.decode(b"notacacheentry")
+    data = bytearray(codec.encode("x"))
+    data[3] = 99
+    with pytest.raises(ValueError):
+        codec.decode(bytes(data))
+
+
+def test_arrays_decode_as_read_only_views():
+    np = pytest.importorskip("numpy")
+    codec = CacheCodec(compression_min_bytes=1)
+    array = np.arange(12, dtype=np.float32).reshape(3, 4)
+    data = codec.encode(array)
+    assert codec_of(data) == CODEC_IDS["ndarray"]
+    assert compressor_of(data) == 0
+    decoded = codec.decode(data)
+    assert decoded.shape == (3, 4) and (decoded == array).all()
+    assert not decoded.flags.writeable
+
+
+def test_stats_and_timing_callback():
+    timings = []
+    codec = CacheCodec(on_timing=lambda *args: timings.append(args[:3]))
+    codec.decode(codec.encode("x"))
+    assert timings == [("encode", "text", "none"), ("decode", "text", "none")]
+    stats = codec.stats()
+    assert stats["codecs"]["encode:text"]["count"] == 1
+    assert stats["allow_pickle"] is False
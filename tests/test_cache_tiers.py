@@ -0,0 +1,94 @@
+"""Cache records, the in-memory L2 tier and keyed locks."""
+import asyncio
+import pickle
+import threading
+
+from utils import cache_tiers
+from utils.cache_tiers import AsyncKeyedLocks, CacheRecord, KeyedLocks, MemoryTier
+
+
+def test_record_windows():
+    record = CacheRecord("v", fresh_until=10.0, stale_until=20.0, compute_time=1.0)
+    assert record.is_fresh(9.9) and not record.is_fresh(10.0)
+    assert record.is_usable(15.0) and not record.is_usable(20.0)
+    assert record.remaining_ttl(15.0) == 5.0
+    assert pickle.loads(pickle.dumps(record)).__getstate__() == record.__getstate__()
+
+
+def test_early_refresh_needs_compute_time_and_grows_near_expiry(monkeypatch):
+    record = CacheRecord("v", fresh_until=100.0, stale_until=200.0, compute_time=2.0)
+    assert not CacheRecord("v", 100.0, 200.0).should_refresh_early(99.9, beta=1.0)
+    assert not record.should_refresh_early(99.9, beta=0)
+    # -log(1 - 0.5) * 2s ~ 1.39s early
+    monkeypatch.setattr(cache_tiers.random, "random", lambda: 0.5)
+    assert not record.should_refresh_early(98.0, beta=1.0)
+    assert record.should_refresh_early(99.0, beta=1.0)
+
+
+def test_memory_tier_expires_entries(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(cache_tiers.time, "monotonic", lambda: now[0])
+    tier = MemoryTier()
+    tier.set("a", b"1", ttl=10)
+    assert tier.get("a") == b"1"
+    assert asyncio.run(tier.aget("a")) == b"1"
+    now[0] = 10.0
+    assert tier.get("a") is None
+    tier.set("b", b"2", ttl=10)
+    asyncio.run(tier.adelete("b"))
+    assert tier.get("b") is None
+
+
+def test_memory_tier_sweeps_expired_keys(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(cache_tiers.time, "monotonic", lambda: now[0])
+    tier = MemoryTier()
+    for i in range(1023):
+        tier.set(f"old{i}", b"x", ttl=1)
+    now[0] = 5.0
+    tier.set("new", b"y", ttl=1)
+    assert list(tier._data) == ["new"]
+
+
+def test_keyed_locks_serialize_per_key_and_are_dropped():
+    locks = KeyedLocks()
+    assert locks.acquire("a")
+    assert not locks.acquire("a", blocking=False)
+    assert locks.acquire("b", blocking=False)
+    locks.release("b")
+
+    acquired = threading.Event()
+
+    def waiter():
+        locks.acquire("a")
+        acquired.set()
+        locks.release("a")
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    assert not acquired.wait(0.05)
+    locks.release("a")
+    thread.join(1)
+    assert acquired.is_set()
+    assert locks._locks == {}
+
+
+def test_async_keyed_locks():
+    async def scenario():
+        locks = AsyncKeyedLocks()
+        order = []
+
+        async def worker(name):
+            await locks.acquire("k")
+            order.append(name)
+            await asyncio.sleep(0)
+            order.append(name)
+            locks.release("k")
+
+        await asyncio.gather(worker(1), worker(2))
+        return order, locks
+
+    order, locks = asyncio.run(scenario())
+    assert order == [1, 1, 2, 2]
+    assert not locks.locked("k")
+    assert locks._locks == {}
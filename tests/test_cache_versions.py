@@ -0,0 +1,91 @@
+"""Generation counters and their sharing through Redis."""
+import threading
+import time
+
+from utils.cache_versions import CacheVersions, document_dependency, fingerprint
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.release = threading.Event()
+        self.release.set()
+        self.gets = 0
+
+    def get(self, key):
+        self.gets += 1
+        self.release.wait(5)
+        return self.values.get(key)
+
+    def incr(self, key):
+        self.values[key] = int(self.values.get(key, 0)) + 1
+        return self.values[key]
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+def test_bump_changes_token_of_dependency_only():
+    versions = CacheVersions()
+    versions.set_static("extractor", fingerprint("pypdf"))
+    doc = document_dependency("a")
+    before = versions.token(doc, "extractor")
+    other = versions.token(document_dependency("b"))
+    assert versions.bump(doc) == 1
+    assert versions.token(doc, "extractor") != before
+    assert versions.token(document_dependency("b")) == other
+    assert versions.static_token("extractor") == f"extractor={fingerprint('pypdf')}"
+
+
+def test_bumps_are_shared_through_redis():
+    redis = FakeRedis()
+    writer = CacheVersions()
+    reader = CacheVersions(refresh_interval=0)
+    writer.attach(redis, "p:")
+    reader.attach(redis, "p:")
+    assert writer.bump("model") == 1
+    assert writer.bump("model") == 2
+    assert redis.values == {"p:version:model": 2}
+
+    reader.generation("model")
+    wait_until(lambda: reader.generation("model") == 2)
+
+
+def test_a_slow_redis_read_never_blocks_generation():
+    redis = FakeRedis()
+    redis.values["p:version:model"] = 7
+    redis.release.clear()
+    versions = CacheVersions(refresh_interval=0)
+    versions.attach(redis, "p:")
+
+    start = time.monotonic()
+    assert versions.generation("model") == 0
+    wait_until(lambda: redis.gets == 1)
+    # The refresher is stuck in GET; readers still get the local counter at once
+    for _ in range(10):
+        assert versions.generation("model") == 0
+    assert versions.bump("other") == 1
+    assert time.monotonic() - start < 1.0
+
+    redis.release.set()
+    wait_until(lambda: versions.generation("model") == 7)
+
+
+def test_redis_errors_keep_local_counters():
+    class BrokenRedis:
+        def get(self, key):
+            raise ConnectionError("down")
+
+        def incr(self, key):
+            raise ConnectionError("down")
+
+    versions = CacheVersions(refresh_interval=0)
+    versions.attach(BrokenRedis(), "p:")
+    assert versions.bump("model") == 1
+    assert versions.bump("model") == 2
+    assert versions.generation("model") == 2
+    assert versions.stats()["shared"] is True
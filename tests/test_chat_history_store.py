@@ -0,0 +1,140 @@
+"""ChatHistoryStore caching and write-behind persistence."""
+import pytest
+
+from backend.document_analysis.chat_history_store import ChatHistoryStore
+
+
+class FakeRepo:
+    def __init__(self):
+        self.rows = []
+        self.reads = 0
+        self.during_read = None
+
+    def add_chat_entries(self, entries):
+        self.rows.extend(dict(entry) for entry in entries)
+        return len(entries)
+
+    def get_chat_history_by_document(self, document_id, limit=50, offset=0):
+        self.reads += 1
+        rows = [dict(row) for row in self.rows if row["document_id"] == document_id]
+        if self.during_read is not None:
+            # Whatever happens now is not visible to this read
+            hook, self.during_read = self.during_read, None
+            hook()
+        return rows[offset:offset + limit]
+
+    def delete_chat_history_by_document(self, document_id):
+        self.rows = [row for row in self.rows if row["document_id"] != document_id]
+        return True
+
+
+@pytest.fixture
+def repo():
+    return FakeRepo()
+
+
+@pytest.fixture
+def store(repo):
+    # Nothing is written unless a test flushes
+    return ChatHistoryStore(repo, max_items_per_document=5, batch_size=1000, flush_interval=60)
+
+
+def write_pending(store):
+    store._write(list(store._pending.values()))
+
+
+def test_pending_entries_are_read_before_they_are_written(store, repo):
+    entry = store.add("doc", "q1", "a1")
+    assert repo.rows == []
+    assert [row["id"] for row in store.get("doc")] == [entry["id"]]
+
+
+def test_history_is_served_from_cache_after_first_read(store, repo):
+    store.add("doc", "q1", "a1")
+    store.get("doc")
+    store.add("doc", "q2", "a2")
+    assert [row["user_query"] for row in store.get("doc")] == ["q1", "q2"]
+    assert repo.reads == 1
+
+
+def test_entry_written_during_a_read_is_not_lost(store, repo):
+    entry = store.add("doc", "q1", "a1")
+    repo.during_read = lambda: write_pending(store)
+    assert [row["id"] for row in store.get("doc")] == [entry["id"]]
+    assert [row["id"] for row in store.get("doc")] == [entry["id"]]
+
+
+def test_entry_added_and_written_during_a_read_is_not_cached_away(store, repo):
+    added = []
+
+    def add_and_write():
+        added.append(store.add("doc", "q1", "a1"))
+        write_pending(store)
+
+    repo.during_read = add_and_write
+    store.get("doc")
+    assert [row["id"] for row in store.get("doc")] == [added[0]["id"]]
+
+
+def test_long_history_is_paged_from_the_database(store, repo):
+    for number in range(7):
+        store.add("doc", f"q{number}", "a")
+    write_pending(store)
+    assert [row["user_query"] for row in store.get("doc", limit=3, offset=2)] == ["q2", "q3", "q4"]
+
+
+def test_delete_drops_cached_pending_and_stored_entries(store, repo):
+    store.add("doc", "q1", "a1")
+    write_pending(store)
+    store.add("doc", "q2", "a2")
+    store.get("doc")
+    assert store.delete_document("doc")
+    assert store.get("doc") == []
+
+
+def test_without_a_repository_history_is_bounded_in_memory():
+    store = ChatHistoryStore(max_items_per_document=2)
+    for number in range(3):
+        store.add("doc", f"q{number}", "a")
+    assert [row["user_query"] for row in store.get("doc")] == ["q1", "q2"]
+
+
+class FlakyRepo(FakeRepo):
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+        self.calls = 0
+
+    def add_chat_entries(self, entries):
+        self.calls += 1
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("database is locked")
+        return super().add_chat_entries(entries)
+
+
+def test_failed_write_is_retried_with_the_same_entries():
+    repo = FlakyRepo(failures=1)
+    store = ChatHistoryStore(repo, batch_size=1000, flush_interval=0.01)
+    store.add("doc", "q1", "a1")
+    store.add("doc", "q2", "a2")
+    store.flush()
+    store.close()
+
+    assert repo.calls == 2
+    assert [row["user_query"] for row in repo.rows] == ["q1", "q2"]
+    assert store.stats()["writer"] == {"pending": 0, "flushed": 2, "batches": 1, "failed": 0}
+    assert store._pending == {}
+    assert [row["user_query"] for row in store.get("doc")] == ["q1", "q2"]
+
+
+def test_dropped_batch_is_no_longer_pending():
+    repo = FlakyRepo(failures=2)
+    store = ChatHistoryStore(repo, batch_size=1000, flush_interval=0.01)
+    store.add("doc", "q1", "a1")
+    store.flush()
+    store.close()
+
+    assert repo.calls == 2
+    assert store.stats()["writer"]["failed"] == 1
+    assert store._pending == {}
@@ -0,0 +1,119 @@
+"""DOCX streaming extraction and the parser registry."""
+import io
+import zipfile
+
+import pytest
+
+from utils.cache_versions import EXTRACTOR, cache_versions
+from utils.document_parsers import (
+    PDF_MIME,
+    TEXT_MIME,
+    DocumentParserRegistry,
+    ExtractionBackend,
+    document_parsers,
+    extract_docx,
+    extract_text,
+)
+
+_W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+
+def make_docx(body: str) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr(
+            "word/document.xml",
+            f'<?xml version="1.0" encoding="UTF-8"?><w:document xmlns:w="{_W}"><w:body>{body}</w:body></w:document>',
+        )
+    return buffer.getvalue()
+
+
+def test_paragraphs_runs_tabs_and_breaks():
+    content = make_docx(
+        "<w:p><w:r><w:t>Hello</w:t></w:r><w:r><w:t xml:space=\"preserve\"> world</w:t></w:r></w:p>"
+        "<w:p/>"
+        "<w:p><w:r><w:t>a</w:t><w:tab/><w:t>b</w:t><w:br/><w:t>c</w:t></w:r></w:p>"
+    )
+    assert extract_docx(content) == ["Hello world\na\tb\nc\n"]
+
+
+def test_tab_stop_definitions_are_not_text():
+    content = make_docx(
+        "<w:p><w:pPr><w:tabs><w:tab w:val=\"left\" w:pos=\"720\"/><w:tab w:val=\"left\" w:pos=\"1440\"/>"
+        "</w:tabs></w:pPr><w:r><w:t>Hello</w:t></w:r></w:p>"
+    )
+    assert extract_docx(content) == ["Hello\n"]
+
+
+def test_table_cells_and_text_boxes_are_paragraphs():
+    content = make_docx(
+        "<w:tbl><w:tr><w:tc><w:p><w:r><w:t>cell</w:t></w:r></w:p></w:tc></w:tr></w:tbl>"
+        "<w:p><w:r><w:t>outer</w:t><w:pict><w:txbxContent>"
+        "<w:p><w:pPr><w:tabs><w:tab w:pos=\"720\"/></w:tabs></w:pPr><w:r><w:t>inner</w:t></w:r></w:p>"
+        "</w:txbxContent></w:pict></w:r></w:p>"
+    )
+    assert extract_docx(content) == ["cell\ninner\nouter\n"]
+
+
+def test_empty_document():
+    assert extract_docx(make_docx("")) == [""]
+
+
+@pytest.fixture(autouse=True)
+def restore_extractor_version():
+    # Every registry publishes its setup into the process-wide extractor version
+    version = cache_versions.static_version(EXTRACTOR)
+    yield
+    cache_versions.set_static(EXTRACTOR, version)
+
+
+def _registry():
+    registry = DocumentParserRegistry()
+    registry.register(ExtractionBackend("missing", PDF_MIME, lambda c: ["missing"], ("no_such_module_xyz",), priority=20))
+    registry.register(ExtractionBackend("plain", PDF_MIME, lambda c: ["one", "two"], priority=10))
+    registry.register(ExtractionBackend("text", TEXT_MIME, extract_text))
+    return registry
+
+
+def test_backend_for_skips_unavailable_backends():
+    registry = _registry()
+    assert [b.name for b in registry.backends("pdf")] == ["missing", "plain"]
+    assert registry.backend_for(".PDF").name == "plain"
+    assert registry.parse("pdf", b"%PDF") == "one\n\ntwo\n\n"
+    with pytest.raises(ValueError):
+        registry.backend_for("docx")
+
+
+def test_preferred_backend_and_fallback():
+    registry = _registry()
+    registry.register(ExtractionBackend("other", PDF_MIME, lambda c: ["other"], priority=0))
+    registry.set_preferred("pdf", "other")
+    assert registry.backend_for("application/pdf").name == "other"
+    registry.set_preferred("pdf", "missing")
+    assert registry.backend_for("pdf").name == "plain"
+    registry.set_preferred("pdf", "auto")
+    assert registry.backend_for("pdf").name == "plain"
+
+
+def test_changing_backends_changes_the_extractor_version():
+    registry = _registry()
+    before = cache_versions.token(EXTRACTOR)
+    registry.register(ExtractionBackend("other", PDF_MIME, lambda c: ["other"]))
+    assert cache_versions.token(EXTRACTOR) != before
+    before = cache_versions.token(EXTRACTOR)
+    registry.set_preferred("pdf", "other")
+    assert cache_versions.token(EXTRACTOR) != before
+
+
+def test_detect_by_magic_bytes_then_filename():
+    assert document_parsers.detect(b"%PDF-1.7 ...") == "pdf"
+    assert document_parsers.detect(make_docx("")) == "docx"
+    assert document_parsers.detect(b"PK\x03\x04 not a zip", "notes.txt") == "txt"
+    assert document_parsers.detect(b"plain", "report.pdf") == "pdf"
+    assert document_parsers.detect_mime(b"plain") == TEXT_MIME
+
+
+def test_parse_text_and_docx():
+    assert document_parsers.parse("txt", "Xin chào".encode("utf-8")) == "Xin chào"
+    content = make_docx("<w:p><w:r><w:t>Hello</w:t></w:r></w:p>")
+    assert document_parsers.parse("docx", content) == "Hello\n"
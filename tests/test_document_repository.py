@@ -0,0 +1,71 @@
+"""Document records keyed by content-based IDs."""
+import sqlite3
+import threading
+
+import pytest
+
+from utils import database
+from utils.repository import DocumentRepository
+
+
+@pytest.fixture(autouse=True)
+def db_path(tmp_path, monkeypatch):
+    path = tmp_path / "test.sqlite"
+    monkeypatch.setattr(database, "DB_PATH", path)
+    return path
+
+
+def insert(repo, user_id="user-1", path="/tmp/a.pdf"):
+    return repo.insert_or_get_document(
+        document_id="doc-1", user_id=user_id, filename="a.pdf", path=path, size=3, meta={"purpose": "test"}
+    )
+
+
+def test_second_insert_returns_the_existing_record():
+    repo = DocumentRepository()
+    first = insert(repo)
+    second = insert(repo, path="/tmp/other.pdf")
+    assert second["id"] == first["id"]
+    assert second["path"] == "/tmp/a.pdf"
+    assert second["meta"] == {"purpose": "test"}
+
+
+def test_concurrent_inserts_of_the_same_file_all_succeed():
+    repo = DocumentRepository()
+    # Every thread passes the existence check before any of them inserts
+    barrier = threading.Barrier(4)
+    check = repo.get_document_by_content_id
+    checked = threading.local()
+
+    def racing_check(document_id, user_id):
+        if not getattr(checked, "done", False):
+            checked.done = True
+            result = check(document_id, user_id)
+            barrier.wait(2)
+            return result
+        return check(document_id, user_id)
+
+    repo.get_document_by_content_id = racing_check
+    results, errors = [], []
+
+    def run():
+        try:
+            results.append(insert(repo))
+        except Exception as e:  # noqa: BLE001
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert errors == []
+    assert {result["id"] for result in results} == {"doc-1"}
+
+
+def test_same_id_owned_by_another_user_is_an_integrity_error():
+    repo = DocumentRepository()
+    insert(repo)
+    with pytest.raises(sqlite3.IntegrityError):
+        insert(repo, user_id="user-2")
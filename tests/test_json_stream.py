@@ -0,0 +1,44 @@
+"""StreamingJSONArrayParser on well-formed, chatty and truncated model output."""
+from backend.slide_generation.json_stream import StreamingJSONArrayParser, parse_json_objects
+
+
+def test_objects_complete_as_chunks_arrive():
+    parser = StreamingJSONArrayParser()
+    assert parser.feed('[{"title": "A", "content": ["x"]}, {"tit') == [{"title": "A", "content": ["x"]}]
+    assert parser.feed('le": "B"}]') == [{"title": "B"}]
+    assert parser.close() == [{"title": "A", "content": ["x"]}, {"title": "B"}]
+
+
+def test_prose_and_code_fences_are_skipped():
+    text = 'Here are your slides:\n```json\n[{"title": "A"}]\n```\nEnjoy!'
+    assert parse_json_objects(text) == [{"title": "A"}]
+
+
+def test_braces_inside_strings_do_not_split_objects():
+    assert parse_json_objects('[{"title": "a } b { c"}]') == [{"title": "a } b { c"}]
+
+
+def test_raw_newlines_and_trailing_commas_are_repaired():
+    parser = StreamingJSONArrayParser()
+    parser.feed('[{"title": "line one\nline two", "content": ["a", "b",],}]')
+    assert parser.close() == [{"title": "line one\nline two", "content": ["a", "b"]}]
+    assert parser.repaired == 1
+
+
+def test_truncated_final_object_is_salvaged():
+    parser = StreamingJSONArrayParser()
+    parser.feed('[{"title": "A"}, {"title": "B", "content": ["first", "sec')
+    assert parser.close() == [{"title": "A"}, {"title": "B", "content": ["first", "sec"]}]
+
+
+def test_dangling_key_is_dropped_when_salvaging():
+    parser = StreamingJSONArrayParser()
+    parser.feed('[{"title": "B", "notes"')
+    assert parser.close() == [{"title": "B"}]
+
+
+def test_unparseable_object_is_counted_and_dropped():
+    parser = StreamingJSONArrayParser()
+    parser.feed('[{"title": oops}, {"title": "ok"}]')
+    assert parser.close() == [{"title": "ok"}]
+    assert parser.dropped == 1
@@ -0,0 +1,65 @@
+"""LLMInvoker response caching."""
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("langchain_community")
+
+from backend.model_management.admission import AdmissionController  # noqa: E402
+from backend.model_management.llm_invoker import LLMInvoker  # noqa: E402
+from backend.model_management.response_cache import LLMResponseCache  # noqa: E402
+
+
+class FakeLLM:
+    model = "test-model"
+    temperature = 0.0
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def generate(self, prompts, **kwargs):
+        self.calls += 1
+        text = self.responses.pop(0)
+        return SimpleNamespace(generations=[[SimpleNamespace(text=text, generation_info={})]])
+
+
+@pytest.fixture
+def invoker():
+    cache = LLMResponseCache(backend="local", enabled=True)
+    return LLMInvoker(cache=cache, admission=AdmissionController(enabled=False))
+
+
+def test_identical_prompt_is_served_from_cache(invoker):
+    llm = FakeLLM(["first", "second"])
+    assert invoker.invoke(llm, "prompt") == "first"
+    assert invoker.invoke(llm, "prompt") == "first"
+    assert llm.calls == 1
+
+
+def test_use_cache_false_neither_reads_nor_writes(invoker):
+    llm = FakeLLM(["first", "second", "third"])
+    assert invoker.invoke(llm, "prompt", use_cache=False) == "first"
+    assert invoker.invoke(llm, "prompt") == "second"
+    assert invoker.invoke(llm, "prompt", use_cache=False) == "third"
+    assert llm.calls == 3
+
+
+def test_refresh_cache_replaces_the_stored_response(invoker):
+    llm = FakeLLM(["first", "second"])
+    invoker.invoke(llm, "prompt")
+    assert invoker.invoke(llm, "prompt", refresh_cache=True) == "second"
+    assert invoker.invoke(llm, "prompt") == "second"
+
+
+def is_json_array(text):
+    return text.startswith("[")
+
+
+def test_rejected_responses_are_not_cached(invoker):
+    llm = FakeLLM(["not json", "[1]"])
+    assert invoker.invoke(llm, "prompt", validate=is_json_array) == "not json"
+    assert invoker.invoke(llm, "prompt", validate=is_json_array) == "[1]"
+    assert invoker.invoke(llm, "prompt", validate=is_json_array) == "[1]"
+    assert llm.calls == 2
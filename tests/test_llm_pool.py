@@ -0,0 +1,91 @@
+"""Pooled Ollama clients and per-request model selection."""
+import threading
+
+import pytest
+
+pytest.importorskip("langchain_community")
+
+from backend.model_management import llm_pool as llm_pool_module
+from backend.model_management.llm_pool import LLMClientPool
+
+
+class FakeOllama:
+    def __init__(self, model, base_url, temperature, **options):
+        self.model = model
+        self.base_url = base_url
+        self.temperature = temperature
+        self.options = options
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(llm_pool_module, "Ollama", FakeOllama)
+    return LLMClientPool(base_url="http://ollama:11434", max_clients=3)
+
+
+def test_same_configuration_returns_the_same_client(pool):
+    client = pool.get("qwen", temperature=0.2, keep_alive="5m")
+    assert pool.get("qwen", temperature=0.2, keep_alive="5m") is client
+    assert pool.get("qwen", temperature=0.2, base_url="http://ollama:11434", keep_alive="5m") is client
+    assert client.model == "qwen" and client.options == {"keep_alive": "5m"}
+    assert pool.size() == 1
+
+
+def test_any_difference_gets_its_own_client(pool):
+    client = pool.get("qwen", temperature=0.2, keep_alive="5m")
+    others = [
+        pool.get("llama", temperature=0.2, keep_alive="5m"),
+        pool.get("qwen", temperature=0.7, keep_alive="5m"),
+        pool.get("qwen", temperature=0.2, keep_alive=-1),
+        pool.get("qwen", temperature=0.2, base_url="http://other:11434", keep_alive="5m"),
+    ]
+    assert all(other is not client for other in others)
+    assert len({id(other) for other in others}) == len(others)
+    # Building other clients never touched the first one
+    assert (client.model, client.temperature, client.options) == ("qwen", 0.2, {"keep_alive": "5m"})
+
+
+def test_pool_is_bounded_lru(pool):
+    first = pool.get("a")
+    pool.get("b")
+    pool.get("c")
+    assert pool.get("a") is first
+    pool.get("d")
+    assert pool.size() == 3
+    assert pool.get("a") is first
+    pool.clear()
+    assert pool.size() == 0
+
+
+def test_concurrent_requests_share_one_client(pool):
+    clients = []
+    barrier = threading.Barrier(8)
+
+    def worker():
+        barrier.wait()
+        clients.append(pool.get("qwen", temperature=0.1))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(client) for client in clients}) == 1
+
+
+def test_per_request_model_leaves_the_default_alone(pool, monkeypatch):
+    pytest.importorskip("pptx")
+    from backend.model_management.global_model_config import global_model_config
+    from backend.slide_generation import slide_service
+
+    monkeypatch.setattr(slide_service, "llm_pool", pool)
+    monkeypatch.setattr(global_model_config, "_model_name", "default-model")
+    service = slide_service.SlideGenerationService(model_name="default-model")
+
+    default_client = service._get_llm()
+    request_client = service._get_llm("other-model")
+    assert request_client.model == "other-model"
+    assert global_model_config.get_model() == "default-model"
+    assert service.get_current_model() == "default-model"
+    assert service._get_llm() is default_client
+    assert default_client.model == "default-model"
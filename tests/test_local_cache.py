@@ -0,0 +1,105 @@
+"""Byte-bounded SLRU local cache."""
+from utils import local_cache
+from utils.local_cache import LocalCache, estimate_size
+
+
+def test_set_get_delete():
+    cache = LocalCache(1000)
+    assert cache.set("a", "value", size=10)
+    assert cache.get("a") == "value"
+    assert cache.get("missing", default=1) == 1
+    assert cache.contains("a")
+    assert cache.delete("a")
+    assert not cache.delete("a")
+    assert cache.get("a") is None
+
+
+def test_entry_larger_than_budget_is_rejected():
+    cache = LocalCache(100)
+    assert not cache.set("big", "x", size=101)
+    assert cache.stats()["namespaces"]["*"]["rejections"] == 1
+    assert cache.stats()["evictions"] == 0
+
+
+def test_new_entry_does_not_evict_itself_when_protected_is_full():
+    evictions = []
+    cache = LocalCache(1000, on_evict=lambda namespace, count: evictions.append(count))
+    for i in range(8):
+        cache.set(f"hot{i}", i, size=100)
+        cache.get(f"hot{i}")
+    assert cache.stats()["namespaces"]["*"]["protected_bytes"] == 800
+
+    assert cache.set("big", "value", size=300)
+    assert cache.get("big") == "value"
+    assert cache.bytes <= 1000
+    # Only the least recently used protected entry made room
+    assert cache.get("hot0") is None
+    assert cache.get("hot1") == 1
+    assert sum(evictions) == 1
+    assert cache.stats()["namespaces"]["*"]["rejections"] == 0
+
+
+def test_one_off_entries_do_not_flush_the_working_set():
+    cache = LocalCache(1000)
+    cache.set("hot", "h", size=100)
+    cache.get("hot")
+    for i in range(50):
+        cache.set(f"cold{i}", i, size=100)
+    assert cache.get("hot") == "h"
+    assert cache.get("cold0") is None
+    assert cache.get("cold49") == 49
+
+
+def test_protected_share_demotes_least_recently_used():
+    cache = LocalCache(1000)
+    for i in range(9):
+        cache.set(f"k{i}", i, size=100)
+        cache.get(f"k{i}")
+    stats = cache.stats()["namespaces"]["*"]
+    assert stats["protected_bytes"] <= 800
+    assert stats["entries"] == 9
+
+
+def test_ttl_expires_lazily(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(local_cache.time, "monotonic", lambda: now[0])
+    cache = LocalCache(1000)
+    cache.set("a", 1, ttl=5, size=10)
+    assert cache.get("a") == 1
+    now[0] += 5
+    assert not cache.contains("a")
+    assert cache.get("a") is None
+    assert cache.stats()["namespaces"]["*"]["expirations"] == 1
+
+
+def test_namespaces_have_separate_budgets():
+    cache = LocalCache(1000, namespace_budgets={"indexes": 400})
+    cache.set("index", "i", namespace="indexes", size=300)
+    for i in range(10):
+        cache.set(f"r{i}", i, size=100)
+    assert cache.get("index", namespace="indexes") == "i"
+    assert cache.namespace_bytes("indexes") == 300
+    assert cache.namespace_bytes("responses") <= 600
+    assert not cache.set("huge", "h", namespace="indexes", size=500)
+
+
+def test_delete_matching_clear_and_stats():
+    cache = LocalCache(1000, namespace_budgets={"a": 200})
+    cache.set("doc:1:x", 1, size=10)
+    cache.set("doc:1:y", 2, namespace="a", size=10)
+    cache.set("doc:2:x", 3, size=10)
+    assert cache.delete_matching(lambda key: key.startswith("doc:1:")) == 2
+    assert len(cache) == 1
+    cache.get("doc:2:x")
+    cache.get("nope")
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"], stats["hits"], stats["misses"]) == (1, 10, 1, 1)
+    cache.clear()
+    assert len(cache) == 0 and cache.bytes == 0
+
+
+def test_estimate_size_counts_buffers_and_containers():
+    assert estimate_size(b"x" * 100) == 133
+    assert estimate_size(memoryview(b"x" * 100)) == 100
+    assert estimate_size({"key": b"x" * 1000}) > 1000
+    assert estimate_size([b"x" * 500, b"y" * 500]) > 1000
@@ -0,0 +1,129 @@
+"""Model warm-up coalescing, keep_alive settings and residency checks."""
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from backend.model_management.model_lifecycle import ModelLifecycleManager, ModelWarmupError
+
+
+def make_manager(**kwargs):
+    kwargs.setdefault("model_keep_alive", {})
+    return ModelLifecycleManager(base_url="http://ollama:11434/", **kwargs)
+
+
+def with_resident(manager, *names):
+    manager._resident = [{"name": name, "size_vram": 0, "expires_at": None} for name in names]
+    manager._resident_checked_at = time.monotonic()
+    return manager
+
+
+def test_concurrent_warmups_of_one_model_load_it_once():
+    manager = make_manager()
+    loads = []
+
+    async def load(model):
+        loads.append(model)
+        await asyncio.sleep(0.01)
+        return {"model": model}
+
+    manager._load = load
+
+    async def scenario():
+        results = await asyncio.gather(*(manager.warm("qwen") for _ in range(5)), manager.warm("llama"))
+        # Once finished, a later warm-up loads again
+        await manager.warm("qwen")
+        return results
+
+    results = asyncio.run(scenario())
+    assert loads == ["qwen", "llama", "qwen"]
+    assert results[:5] == [{"model": "qwen"}] * 5
+    assert manager._warmups == {}
+
+
+def test_failed_warmup_reaches_every_waiter():
+    manager = make_manager()
+    calls = []
+
+    async def load(model):
+        calls.append(model)
+        await asyncio.sleep(0.01)
+        raise ModelWarmupError(model, "out of memory")
+
+    manager._load = load
+
+    async def scenario():
+        return await asyncio.gather(manager.warm("qwen"), manager.warm("qwen"), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert calls == ["qwen"]
+    assert all(isinstance(result, ModelWarmupError) for result in results)
+
+
+def test_keep_alive_is_normalized():
+    manager = make_manager(default_keep_alive="30m", model_keep_alive={"big": "-1", "small": "300"})
+    assert manager.keep_alive_for("other") == "30m"
+    assert manager.keep_alive_for("big") == -1
+    assert manager.keep_alive_for("small") == 300
+    manager.set_keep_alive("other", 60)
+    assert manager.keep_alive_for("other") == 60
+    manager.set_keep_alive("other", "1h")
+    assert manager.keep_alive_for("other") == "1h"
+    assert make_manager(default_keep_alive="-1").keep_alive_for("x") == -1
+
+
+def test_is_resident_matches_implicit_latest_tag():
+    manager = with_resident(make_manager(), "qwen:latest", "llama3:8b")
+
+    async def check(*models):
+        return [await manager.is_resident(model) for model in models]
+
+    assert asyncio.run(check("qwen", "qwen:latest", "llama3:8b", "llama3", "mistral")) == [
+        True, True, True, False, False,
+    ]
+
+
+def test_ensure_warm_skips_resident_models():
+    manager = with_resident(make_manager(default_keep_alive="5m"), "qwen:latest")
+    loads = []
+
+    async def load(model):
+        loads.append(model)
+        return {"model": model}
+
+    manager._load = load
+    assert asyncio.run(manager.ensure_warm("qwen")) == {
+        "model": "qwen", "keep_alive": "5m", "already_resident": True,
+    }
+    assert asyncio.run(manager.ensure_warm("llama")) == {"model": "llama", "already_resident": False}
+    assert loads == ["llama"]
+
+
+def test_set_model_warms_before_switching(monkeypatch):
+    pytest.importorskip("fastapi")
+    from fastapi import HTTPException
+    from backend.api import simple_model_routes
+
+    events = []
+
+    class FakeLifecycle:
+        async def ensure_warm(self, model):
+            events.append(("warm", model, simple_model_routes.current_model))
+            if model == "broken":
+                raise ModelWarmupError(model, "not found")
+            return {"model": model}
+
+    monkeypatch.setattr(simple_model_routes, "model_lifecycle", FakeLifecycle())
+    monkeypatch.setattr(simple_model_routes, "current_model", "old")
+
+    asyncio.run(simple_model_routes.set_model(model_name="new"))
+    # The old model was still selected while the new one loaded
+    assert events == [("warm", "new", "old")]
+    assert simple_model_routes.current_model == "new"
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(simple_model_routes.set_model(model_name="broken"))
+    assert error.value.status_code == 502
+    assert simple_model_routes.current_model == "new"
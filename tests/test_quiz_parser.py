@@ -0,0 +1,43 @@
+"""Quiz text parsing and formatting."""
+from backend.document_analysis.quiz_parser import QuizQuestion, format_quiz, parse_quiz
+
+QUIZ = """Đây là bài kiểm tra:
+
+**Câu 1:** Thủ đô của Việt Nam
+là thành phố nào?
+A. Hà Nội
+B. Huế
+C. Đà Nẵng
+D. Cần Thơ
+Đáp án đúng: A
+
+Câu 2: Câu hỏi thiếu đáp án
+A. một
+B. hai
+C. ba
+D. bốn
+"""
+
+
+def test_parses_complete_questions_and_drops_incomplete_ones():
+    questions = parse_quiz(QUIZ)
+    assert len(questions) == 1
+    question = questions[0]
+    assert question.question == "Thủ đô của Việt Nam là thành phố nào?"
+    assert question.options == {"A": "Hà Nội", "B": "Huế", "C": "Đà Nẵng", "D": "Cần Thơ"}
+    assert question.answer == "A"
+
+
+def test_english_labels_are_accepted():
+    text = "Question 1: 2 + 2?\nA) 3\nB) 4\nC) 5\nD) 6\nCorrect answer: B"
+    assert [q.answer for q in parse_quiz(text)] == ["B"]
+
+
+def test_format_round_trips():
+    questions = parse_quiz(QUIZ)
+    assert parse_quiz(format_quiz(questions)) == questions
+
+
+def test_dict_round_trip():
+    question = QuizQuestion("Q?", {"A": "1", "B": "2", "C": "3", "D": "4"}, "C", "passage")
+    assert QuizQuestion.from_dict(question.to_dict()) == question
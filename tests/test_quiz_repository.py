@@ -0,0 +1,66 @@
+"""Quiz storage and lookup by request cache key."""
+import sqlite3
+
+import pytest
+
+from utils import database
+from utils.repository import QuizRepository
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    path = tmp_path / "test.sqlite"
+    monkeypatch.setattr(database, "DB_PATH", path)
+    return path
+
+
+def add_document(document_id="doc-1"):
+    with database.DatabaseConnection() as conn:
+        conn.execute(
+            "INSERT INTO documents (id, user_id, filename, path) VALUES (?, ?, ?, ?)",
+            (document_id, "user", "file.pdf", "/tmp/file.pdf"),
+        )
+        conn.commit()
+
+
+QUESTIONS = [{"question": "Q?", "options": {"A": "1", "B": "2", "C": "3", "D": "4"}, "answer": "A", "source": None}]
+
+
+def test_latest_quiz_is_found_by_cache_key(db_path):
+    add_document()
+    repo = QuizRepository()
+    repo.add_quiz("doc-1", "easy", QUESTIONS, meta={"cache_key": "k1"})
+    newer = repo.add_quiz("doc-1", "easy", QUESTIONS, meta={"cache_key": "k1"})
+    with database.DatabaseConnection() as conn:
+        conn.execute("UPDATE quizzes SET created_at = created_at + 10 WHERE id = ?", (newer["id"],))
+        conn.commit()
+
+    found = repo.get_quiz_by_cache_key("k1")
+    assert found["id"] == newer["id"]
+    assert found["questions"] == QUESTIONS
+    assert found["meta"]["cache_key"] == "k1"
+    assert repo.get_quiz_by_cache_key("other") is None
+
+
+def test_lookup_uses_the_cache_key_index(db_path):
+    with database.DatabaseConnection() as conn:
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM quizzes WHERE cache_key = ? ORDER BY created_at DESC LIMIT 1",
+            ("k",),
+        ).fetchall()
+    assert any("idx_quizzes_cache_key" in row["detail"] for row in plan)
+
+
+def test_quizzes_from_before_the_column_are_migrated(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE documents (id TEXT PRIMARY KEY, user_id TEXT NOT NULL, filename TEXT NOT NULL, "
+                 "path TEXT NOT NULL, content_type TEXT, size INTEGER, content TEXT, hash TEXT, meta TEXT, "
+                 "created_at INTEGER, updated_at INTEGER)")
+    conn.execute("CREATE TABLE quizzes (id TEXT PRIMARY KEY, document_id TEXT NOT NULL, questions_count INTEGER, "
+                 "difficulty TEXT, content TEXT, meta TEXT, created_at INTEGER, updated_at INTEGER)")
+    conn.execute("INSERT INTO quizzes VALUES ('old', 'doc-1', 1, 'easy', '[]', '{\"cache_key\": \"k-old\"}', 1, 1)")
+    conn.execute("INSERT INTO quizzes VALUES ('bad', 'doc-1', 1, 'easy', '[]', 'not json', 1, 1)")
+    conn.commit()
+    conn.close()
+
+    assert QuizRepository().get_quiz_by_cache_key("k-old")["id"] == "old"
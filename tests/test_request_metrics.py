@@ -0,0 +1,121 @@
+"""Request timing middleware labels."""
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("starlette")
+
+from starlette.routing import Match
+
+from backend.api import request_metrics
+from backend.api.request_metrics import RequestMetricsMiddleware, UNMATCHED_ROUTE, model_label, route_template
+from backend.model_management.telemetry import record_generation
+
+
+class FakeRoute:
+    def __init__(self, path, methods):
+        self.path = path
+        self.methods = methods
+
+    def matches(self, scope):
+        template = self.path.split("/")
+        parts = scope["path"].split("/")
+        if len(template) != len(parts) or any(
+            t != p and not t.startswith("{") for t, p in zip(template, parts)
+        ):
+            return Match.NONE, {}
+        return (Match.FULL if scope["method"] in self.methods else Match.PARTIAL), {}
+
+
+class FakeMetrics:
+    def __init__(self):
+        self.in_progress = []
+        self.durations = []
+
+    def record_request_in_progress(self, method, endpoint, delta):
+        self.in_progress.append((method, endpoint, delta))
+
+    def record_request_duration(self, method, endpoint, status_code, seconds, model):
+        self.durations.append((method, endpoint, status_code, model))
+
+
+ROUTES = [
+    FakeRoute("/api/documents/{document_id}", {"GET"}),
+    FakeRoute("/api/documents/{document_id}", {"DELETE"}),
+]
+
+
+def http_scope(method, path):
+    return {"type": "http", "method": method, "path": path}
+
+
+def test_route_template_uses_templates_not_paths():
+    assert route_template(ROUTES, http_scope("GET", "/api/documents/abc")) == "/api/documents/{document_id}"
+    # Wrong method still gets the template (it will answer 405)
+    assert route_template(ROUTES, http_scope("POST", "/api/documents/abc")) == "/api/documents/{document_id}"
+    assert route_template(ROUTES, http_scope("GET", "/nope")) == UNMATCHED_ROUTE
+
+
+def test_model_label():
+    assert model_label([]) == "none"
+    assert model_label(["qwen"]) == "qwen"
+    assert model_label(["qwen", "llama"]) == "multiple"
+
+
+def run(middleware, scope):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    return sent
+
+
+def test_requests_are_timed_with_status_and_model(monkeypatch):
+    metrics = FakeMetrics()
+    monkeypatch.setattr(request_metrics, "get_metrics", lambda: metrics)
+
+    async def app(scope, receive, send):
+        record_generation("qwen", cached=True)
+        await send({"type": "http.response.start", "status": 201})
+        await send({"type": "http.response.body", "body": b""})
+
+    sent = run(RequestMetricsMiddleware(app, ROUTES), http_scope("GET", "/api/documents/1"))
+    assert [message["type"] for message in sent] == ["http.response.start", "http.response.body"]
+    assert metrics.in_progress == [
+        ("GET", "/api/documents/{document_id}", 1),
+        ("GET", "/api/documents/{document_id}", -1),
+    ]
+    assert metrics.durations == [("GET", "/api/documents/{document_id}", 201, "qwen")]
+
+
+def test_failed_requests_are_recorded_as_500(monkeypatch):
+    metrics = FakeMetrics()
+    monkeypatch.setattr(request_metrics, "get_metrics", lambda: metrics)
+
+    async def app(scope, receive, send):
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        run(RequestMetricsMiddleware(app, ROUTES), http_scope("GET", "/missing"))
+    assert metrics.durations == [("GET", UNMATCHED_ROUTE, 500, "none")]
+
+
+def test_non_http_and_disabled_metrics_pass_through(monkeypatch):
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope["type"])
+
+    monkeypatch.setattr(request_metrics, "get_metrics", lambda: None)
+    run(RequestMetricsMiddleware(app, ROUTES), http_scope("GET", "/api/documents/1"))
+    metrics = FakeMetrics()
+    monkeypatch.setattr(request_metrics, "get_metrics", lambda: metrics)
+    run(RequestMetricsMiddleware(app, ROUTES), {"type": "lifespan"})
+    assert calls == ["http", "lifespan"]
+    assert metrics.durations == []
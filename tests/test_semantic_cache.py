@@ -0,0 +1,42 @@
+"""SemanticAnswerCache matching and scoping."""
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("fastapi")
+
+from backend.document_analysis.semantic_cache import SemanticAnswerCache  # noqa: E402
+
+
+class KeywordEmbeddings:
+    """Embeds text as counts of a few keywords, so similarity is predictable."""
+
+    WORDS = ("price", "color", "size")
+
+    def embed_documents(self, texts):
+        return [[text.lower().count(word) + 1e-3 for word in self.WORDS] for text in texts]
+
+
+@pytest.fixture
+def cache():
+    return SemanticAnswerCache(KeywordEmbeddings(), threshold=0.95)
+
+
+def test_paraphrase_hits_and_unrelated_question_misses(cache):
+    cache.store("doc-1", "model-a", "What is the price?", "10 USD", chat_id="c1")
+    hit = cache.lookup("doc-1", "model-a", "Tell me the price")
+    assert hit is not None
+    assert hit["answer"] == "10 USD"
+    assert hit["chat_id"] == "c1"
+    assert cache.lookup("doc-1", "model-a", "Which color is it?") is None
+
+
+def test_answers_are_scoped_by_document_and_model(cache):
+    cache.store("doc-1", "model-a", "What is the price?", "10 USD")
+    assert cache.lookup("doc-2", "model-a", "What is the price?") is None
+    assert cache.lookup("doc-1", "model-b", "What is the price?") is None
+
+
+def test_invalidate_drops_a_documents_answers(cache):
+    cache.store("doc-1", "model-a", "What is the price?", "10 USD")
+    cache.invalidate("doc-1")
+    assert cache.lookup("doc-1", "model-a", "What is the price?") is None
@@ -0,0 +1,61 @@
+"""SingleFlight coalescing."""
+import asyncio
+
+from utils.single_flight import SingleFlight, flight_key
+
+
+def test_flight_key_hashes_bytes_by_content():
+    assert flight_key("quiz", b"abc", 3) == flight_key("quiz", bytearray(b"abc"), 3)
+    assert flight_key("quiz", b"abc", 3) != flight_key("quiz", b"abd", 3)
+    assert flight_key(["a", "b"]) != flight_key(["ab"])
+
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight("test")
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"value": calls}
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", compute) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert calls == 1
+    assert results == [{"value": 1}] * 5
+    # Each caller gets its own copy to decorate
+    assert len({id(result) for result in results}) == 5
+    assert flight.stats()["coalesced"] == 4
+    assert flight.in_flight() == 0
+
+
+def test_disabled_runs_every_call():
+    flight = SingleFlight("test")
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", compute, enabled=False) for _ in range(3)))
+
+    assert sorted(asyncio.run(main())) == [1, 2, 3]
+
+
+def test_errors_reach_every_caller():
+    flight = SingleFlight("test")
+
+    async def compute():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", compute) for _ in range(2)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
@@ -0,0 +1,116 @@
+"""Outline-then-fan-out slide generation."""
+import json
+import re
+import threading
+
+import pytest
+
+pytest.importorskip("pptx")
+pytest.importorskip("langchain_community")
+
+from backend.model_management.admission import AdmissionRejected
+from backend.slide_generation import slide_service
+from backend.slide_generation.slide_service import SlideGenerationService
+
+TITLES = ["Giới thiệu", "Lịch sử", "Hiện trạng", "Thách thức", "Kết luận"]
+
+
+class FakeInvoker:
+    """Answers outline and per-slide prompts; failures maps a slide number to how it fails."""
+
+    def __init__(self, outline=TITLES, failures=None, single_call=None):
+        self.outline = outline
+        self.failures = dict(failures or {})
+        self.single_call = single_call or []
+        self.slide_calls = {}
+        self.single_calls = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, llm, prompt, **kwargs):
+        if "Create an outline" in prompt:
+            return json.dumps([{"title": title, "summary": f"Về {title}"} for title in self.outline])
+        match = re.search(r"You are writing slide (\d+) of", prompt)
+        if match is None:
+            with self._lock:
+                self.single_calls += 1
+            return json.dumps(self.single_call)
+        number = int(match.group(1))
+        with self._lock:
+            self.slide_calls[number] = self.slide_calls.get(number, 0) + 1
+            failure = self.failures.get(number)
+            if isinstance(failure, int) and failure > 0:
+                self.failures[number] = failure - 1
+                failure = "fail"
+        if isinstance(failure, Exception):
+            raise failure
+        if failure in ("fail", "always"):
+            return "xin lỗi, không có JSON"
+        return json.dumps({"title": "ignored", "content": [f"- nội dung {number}"]})
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setitem(slide_service.FAN_OUT_CONFIG, "enabled", True)
+    monkeypatch.setitem(slide_service.FAN_OUT_CONFIG, "min_slides", 4)
+    monkeypatch.setitem(slide_service.FAN_OUT_CONFIG, "max_workers", 4)
+    monkeypatch.setitem(slide_service.FAN_OUT_CONFIG, "slide_retries", 2)
+    service = SlideGenerationService(model_name="test-model")
+    monkeypatch.setattr(service, "_get_llm", lambda model_name=None: object())
+    monkeypatch.setattr(service, "_save_slides", lambda topic, slides: None)
+    return service
+
+
+def use_invoker(monkeypatch, invoker):
+    monkeypatch.setattr(slide_service, "llm_invoker", invoker)
+    return invoker
+
+
+def test_slides_come_back_in_outline_order(service, monkeypatch):
+    invoker = use_invoker(monkeypatch, FakeInvoker())
+    result = service.generate_slides("AI", 5)
+    assert [slide["title_text"] for slide in result["slides"]] == TITLES
+    assert [slide["text"] for slide in result["slides"]] == [f"- nội dung {n}" for n in range(1, 6)]
+    assert result["debug"]["output_mode"] == "fan_out"
+    assert result["debug"]["slide_retries"] == 0
+    assert invoker.slide_calls == {n: 1 for n in range(1, 6)}
+
+
+def test_failed_slide_is_retried(service, monkeypatch):
+    invoker = use_invoker(monkeypatch, FakeInvoker(failures={3: 1}))
+    result = service.generate_slides("AI", 5)
+    assert result["slides"][2]["text"] == "- nội dung 3"
+    assert result["debug"]["slide_retries"] == 1
+    assert result["debug"]["slides_from_outline"] == 0
+    assert invoker.slide_calls[3] == 2
+    assert invoker.slide_calls[1] == 1
+
+
+def test_slide_that_keeps_failing_is_built_from_its_outline_entry(service, monkeypatch):
+    invoker = use_invoker(monkeypatch, FakeInvoker(failures={2: "always"}))
+    result = service.generate_slides("AI", 5)
+    assert [slide["title_text"] for slide in result["slides"]] == TITLES
+    assert result["slides"][1]["text"] == "- Về Lịch sử"
+    assert result["debug"]["slides_from_outline"] == 1
+    assert result["debug"]["slide_retries"] == 2
+    assert invoker.slide_calls[2] == 3
+
+
+def test_empty_outline_falls_back_to_single_call(service, monkeypatch):
+    deck = [{"title": f"Slide {n}", "content": ["- điểm"]} for n in range(1, 5)]
+    invoker = use_invoker(monkeypatch, FakeInvoker(outline=[], single_call=deck))
+    monkeypatch.setattr(slide_service, "STRUCTURED_OUTPUT", True)
+    result = service.generate_slides("AI", 4)
+    assert result["debug"]["output_mode"] == "structured"
+    assert [slide["title_text"] for slide in result["slides"]] == [f"Slide {n}" for n in range(1, 5)]
+    assert invoker.slide_calls == {}
+    assert invoker.single_calls == 1
+
+
+def test_admission_rejection_in_a_worker_propagates(service, monkeypatch):
+    rejected = AdmissionRejected("test-model", "queue full", retry_after=10)
+    invoker = use_invoker(monkeypatch, FakeInvoker(failures={4: rejected}))
+    with pytest.raises(AdmissionRejected):
+        service.generate_slides("AI", 5)
+    # No retry round and no single-call fallback ran
+    assert invoker.slide_calls[4] == 1
+    assert invoker.single_calls == 0
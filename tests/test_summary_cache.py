@@ -0,0 +1,31 @@
+"""DocumentSummaryCache keys and eviction."""
+from backend.document_analysis.summary_cache import DocumentSummaryCache
+from utils.cache_versions import MODEL, cache_versions
+
+
+def test_key_depends_on_content_model_and_instructions():
+    key = DocumentSummaryCache.make_key("text", "m", None)
+    assert key == DocumentSummaryCache.make_key("text", "m", "")
+    assert key != DocumentSummaryCache.make_key("other", "m", None)
+    assert key != DocumentSummaryCache.make_key("text", "m2", None)
+    assert key != DocumentSummaryCache.make_key("text", "m", "be brief")
+
+
+def test_changing_the_default_model_invalidates_summaries():
+    cache = DocumentSummaryCache(max_entries=4)
+    cache.set(DocumentSummaryCache.make_key("text", "m"), "summary")
+    assert cache.get(DocumentSummaryCache.make_key("text", "m")) == "summary"
+    cache_versions.bump(MODEL)
+    assert cache.get(DocumentSummaryCache.make_key("text", "m")) is None
+
+
+def test_least_recently_used_summary_is_evicted():
+    cache = DocumentSummaryCache(max_entries=2)
+    keys = [DocumentSummaryCache.make_key(text, "m") for text in ("a", "b", "c")]
+    cache.set(keys[0], "A")
+    cache.set(keys[1], "B")
+    cache.get(keys[0])
+    cache.set(keys[2], "C")
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == "A"
+    assert cache.stats()["entries"] == 2
@@ -0,0 +1,133 @@
+"""Ollama token and timing telemetry."""
+import asyncio
+
+import pytest
+
+from backend.model_management import telemetry
+from backend.model_management.telemetry import (
+    generation_trace,
+    parse_generation_info,
+    record_generation,
+    request_models,
+    traced,
+)
+
+FINAL_CHUNK = {
+    "prompt_eval_count": 120,
+    "eval_count": 40,
+    "load_duration": 500_000_000,
+    "prompt_eval_duration": 250_000_000,
+    "eval_duration": 2_000_000_000,
+    "total_duration": 3_000_000_000,
+}
+
+
+class FakeMetrics:
+    def __init__(self):
+        self.generations = []
+
+    def record_llm_generation(self, **fields):
+        self.generations.append(fields)
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    fake = FakeMetrics()
+    monkeypatch.setattr(telemetry, "get_metrics", lambda: fake)
+    return fake
+
+
+def test_ollama_fields_become_tokens_and_seconds():
+    assert parse_generation_info(FINAL_CHUNK) == {
+        "prompt_tokens": 120,
+        "output_tokens": 40,
+        "load_seconds": 0.5,
+        "prefill_seconds": 0.25,
+        "decode_seconds": 2.0,
+        "ollama_total_seconds": 3.0,
+        "decode_tokens_per_second": 20.0,
+    }
+
+
+@pytest.mark.parametrize("info", [None, {}, {"eval_count": 7}, {"eval_count": None, "eval_duration": 0}])
+def test_missing_or_partial_fields_read_as_zero(info):
+    usage = parse_generation_info(info)
+    assert usage["prompt_tokens"] == 0
+    assert usage["decode_tokens_per_second"] == 0.0
+    assert usage["output_tokens"] == ((info or {}).get("eval_count") or 0)
+
+
+def test_generation_is_recorded_in_metrics_and_trace(metrics):
+    with generation_trace("documents/analyze") as trace, request_models() as models:
+        record = record_generation("qwen", FINAL_CHUNK, queue_wait_seconds=0.1234, wall_seconds=3.2)
+    assert record["prompt_tokens"] == 120 and record["queue_wait_seconds"] == 0.123
+    assert metrics.generations == [{
+        "model": "qwen",
+        "route": "documents/analyze",
+        "status": "success",
+        "duration": 3.2,
+        "prompt_tokens": 120,
+        "output_tokens": 40,
+        "prefill_seconds": 0.25,
+        "decode_tokens_per_second": 20.0,
+    }]
+    assert trace.generations == [record]
+    assert models == ["qwen"]
+
+
+def test_cached_and_partial_generations_do_not_raise(metrics):
+    with generation_trace("slides/generate") as trace:
+        record_generation("qwen", cached=True)
+        record_generation("qwen", {"eval_count": 3})
+        record_generation("qwen", None, status="error")
+    # Cache hits never reached Ollama, so only the other two are counted
+    assert [generation["status"] for generation in metrics.generations] == ["success", "error"]
+    summary = trace.summary()
+    assert (summary["calls"], summary["cached_calls"], summary["output_tokens"]) == (3, 1, 3)
+
+
+def test_traced_attaches_the_request_breakdown(metrics):
+    async def service_call():
+        record_generation("qwen", FINAL_CHUNK, wall_seconds=3.0)
+        record_generation("qwen", FINAL_CHUNK, wall_seconds=1.0, cached=True)
+        return {"result": "ok", "debug": {"kept": True}}
+
+    result = asyncio.run(traced("documents/analyze", service_call()))
+    debug = result["debug"]
+    assert debug["kept"] is True
+    generation = debug["generation"]
+    assert generation["route"] == "documents/analyze"
+    assert (generation["calls"], generation["cached_calls"]) == (2, 1)
+    assert (generation["prompt_tokens"], generation["output_tokens"]) == (120, 40)
+    assert (generation["prefill_seconds"], generation["decode_seconds"]) == (0.25, 2.0)
+    assert generation["wall_seconds"] == 4.0
+    # Non-dict results pass through untouched
+    assert asyncio.run(traced("x", asyncio.sleep(0, result="text"))) == "text"
+
+
+def test_generations_outside_a_request_are_still_counted(metrics):
+    record_generation("qwen", FINAL_CHUNK)
+    assert metrics.generations[0]["route"] == "unknown"
+
+
+def test_prometheus_histograms_receive_the_generation():
+    prometheus_client = pytest.importorskip("prometheus_client")
+    pytest.importorskip("psutil")
+    from utils.performance import PerformanceMetrics
+
+    metrics = PerformanceMetrics()
+    labels = {"model": "telemetry-test", "route": "documents/analyze"}
+
+    def sample(name, sample_labels=labels):
+        return prometheus_client.REGISTRY.get_sample_value(name, sample_labels) or 0.0
+
+    before = sample("ai_nvcb_llm_prompt_tokens_sum")
+    requests_before = sample("ai_nvcb_ollama_requests_total", {"model": "telemetry-test", "status": "success"})
+    usage = parse_generation_info(FINAL_CHUNK)
+    metrics.record_llm_generation(
+        model="telemetry-test", route="documents/analyze", status="success", duration=3.0,
+        prompt_tokens=usage["prompt_tokens"], output_tokens=usage["output_tokens"],
+        prefill_seconds=usage["prefill_seconds"], decode_tokens_per_second=usage["decode_tokens_per_second"],
+    )
+    assert sample("ai_nvcb_llm_prompt_tokens_sum") == before + 120
+    assert sample("ai_nvcb_ollama_requests_total", {"model": "telemetry-test", "status": "success"}) == requests_before + 1
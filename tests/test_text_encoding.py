@@ -0,0 +1,65 @@
+"""Encoding detection, decoding and the per-document encoding cache."""
+import codecs
+
+from utils import text_encoding
+from utils.text_encoding import EncodingCache, decode_bytes, detect_encoding, read_text_file
+
+VIETNAMESE = "Tiếng Việt có dấu\r\nDòng thứ hai\r\n"
+
+
+def test_byte_order_marks_win():
+    assert detect_encoding(codecs.BOM_UTF8 + b"abc") == "utf-8-sig"
+    assert detect_encoding(codecs.BOM_UTF16_LE + "abc".encode("utf-16-le")) == "utf-16"
+    assert detect_encoding(codecs.BOM_UTF32_LE + "abc".encode("utf-32-le")) == "utf-32"
+
+
+def test_utf16_without_bom_is_recognized():
+    assert detect_encoding("plain ascii text".encode("utf-16-le")) == "utf-16-le"
+    assert detect_encoding("plain ascii text".encode("utf-16-be")) == "utf-16-be"
+
+
+def test_utf8_cut_mid_character_is_utf8_unless_complete():
+    data = "Việ".encode("utf-8")[:-1]
+    assert detect_encoding(data) == "utf-8"
+    assert detect_encoding(data, complete=True) == text_encoding.FALLBACK_ENCODING
+
+
+def test_legacy_bytes_fall_back():
+    # cp1258 has precomposed vowels but writes tone marks as combining characters
+    data = "Ti\u00ea\u0301ng Vi\u00ea\u0323t\n".encode("cp1258")
+    text, encoding = decode_bytes(data)
+    assert encoding == "cp1258"
+    assert text == data.decode("cp1258")
+
+
+def test_decode_bytes_with_known_encoding_skips_detection():
+    text, encoding = decode_bytes("héllo".encode("latin-1"), encoding="latin-1")
+    assert (text, encoding) == ("héllo", "latin-1")
+
+
+def test_read_text_file_streams_and_translates_newlines(tmp_path, monkeypatch):
+    # Small chunks force multi-byte characters and \r\n pairs across reads
+    monkeypatch.setattr(text_encoding, "SAMPLE_BYTES", 5)
+    monkeypatch.setattr(text_encoding, "READ_CHUNK_BYTES", 3)
+    path = tmp_path / "doc.txt"
+    path.write_bytes((VIETNAMESE * 3).encode("utf-8"))
+
+    text, encoding = read_text_file(str(path))
+    assert encoding == "utf-8"
+    assert text == (VIETNAMESE * 3).replace("\r\n", "\n")
+
+    raw, _ = read_text_file(str(path), encoding="utf-8", translate_newlines=False)
+    assert raw == VIETNAMESE * 3
+
+
+def test_encoding_cache_is_bounded_lru():
+    cache = EncodingCache(max_entries=2)
+    cache.set(None, "utf-8")
+    assert cache.get(None) is None
+    cache.set("a", "utf-8")
+    cache.set("b", "cp1258")
+    cache.get("a")
+    cache.set("c", "utf-16")
+    assert cache.get("b") is None
+    assert cache.get("a") == "utf-8"
+    assert len(cache) == 2
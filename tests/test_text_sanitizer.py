@@ -0,0 +1,25 @@
+"""Chinese-character filtering and the streaming sanitizer."""
+from utils.text_sanitizer import StreamSanitizer, contains_chinese, is_chinese, remove_chinese, sanitize_text
+
+
+def test_cjk_characters_are_detected_but_vietnamese_is_not():
+    assert is_chinese("中")
+    assert is_chinese("\U00020000")
+    assert not is_chinese("ệ")
+    assert not is_chinese("a")
+    assert contains_chinese("Xin chào 你好")
+    assert not contains_chinese("Xin chào các bạn")
+
+
+def test_remove_and_sanitize():
+    assert remove_chinese("Hà 你好 Nội") == "Hà  Nội"
+    assert sanitize_text("  Hà 你好\n\tNội  ") == "Hà Nội"
+
+
+def test_streamed_output_matches_sanitize_text():
+    text = "  Câu trả lời 中文 là\n\n đây.  Tiếp 好 theo  "
+    for size in (1, 2, 3, 7, len(text)):
+        sanitizer = StreamSanitizer()
+        output = "".join(sanitizer.feed(text[i:i + size]) for i in range(0, len(text), size))
+        output += sanitizer.close()
+        assert output == sanitize_text(text)
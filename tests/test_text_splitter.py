@@ -0,0 +1,69 @@
+"""SpanTextSplitter chunk boundaries and TextBuffer page mapping."""
+import pytest
+
+pytest.importorskip("langchain")
+
+from langchain.schema import Document
+
+from backend.document_analysis.text_splitter import SpanTextSplitter, TextBuffer
+
+
+def test_overlap_must_be_smaller_than_chunk_size():
+    with pytest.raises(ValueError):
+        SpanTextSplitter(chunk_size=100, chunk_overlap=100)
+
+
+def test_short_text_is_one_chunk_without_surrounding_whitespace():
+    spans = SpanTextSplitter(chunk_size=100, chunk_overlap=10).split_text("  hello world \n")
+    assert list(spans.texts()) == ["hello world"]
+
+
+def test_chunks_respect_size_and_prefer_paragraph_breaks():
+    text = "\n\n".join(" ".join(f"w{p}{i}" for i in range(12)) for p in range(6))
+    spans = SpanTextSplitter(chunk_size=120, chunk_overlap=20).split_text(text)
+    texts = list(spans.texts())
+    assert len(texts) > 1
+    assert all(len(chunk) <= 120 for chunk in texts)
+    # Every chunk ends at a paragraph boundary or the end of the text
+    for span in spans:
+        assert span.end == len(text) or text[span.end:span.end + 2] == "\n\n"
+
+
+def test_consecutive_chunks_overlap_on_word_boundaries():
+    text = " ".join(f"word{i}" for i in range(200))
+    spans = SpanTextSplitter(chunk_size=100, chunk_overlap=30).split_text(text)
+    for previous, current in zip(spans, list(spans)[1:]):
+        assert current.start < previous.end
+        assert text[current.start - 1] == " "
+    # Together the chunks cover every word
+    words = set(" ".join(spans.texts()).split())
+    assert words == set(text.split())
+
+
+def test_text_without_separators_is_cut_hard():
+    spans = SpanTextSplitter(chunk_size=50, chunk_overlap=0).split_text("x" * 120)
+    assert [len(span) for span in spans] == [50, 50, 20]
+
+
+def test_spans_slice_and_map_back_to_pages():
+    pages = [
+        Document(page_content="first page " * 20, metadata={"page": 0, "source": "a.pdf"}),
+        Document(page_content="second page " * 20, metadata={"page": 1, "source": "a.pdf"}),
+    ]
+    spans = SpanTextSplitter(chunk_size=100, chunk_overlap=20).split_pages(pages, doc_id="doc")
+    assert spans[0].page == 0
+    assert spans[len(spans) - 1].page == 1
+    assert len(spans[:2]) == 2
+
+    document = spans[0].to_document(kind="chunk")
+    assert document.page_content == spans[0].text
+    assert document.metadata["doc_id"] == "doc"
+    assert document.metadata["source"] == "a.pdf"
+    assert document.metadata["kind"] == "chunk"
+
+
+def test_buffer_page_at_uses_page_starts():
+    buffer = TextBuffer("aaaa\n\nbbbb", page_starts=(0, 6), page_numbers=(3, 4))
+    assert buffer.page_at(0) == 3
+    assert buffer.page_at(5) == 3
+    assert buffer.page_at(6) == 4
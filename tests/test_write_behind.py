@@ -0,0 +1,60 @@
+"""WriteBehindQueue batching, retries and shutdown."""
+import threading
+
+from utils.write_behind import WriteBehindQueue
+
+
+def test_records_are_flushed_in_batches():
+    batches = []
+    queue = WriteBehindQueue(batches.append, batch_size=3, flush_interval=0.05)
+    for record in range(7):
+        queue.submit(record)
+    queue.flush()
+    assert [record for batch in batches for record in batch] == list(range(7))
+    assert all(len(batch) <= 3 for batch in batches)
+    assert queue.stats()["flushed"] == 7
+    queue.close()
+
+
+def test_failed_flush_is_retried_once_then_dropped():
+    attempts = []
+
+    def flaky(batch):
+        attempts.append(list(batch))
+        if batch == ["bad"] or len(attempts) == 1:
+            raise RuntimeError("database locked")
+
+    queue = WriteBehindQueue(flaky, batch_size=1, flush_interval=0.01)
+    queue.submit("good")
+    queue.flush()
+    queue.submit("bad")
+    queue.flush()
+    assert attempts == [["good"], ["good"], ["bad"], ["bad"]]
+    assert queue.stats()["flushed"] == 1
+    assert queue.stats()["failed"] == 1
+    queue.close()
+
+
+def test_close_drains_the_queue():
+    written = []
+    release = threading.Event()
+
+    def slow(batch):
+        release.wait(1)
+        written.extend(batch)
+
+    queue = WriteBehindQueue(slow, batch_size=2, flush_interval=0.01)
+    for record in range(5):
+        queue.submit(record)
+    release.set()
+    queue.close()
+    assert sorted(written) == list(range(5))
+
+
+def test_full_queue_writes_synchronously():
+    written = []
+    queue = WriteBehindQueue(written.extend, batch_size=10, flush_interval=60, max_queue=1)
+    queue._ensure_started = lambda: None  # no background thread drains the queue
+    queue.submit("queued")
+    queue.submit("overflow")
+    assert written == ["overflow"]
@@ -0,0 +1,247 @@
+"""
+Serialization of cached values for the shared (L2) cache tier.
+
+Each value is encoded by the cheapest codec that can represent it and framed
+with a small header naming the codec and the compressor:
+
+- raw bytes and UTF-8 text are stored as-is;
+- plain structures (dicts, lists, strings, numbers) use msgpack when it is
+  installed, JSON otherwise (tuples come back as lists);
+- numpy arrays are stored as a dtype/shape header plus their raw buffer, and
+  decoded with numpy.frombuffer over a memoryview of the cached bytes, so
+  reading an embedding matrix does not copy it (the array is read-only);
+- anything else is pickled, but only when pickle is explicitly allowed,
+  since unpickling data from a shared cache executes whatever it contains.
+
+Payloads above a size threshold are compressed with the fastest available
+compressor (lz4, then zstandard, then zlib) when that actually saves space.
+Arrays are never compressed, to keep zero-copy reads.
+"""
+
+import json
+import pickle
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+try:
+    import msgpack
+    HAS_MSGPACK = True
+except ImportError:
+    HAS_MSGPACK = False
+
+try:
+    import lz4.frame as lz4_frame
+    HAS_LZ4 = True
+except ImportError:
+    HAS_LZ4 = False
+
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+# magic, format version, codec id, compressor id
+_HEADER = struct.Struct("<2sBBB")
+_MAGIC = b"\xcac"
+_VERSION = 1
+# length of the JSON dtype/shape header that precedes an array's buffer
+_ARRAY_META = struct.Struct("<I")
+
+CODEC_IDS = {"raw": 1, "text": 2, "msgpack": 3, "json": 4, "ndarray": 5, "pickle": 6}
+CODEC_NAMES = {codec_id: name for name, codec_id in CODEC_IDS.items()}
+
+# Only keep a compressed payload that is at least this much smaller
+_MIN_COMPRESSION_GAIN = 0.9
+
+
+class _Compressor:
+    def __init__(self, name: str, compressor_id: int, compress: Callable[[bytes], bytes],
+                 decompress: Callable[[Buffer], bytes]):
+        self.name = name
+        self.id = compressor_id
+        self.compress = compress
+        self.decompress = decompress
+
+
+_NO_COMPRESSION = _Compressor("none", 0, bytes, bytes)
+_COMPRESSORS = {_NO_COMPRESSION.id: _NO_COMPRESSION}
+_COMPRESSORS[1] = _Compressor("zlib", 1, lambda data: zlib.compress(data, 1), zlib.decompress)
+if HAS_LZ4:
+    _COMPRESSORS[2] = _Compressor("lz4", 2, lz4_frame.compress, lz4_frame.decompress)
+if HAS_ZSTD:
+    _COMPRESSORS[3] = _Compressor(
+        "zstd", 3,
+        zstandard.ZstdCompressor(level=1).compress,
+        lambda data: zstandard.ZstdDecompressor().decompress(data),
+    )
+
+
+def fastest_compressor() -> _Compressor:
+    for compressor_id in (2, 3, 1):
+        if compressor_id in _COMPRESSORS:
+            return _COMPRESSORS[compressor_id]
+    return _NO_COMPRESSION
+
+
+def _is_numpy_array(value: Any) -> bool:
+    value_type = type(value)
+    return value_type.__name__ == "ndarray" and value_type.__module__ == "numpy"
+
+
+def _is_plain(value: Any, allow_bytes: bool, depth: int = 0) -> bool:
+    """Whether value is made only of types msgpack/JSON round-trip."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return True
+    if isinstance(value, bytes):
+        return allow_bytes
+    if depth >= 32:
+        return False
+    if isinstance(value, (list, tuple)):
+        return all(_is_plain(item, allow_bytes, depth + 1) for item in value)
+    if isinstance(value, dict):
+        return all(
+            isinstance(key, str) and _is_plain(item, allow_bytes, depth + 1)
+            for key, item in value.items()
+        )
+    return False
+
+
+class CacheCodec:
+    """
+    Encodes cache values to framed bytes and back.
+
+    Args:
+        allow_pickle: Pickle values no safe codec can represent, and unpickle them on read
+        compression: Compress payloads of at least compression_min_bytes
+        compression_min_bytes: Size threshold for compression
+        on_timing: Called as on_timing(operation, codec, compressor, seconds, size) after each encode/decode
+    """
+
+    def __init__(
+        self,
+        allow_pickle: bool = False,
+        compression: bool = True,
+        compression_min_bytes: int = 16 * 1024,
+        on_timing: Optional[Callable[[str, str, str, float, int], None]] = None,
+    ):
+        self.allow_pickle = allow_pickle
+        self.compressor = fastest_compressor() if compression else _NO_COMPRESSION
+        self.compression_min_bytes = compression_min_bytes
+        self.on_timing = on_timing
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, str], Dict[str, float]] = {}
+
+    def _choose(self, value: Any) -> str:
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return "raw"
+        if isinstance(value, str):
+            return "text"
+        if _is_numpy_array(value) and not value.dtype.hasobject:
+            return "ndarray"
+        if HAS_MSGPACK and _is_plain(value, allow_bytes=True):
+            return "msgpack"
+        if _is_plain(value, allow_bytes=False):
+            return "json"
+        if self.allow_pickle:
+            return "pickle"
+        raise TypeError(f"No safe cache codec for {type(value).__name__} (pickle is disabled)")
+
+    def _encode_payload(self, codec: str, value: Any) -> Union[bytes, memoryview]:
+        if codec == "raw":
+            return value
+        if codec == "text":
+            return value.encode("utf-8")
+        if codec == "msgpack":
+            return msgpack.packb(value, use_bin_type=True)
+        if codec == "json":
+            return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        if codec == "ndarray":
+            import numpy as np
+            array = np.ascontiguousarray(value)
+            meta = json.dumps({"dtype": array.dtype.str, "shape": list(array.shape)}).encode("utf-8")
+            return b"".join((_ARRAY_META.pack(len(meta)), meta, memoryview(array).cast("B")))
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _decode_payload(self, codec: str, payload: memoryview) -> Any:
+        if codec == "raw":
+            return bytes(payload)
+        if codec == "text":
+            return str(payload, "utf-8")
+        if codec == "msgpack":
+            return msgpack.unpackb(payload, raw=False)
+        if codec == "json":
+            return json.loads(str(payload, "utf-8"))
+        if codec == "ndarray":
+            import numpy as np
+            (meta_length,) = _ARRAY_META.unpack_from(payload)
+            meta = json.loads(str(payload[_ARRAY_META.size:_ARRAY_META.size + meta_length], "utf-8"))
+            data = payload[_ARRAY_META.size + meta_length:]
+            return np.frombuffer(data, dtype=np.dtype(meta["dtype"])).reshape(meta["shape"])
+        if not self.allow_pickle:
+            raise ValueError("Refusing to unpickle a cache entry (pickle is disabled)")
+        return pickle.loads(payload)
+
+    def encode(self, value: Any) -> bytes:
+        """Encode a value to framed bytes; raises TypeError if no allowed codec fits."""
+        start = time.perf_counter()
+        codec = self._choose(value)
+        payload = self._encode_payload(codec, value)
+        compressor = _NO_COMPRESSION
+        if codec != "ndarray" and self.compressor is not _NO_COMPRESSION and len(payload) >= self.compression_min_bytes:
+            compressed = self.compressor.compress(bytes(payload))
+            if len(compressed) < len(payload) * _MIN_COMPRESSION_GAIN:
+                payload = compressed
+                compressor = self.compressor
+        data = b"".join((_HEADER.pack(_MAGIC, _VERSION, CODEC_IDS[codec], compressor.id), payload))
+        self._record("encode", codec, compressor.name, time.perf_counter() - start, len(data))
+        return data
+
+    def decode(self, data: Buffer) -> Any:
+        """Decode framed bytes; arrays are returned as read-only views of data."""
+        start = time.perf_counter()
+        view = memoryview(data)
+        magic, version, codec_id, compressor_id = _HEADER.unpack_from(view)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("Unrecognized cache entry format")
+        codec = CODEC_NAMES.get(codec_id)
+        compressor = _COMPRESSORS.get(compressor_id)
+        if codec is None or compressor is None:
+            raise ValueError(f"Unsupported cache entry (codec {codec_id}, compressor {compressor_id})")
+        payload = view[_HEADER.size:]
+        if compressor is not _NO_COMPRESSION:
+            payload = memoryview(compressor.decompress(payload))
+        value = self._decode_payload(codec, payload)
+        self._record("decode", codec, compressor.name, time.perf_counter() - start, len(view))
+        return value
+
+    def _record(self, operation: str, codec: str, compressor: str, seconds: float, size: int) -> None:
+        with self._lock:
+            stats = self._stats.setdefault((operation, codec), {"count": 0, "seconds": 0.0, "bytes": 0})
+            stats["count"] += 1
+            stats["seconds"] += seconds
+            stats["bytes"] += size
+        if self.on_timing is not None:
+            self.on_timing(operation, codec, compressor, seconds, size)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            per_codec = {
+                f"{operation}:{codec}": {
+                    "count": int(stats["count"]),
+                    "bytes": int(stats["bytes"]),
+                    "avg_ms": round(stats["seconds"] * 1000 / stats["count"], 3) if stats["count"] else 0.0,
+                }
+                for (operation, codec), stats in sorted(self._stats.items())
+            }
+        return {
+            "compressor": self.compressor.name,
+            "compression_min_bytes": self.compression_min_bytes,
+            "allow_pickle": self.allow_pickle,
+            "codecs": per_codec,
+        }
@@ -0,0 +1,309 @@
+"""
+Shared (L2) cache tiers and the bookkeeping CacheManager needs to avoid stampedes.
+
+CacheManager keeps hot entries in its in-process LocalCache (L1) and shares
+them across workers through an L2 tier: Redis in production, or MemoryTier,
+an in-process stand-in with the same interface, in tests and single-process
+deployments. Values are stored as CacheRecords, which carry the freshness
+window, the stale window and how long the value took to compute, so any
+worker can decide whether to serve, serve stale, or refresh early.
+"""
+
+import asyncio
+import logging
+import math
+import random
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds a Redis command or connect may take before the cache treats Redis as unavailable
+REDIS_SOCKET_TIMEOUT = 5.0
+REDIS_SOCKET_CONNECT_TIMEOUT = 5.0
+
+try:
+    import redis
+    HAS_REDIS = True
+except ImportError:
+    HAS_REDIS = False
+
+# redis-py >= 4.2 ships the asyncio client that replaced aioredis
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:
+    try:
+        import aioredis as redis_asyncio
+    except ImportError:
+        redis_asyncio = None
+
+
+class CacheRecord:
+    """A cached value with its freshness window (wall-clock seconds, shared across workers)."""
+    __slots__ = ("value", "fresh_until", "stale_until", "compute_time")
+
+    def __init__(self, value: Any, fresh_until: float, stale_until: float, compute_time: float = 0.0):
+        self.value = value
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+        self.compute_time = compute_time
+
+    def is_fresh(self, now: float) -> bool:
+        return now < self.fresh_until
+
+    def is_usable(self, now: float) -> bool:
+        """Fresh, or stale but still inside its stale-while-revalidate window."""
+        return now < self.stale_until
+
+    def should_refresh_early(self, now: float, beta: float) -> bool:
+        """
+        Probabilistic early expiration ("XFetch").
+
+        Each reader refreshes early with a probability that grows as expiry
+        approaches, scaled by how long the value took to compute, so one
+        request usually recomputes it shortly before it expires instead of
+        every request at once right after.
+        """
+        if beta <= 0 or self.compute_time <= 0:
+            return False
+        return now - self.compute_time * beta * math.log(1.0 - random.random()) >= self.fresh_until
+
+    def remaining_ttl(self, now: float) -> float:
+        return self.stale_until - now
+
+    def __getstate__(self) -> Tuple[Any, float, float, float]:
+        return (self.value, self.fresh_until, self.stale_until, self.compute_time)
+
+    def __setstate__(self, state: Tuple[Any, float, float, float]) -> None:
+        self.value, self.fresh_until, self.stale_until, self.compute_time = state
+
+
+class MemoryTier:
+    """In-process stand-in for Redis with the same bytes-in, bytes-out interface."""
+
+    name = "memory"
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[bytes, float]] = {}
+        self._lock = threading.Lock()
+        self._sweep_at = 1024
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            data, expires = item
+            if expires <= time.monotonic():
+                del self._data[key]
+                return None
+            return data
+
+    def set(self, key: str, data: bytes, ttl: int) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._data[key] = (data, now + ttl)
+            # Superseded keys are never read again, so expire them in amortized sweeps like Redis does
+            if len(self._data) >= self._sweep_at:
+                for expired in [k for k, (_, expires) in self._data.items() if expires <= now]:
+                    del self._data[expired]
+                self._sweep_at = max(1024, 2 * len(self._data))
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    async def aget(self, key: str) -> Optional[bytes]:
+        return self.get(key)
+
+    async def aset(self, key: str, data: bytes, ttl: int) -> None:
+        self.set(key, data, ttl)
+
+    async def adelete(self, key: str) -> None:
+        self.delete(key)
+
+    @property
+    def connected(self) -> bool:
+        return True
+
+
+class RedisTier:
+    """
+    Redis-backed L2 with a sync and an async client.
+
+    The async client is created up front but only connects (and is pinged)
+    on its first use inside the event loop; if that fails, async callers fall
+    back to the sync client through a worker thread.
+    """
+
+    name = "redis"
+
+    def __init__(
+        self,
+        url: str,
+        socket_timeout: float = REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout: float = REDIS_SOCKET_CONNECT_TIMEOUT,
+    ):
+        self.url = url
+        self.client = None
+        self.async_client = None
+        self._async_checked = False
+
+        if HAS_REDIS:
+            try:
+                self.client = redis.from_url(
+                    url, socket_timeout=socket_timeout, socket_connect_timeout=socket_connect_timeout
+                )
+                self.client.ping()
+                logger.info("Redis cache client initialized")
+            except Exception as e:
+                logger.warning(f"Failed to initialize Redis cache: {e}")
+                self.client = None
+
+        if redis_asyncio is not None:
+            try:
+                self.async_client = redis_asyncio.from_url(
+                    url, socket_timeout=socket_timeout, socket_connect_timeout=socket_connect_timeout
+                )
+            except Exception as e:
+                logger.warning(f"Failed to create async Redis cache client: {e}")
+                self.async_client = None
+        else:
+            self._async_checked = True
+
+    async def _async(self):
+        if not self._async_checked:
+            self._async_checked = True
+            try:
+                await self.async_client.ping()
+                logger.info("Async Redis cache client initialized")
+            except Exception as e:
+                logger.warning(f"Failed to initialize async Redis cache: {e}")
+                self.async_client = None
+        return self.async_client
+
+    @property
+    def connected(self) -> bool:
+        return self.client is not None or self.async_client is not None
+
+    def get(self, key: str) -> Optional[bytes]:
+        if self.client is None:
+            return None
+        try:
+            return self.client.get(key)
+        except Exception as e:
+            logger.warning(f"Redis cache get error: {e}")
+            return None
+
+    def set(self, key: str, data: bytes, ttl: int) -> None:
+        if self.client is None:
+            return
+        try:
+            self.client.setex(key, ttl, data)
+        except Exception as e:
+            logger.warning(f"Redis cache set error: {e}")
+
+    def delete(self, key: str) -> None:
+        if self.client is None:
+            return
+        try:
+            self.client.delete(key)
+        except Exception as e:
+            logger.warning(f"Redis cache delete error: {e}")
+
+    async def aget(self, key: str) -> Optional[bytes]:
+        client = await self._async()
+        if client is None:
+            return await asyncio.to_thread(self.get, key)
+        try:
+            return await client.get(key)
+        except Exception as e:
+            logger.warning(f"Async Redis cache get error: {e}")
+            return None
+
+    async def aset(self, key: str, data: bytes, ttl: int) -> None:
+        client = await self._async()
+        if client is None:
+            await asyncio.to_thread(self.set, key, data, ttl)
+            return
+        try:
+            await client.setex(key, ttl, data)
+        except Exception as e:
+            logger.warning(f"Async Redis cache set error: {e}")
+
+    async def adelete(self, key: str) -> None:
+        client = await self._async()
+        if client is None:
+            await asyncio.to_thread(self.delete, key)
+            return
+        try:
+            await client.delete(key)
+        except Exception as e:
+            logger.warning(f"Async Redis cache delete error: {e}")
+
+
+class KeyedLocks:
+    """One threading.Lock per key, dropped once nobody holds or waits for it."""
+
+    def __init__(self):
+        self._locks: Dict[str, Tuple[threading.Lock, int]] = {}
+        self._guard = threading.Lock()
+
+    def acquire(self, key: str, blocking: bool = True) -> bool:
+        with self._guard:
+            lock, users = self._locks.get(key, (None, 0))
+            if lock is None:
+                lock = threading.Lock()
+            self._locks[key] = (lock, users + 1)
+        if lock.acquire(blocking):
+            return True
+        self._forget(key)
+        return False
+
+    def release(self, key: str) -> None:
+        with self._guard:
+            lock, _ = self._locks[key]
+        lock.release()
+        self._forget(key)
+
+    def _forget(self, key: str) -> None:
+        with self._guard:
+            lock, users = self._locks[key]
+            if users <= 1:
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, users - 1)
+
+
+class AsyncKeyedLocks:
+    """One asyncio.Lock per key for coroutines on the event loop."""
+
+    def __init__(self):
+        self._locks: Dict[str, Tuple[asyncio.Lock, int]] = {}
+
+    def locked(self, key: str) -> bool:
+        item = self._locks.get(key)
+        return item is not None and item[0].locked()
+
+    async def acquire(self, key: str) -> None:
+        lock, users = self._locks.get(key, (None, 0))
+        if lock is None:
+            lock = asyncio.Lock()
+        self._locks[key] = (lock, users + 1)
+        try:
+            await lock.acquire()
+        except BaseException:
+            self._forget(key)
+            raise
+
+    def release(self, key: str) -> None:
+        self._locks[key][0].release()
+        self._forget(key)
+
+    def _forget(self, key: str) -> None:
+        lock, users = self._locks[key]
+        if users <= 1:
+            del self._locks[key]
+        else:
+            self._locks[key] = (lock, users - 1)
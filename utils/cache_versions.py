@@ -0,0 +1,163 @@
+"""
+Generation counters for the things cached results depend on.
+
+Every cache key that depends on something mutable (the default model, the
+system prompt, the text extractor or splitter, a document, a CacheManager
+namespace) folds the current generation of that dependency into the key.
+Invalidating all entries that depend on it is then a single counter bump:
+old entries are simply never looked up again and age out of their cache,
+with no scan over keys.
+
+Counters live in the process. When CacheManager has a Redis tier it attaches
+its client, and counters are then incremented in Redis and re-read at most
+once per refresh interval, so all workers agree and a restart does not
+resurrect entries written before a bump. Reads from Redis happen on a
+background thread: generation() is called on the event loop and only ever
+looks at the in-process counters.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+MODEL = "model"
+SYSTEM_PROMPT = "system_prompt"
+EXTRACTOR = "extractor"
+SPLITTER = "splitter"
+
+
+def fingerprint(value: str) -> str:
+    """Short content hash for set_static, so tokens stay distinct across restarts."""
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()[:12]
+
+
+def document_dependency(document_id: str) -> str:
+    return f"document:{document_id}"
+
+
+def namespace_dependency(namespace: str) -> str:
+    return f"namespace:{namespace}"
+
+
+class CacheVersions:
+    """Per-dependency generation counters, optionally shared through Redis."""
+
+    def __init__(self, refresh_interval: float = 1.0):
+        self.refresh_interval = refresh_interval
+        self._generations: Dict[str, int] = {}
+        self._static: Dict[str, str] = {}
+        self._checked: Dict[str, float] = {}
+        self._shared: Optional[Any] = None
+        self._shared_prefix = ""
+        self._lock = threading.Lock()
+        # Dependencies due for a re-read from Redis, drained by the refresher thread
+        self._due: Set[str] = set()
+        self._wake = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+
+    def attach(self, client: Any, prefix: str) -> None:
+        """Share counters through a Redis client (anything with get() and incr())."""
+        with self._lock:
+            self._shared = client
+            self._shared_prefix = f"{prefix}version:"
+            self._checked.clear()
+            if self._refresher is None:
+                self._refresher = threading.Thread(target=self._refresh_loop, name="cache-versions", daemon=True)
+                self._refresher.start()
+
+    def set_static(self, dependency: str, version: Any) -> None:
+        """Fold a code-level version (e.g. an algorithm revision) into the dependency's token."""
+        with self._lock:
+            self._static[dependency] = str(version)
+
+    def static_version(self, dependency: str) -> Optional[str]:
+        with self._lock:
+            return self._static.get(dependency)
+
+    def _schedule_refresh(self, dependency: str) -> None:
+        """Queue a re-read of dependency from Redis if its last one is older than the interval."""
+        now = time.monotonic()
+        if self._shared is None or now - self._checked.get(dependency, float("-inf")) < self.refresh_interval:
+            return
+        self._checked[dependency] = now
+        self._due.add(dependency)
+        self._wake.set()
+
+    def _refresh_loop(self) -> None:
+        while True:
+            self._wake.wait()
+            with self._lock:
+                self._wake.clear()
+                due, self._due = self._due, set()
+                shared, prefix = self._shared, self._shared_prefix
+            for dependency in due:
+                self._read_shared(shared, prefix, dependency)
+
+    def _read_shared(self, shared: Any, prefix: str, dependency: str) -> None:
+        # The GET runs without the lock, so a slow Redis never blocks generation()
+        try:
+            value = int(shared.get(prefix + dependency) or 0)
+        except Exception as e:
+            logger.warning(f"Could not read cache version of {dependency}: {e}")
+            return
+        with self._lock:
+            if value > self._generations.get(dependency, 0):
+                self._generations[dependency] = value
+
+    def generation(self, dependency: str) -> int:
+        with self._lock:
+            self._schedule_refresh(dependency)
+            return self._generations.get(dependency, 0)
+
+    def bump(self, dependency: str) -> int:
+        """Invalidate everything keyed on dependency; returns its new generation."""
+        with self._lock:
+            shared, prefix = self._shared, self._shared_prefix
+        generation = 0
+        if shared is not None:
+            try:
+                generation = int(shared.incr(prefix + dependency))
+            except Exception as e:
+                logger.warning(f"Could not share cache version of {dependency}: {e}")
+        with self._lock:
+            generation = max(generation, self._generations.get(dependency, 0) + 1)
+            if shared is not None:
+                self._checked[dependency] = time.monotonic()
+            self._generations[dependency] = generation
+        logger.info(f"Cache generation of {dependency} is now {generation}")
+        return generation
+
+    def token(self, *dependencies: str) -> str:
+        """Version token for a set of dependencies, to fold into a cache key."""
+        parts = []
+        for dependency in dependencies:
+            generation = self.generation(dependency)
+            static = self._static.get(dependency)
+            parts.append(f"{dependency}={static}.{generation}" if static else f"{dependency}={generation}")
+        return ",".join(parts)
+
+    def static_token(self, *dependencies: str) -> str:
+        """
+        Token made of the dependencies' static versions only.
+
+        For keys persisted beyond the process (e.g. in the database), where an
+        in-process generation would restart from zero.
+        """
+        with self._lock:
+            return ",".join(f"{dependency}={self._static.get(dependency, '')}" for dependency in dependencies)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "shared": self._shared is not None,
+                "generations": dict(self._generations),
+                "static": dict(self._static),
+            }
+
+
+# Global instance shared by every cache in the process
+cache_versions = CacheVersions()
@@ -114,12 +114,27 @@ class DatabaseConnection:
             difficulty TEXT,
             content TEXT,
             meta TEXT,
+            cache_key TEXT,
             created_at INTEGER,
             updated_at INTEGER,
             FOREIGN KEY (document_id) REFERENCES documents(id) ON DELETE CASCADE
         )
         """)
         
+        # Quizzes stored before cache_key had its own column keep it in meta
+        cursor.execute("PRAGMA table_info(quizzes)")
+        if "cache_key" not in {column["name"] for column in cursor.fetchall()}:
+            cursor.execute("ALTER TABLE quizzes ADD COLUMN cache_key TEXT")
+            cursor.execute("""
+            UPDATE quizzes SET cache_key = json_extract(meta, '$.cache_key')
+            WHERE json_valid(meta)
+            """)
+        
+        # Identical quiz requests are looked up by cache_key on every quiz request
+        cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_quizzes_cache_key ON quizzes (cache_key, created_at)
+        """)
+        
         # Commit schema changes
         self.conn.commit()
     
@@ -0,0 +1,289 @@
+"""
+Text extraction for uploaded documents, shared by the analysis and slide services.
+
+Extraction backends are registered per MIME type. A backend's third-party
+dependency is only imported when the backend is first used, so optional
+engines cost nothing when they are not installed. For each MIME type the
+registry uses the deployment's preferred backend when it is available and
+otherwise the highest-priority one that is. PDF engines are tried in the
+order PyMuPDF, pypdfium2, pypdf. Set PDF_PARSER_BACKEND (or, more
+generally, DOCUMENT_PARSER_BACKENDS="application/pdf=pypdf,...") to pin one.
+
+DOCX files are read by streaming word/document.xml out of the zip through an
+incremental XML parser, so no document object model is built.
+"""
+
+import importlib.util
+import io
+import logging
+import os
+import threading
+import zipfile
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+from xml.etree.ElementTree import iterparse
+
+from utils.cache_versions import EXTRACTOR, cache_versions, fingerprint
+from utils.text_encoding import decode_bytes
+
+logger = logging.getLogger(__name__)
+
+PDF_MIME = "application/pdf"
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+TEXT_MIME = "text/plain"
+
+# Bump when extraction output changes, so text cached from older extractors is dropped
+EXTRACTOR_VERSION = 2
+
+# File extensions (as used by the API and services) and their MIME types
+FILE_TYPE_MIME_TYPES = {
+    "pdf": PDF_MIME,
+    "docx": DOCX_MIME,
+    "txt": TEXT_MIME,
+    "text": TEXT_MIME,
+    "md": TEXT_MIME,
+}
+MIME_FILE_TYPES = {PDF_MIME: "pdf", DOCX_MIME: "docx", TEXT_MIME: "txt"}
+
+# extract(content) -> text of each page
+Extractor = Callable[[bytes], List[str]]
+
+
+@dataclass
+class ExtractionBackend:
+    """One way of extracting text from a MIME type; higher priority is preferred."""
+    name: str
+    mime_type: str
+    extract: Extractor
+    requires: Tuple[str, ...] = ()
+    priority: int = 0
+
+    def available(self) -> bool:
+        """Whether the backend's modules can be imported (without importing them)."""
+        return all(importlib.util.find_spec(module) is not None for module in self.requires)
+
+
+# Backends import their dependency inside the function body
+
+def extract_pdf_pymupdf(content: bytes) -> List[str]:
+    import fitz
+
+    with fitz.open(stream=content, filetype="pdf") as document:
+        return [page.get_text() for page in document]
+
+
+def extract_pdf_pypdfium2(content: bytes) -> List[str]:
+    import pypdfium2
+
+    document = pypdfium2.PdfDocument(content)
+    try:
+        pages = []
+        for page in document:
+            text_page = page.get_textpage()
+            pages.append(text_page.get_text_range())
+            text_page.close()
+            page.close()
+        return pages
+    finally:
+        document.close()
+
+
+def extract_pdf_pypdf(content: bytes) -> List[str]:
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(content))
+    return [page.extract_text() or "" for page in reader.pages]
+
+
+_WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_W_P = _WORD_NS + "p"
+_W_PPR = _WORD_NS + "pPr"
+_W_T = _WORD_NS + "t"
+_W_TAB = _WORD_NS + "tab"
+_W_BR = _WORD_NS + "br"
+_W_CR = _WORD_NS + "cr"
+
+
+def extract_docx(content: bytes) -> List[str]:
+    """
+    Extract paragraph text from a DOCX file, one paragraph per line.
+
+    Text runs, tabs and line breaks are collected as the XML is parsed, and
+    each finished paragraph element is cleared so memory stays bounded by
+    the largest paragraph. Table cells and text boxes are paragraphs too and
+    are included.
+    """
+    lines: List[str] = []
+    # Paragraphs nest inside text boxes, so each open paragraph has its own buffer
+    open_paragraphs: List[List[str]] = []
+    # Tab stops and breaks under paragraph properties are formatting, not text
+    properties_depth = 0
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        with archive.open("word/document.xml") as xml_stream:
+            for event, element in iterparse(xml_stream, events=("start", "end")):
+                tag = element.tag
+                if event == "start":
+                    if tag == _W_P:
+                        open_paragraphs.append([])
+                    elif tag == _W_PPR:
+                        properties_depth += 1
+                    continue
+                if tag == _W_PPR:
+                    properties_depth -= 1
+                    continue
+                if not open_paragraphs or properties_depth:
+                    continue
+                if tag == _W_T:
+                    if element.text:
+                        open_paragraphs[-1].append(element.text)
+                elif tag == _W_TAB:
+                    open_paragraphs[-1].append("\t")
+                elif tag in (_W_BR, _W_CR):
+                    open_paragraphs[-1].append("\n")
+                elif tag == _W_P:
+                    text = "".join(open_paragraphs.pop())
+                    if text:
+                        lines.append(text)
+                    element.clear()
+    return ["\n".join(lines) + "\n" if lines else ""]
+
+
+def extract_text(content: bytes) -> List[str]:
+    """Decode a plain-text file (see utils.text_encoding)."""
+    text, _ = decode_bytes(content)
+    return [text]
+
+
+class DocumentParserRegistry:
+    """Extraction backends by MIME type, with per-deployment backend selection."""
+
+    def __init__(self, preferred: Optional[Dict[str, str]] = None):
+        self._backends: Dict[str, List[ExtractionBackend]] = {}
+        self._preferred: Dict[str, str] = dict(preferred or {})
+        self._selected: Dict[str, ExtractionBackend] = {}
+        self._lock = threading.Lock()
+        self._publish_version()
+
+    def _publish_version(self) -> None:
+        """Fold the backend setup into the extractor version of cache keys derived from extracted text."""
+        with self._lock:
+            setup = ";".join(
+                f"{mime_type}={self._preferred.get(mime_type, 'auto')}:{','.join(b.name for b in backends)}"
+                for mime_type, backends in sorted(self._backends.items())
+            )
+        cache_versions.set_static(EXTRACTOR, f"{EXTRACTOR_VERSION}-{fingerprint(setup)}")
+
+    def register(self, backend: ExtractionBackend) -> None:
+        with self._lock:
+            backends = self._backends.setdefault(backend.mime_type, [])
+            backends[:] = [b for b in backends if b.name != backend.name] + [backend]
+            backends.sort(key=lambda b: -b.priority)
+            self._selected.pop(backend.mime_type, None)
+        self._publish_version()
+
+    def set_preferred(self, mime_type: str, backend_name: Optional[str]) -> None:
+        """Pin the backend used for a MIME type; None or "auto" restores automatic choice."""
+        mime_type = self.mime_type_for(mime_type)
+        with self._lock:
+            if backend_name and backend_name != "auto":
+                self._preferred[mime_type] = backend_name
+            else:
+                self._preferred.pop(mime_type, None)
+            self._selected.pop(mime_type, None)
+        self._publish_version()
+        cache_versions.bump(EXTRACTOR)
+
+    def backends(self, mime_type: str) -> List[ExtractionBackend]:
+        """All backends registered for a MIME type, best first, available or not."""
+        return list(self._backends.get(self.mime_type_for(mime_type), []))
+
+    def backend_for(self, file_type: str) -> ExtractionBackend:
+        """The backend that will extract file_type (an extension or a MIME type)."""
+        mime_type = self.mime_type_for(file_type)
+        selected = self._selected.get(mime_type)
+        if selected is not None:
+            return selected
+
+        with self._lock:
+            candidates = self._backends.get(mime_type)
+            if not candidates:
+                raise ValueError(f"Unsupported file type: {file_type}")
+            preferred = self._preferred.get(mime_type)
+            available = [backend for backend in candidates if backend.available()]
+            selected = next((b for b in available if b.name == preferred), None)
+            if selected is None:
+                if preferred:
+                    logger.warning(f"Parser backend '{preferred}' for {mime_type} is not available; falling back")
+                if not available:
+                    raise ValueError(f"No parser backend installed for {mime_type}")
+                selected = available[0]
+            self._selected[mime_type] = selected
+        logger.info(f"Using '{selected.name}' to extract {mime_type}")
+        return selected
+
+    @staticmethod
+    def mime_type_for(file_type: str) -> str:
+        """Map an extension ("pdf", ".docx") to its MIME type; MIME types pass through."""
+        if "/" in file_type:
+            return file_type.lower()
+        extension = file_type.lower().lstrip(".")
+        return FILE_TYPE_MIME_TYPES.get(extension, extension)
+
+    def supports(self, file_type: str) -> bool:
+        return self.mime_type_for(file_type) in self._backends
+
+    @property
+    def mime_types(self) -> List[str]:
+        return sorted(self._backends)
+
+    def detect_mime(self, content: bytes, filename: Optional[str] = None) -> str:
+        """Detect the MIME type from magic bytes, falling back to the filename extension, then text."""
+        if content.startswith(b"%PDF"):
+            return PDF_MIME
+        if content.startswith(b"PK\x03\x04"):
+            try:
+                with zipfile.ZipFile(io.BytesIO(content)) as archive:
+                    if "word/document.xml" in archive.namelist():
+                        return DOCX_MIME
+            except zipfile.BadZipFile:
+                pass
+        if filename and "." in filename:
+            mime_type = FILE_TYPE_MIME_TYPES.get(filename.rsplit(".", 1)[-1].lower())
+            if mime_type in self._backends:
+                return mime_type
+        return TEXT_MIME
+
+    def detect(self, content: bytes, filename: Optional[str] = None) -> str:
+        """Detect the file type as an extension ("pdf", "docx" or "txt")."""
+        return MIME_FILE_TYPES[self.detect_mime(content, filename)]
+
+    def parse_pages(self, file_type: str, content: bytes) -> List[str]:
+        """Extract the text of each page."""
+        return self.backend_for(file_type).extract(content)
+
+    def parse(self, file_type: str, content: bytes) -> str:
+        """Extract the whole text, pages separated by blank lines."""
+        pages = self.parse_pages(file_type, content)
+        if len(pages) == 1:
+            return pages[0]
+        return "".join(page + "\n\n" for page in pages if page)
+
+
+def _preferred_backends_from_env() -> Dict[str, str]:
+    preferred = {}
+    for entry in os.getenv("DOCUMENT_PARSER_BACKENDS", "").split(","):
+        if "=" in entry:
+            file_type, name = (part.strip() for part in entry.split("=", 1))
+            preferred[DocumentParserRegistry.mime_type_for(file_type)] = name
+    pdf_backend = os.getenv("PDF_PARSER_BACKEND", "auto")
+    if pdf_backend != "auto":
+        preferred[PDF_MIME] = pdf_backend
+    return preferred
+
+
+document_parsers = DocumentParserRegistry(preferred=_preferred_backends_from_env())
+document_parsers.register(ExtractionBackend("pymupdf", PDF_MIME, extract_pdf_pymupdf, ("fitz",), priority=30))
+document_parsers.register(ExtractionBackend("pypdfium2", PDF_MIME, extract_pdf_pypdfium2, ("pypdfium2",), priority=20))
+document_parsers.register(ExtractionBackend("pypdf", PDF_MIME, extract_pdf_pypdf, ("pypdf",), priority=10))
+document_parsers.register(ExtractionBackend("docx-stream", DOCX_MIME, extract_docx))
+document_parsers.register(ExtractionBackend("text", TEXT_MIME, extract_text))
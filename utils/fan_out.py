@@ -0,0 +1,59 @@
+"""
+Concurrent fan-out of blocking calls from synchronous service code.
+
+Services run in FastAPI's thread pool and issue blocking LLM calls; fan_out
+runs several of them at once on worker threads. Each call runs in a copy of
+the caller's context, so contextvars such as the request's generation trace
+still see the work.
+"""
+
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Sequence, TypeVar, Union
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def fan_out(
+    fn: Callable[[T], R],
+    items: Sequence[T],
+    max_workers: int = 4,
+) -> List[Union[R, Exception]]:
+    """
+    Call fn for every item concurrently and collect the outcomes in item order.
+
+    A call that raises does not cancel the others; its exception is returned
+    in its slot so the caller can retry just the failed items.
+
+    Args:
+        fn: Blocking function applied to each item
+        items: Inputs, one call each
+        max_workers: Upper bound on concurrent calls (admission control may
+            further limit how many reach the model at once)
+    """
+    if not items:
+        return []
+
+    workers = max(1, min(max_workers, len(items)))
+    if workers == 1:
+        return [_call(fn, item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # A Context can only be entered by one thread at a time, so copy it per call
+        futures = [
+            executor.submit(contextvars.copy_context().run, _call, fn, item)
+            for item in items
+        ]
+        return [future.result() for future in futures]
+
+
+def _call(fn: Callable[[T], R], item: T) -> Union[R, Exception]:
+    try:
+        return fn(item)
+    except Exception as e:
+        logger.debug(f"Fan-out call failed: {e}")
+        return e
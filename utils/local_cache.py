@@ -0,0 +1,301 @@
+"""
+Size-aware in-process cache used as the local tier of CacheManager.
+
+Entries are accounted by their size in bytes and evicted with a segmented LRU
+(SLRU): new entries enter a probation segment and move to a protected segment
+when they are read again. Eviction takes the least recently used probation
+entry first, so a burst of one-off entries cannot flush the working set, and
+every operation is O(1). TTLs use the monotonic clock and are checked lazily
+when an entry is read.
+
+Each namespace with a configured budget gets its own segments, so one kind of
+artifact (e.g. large FAISS indexes) cannot evict another (e.g. LLM responses).
+Namespaces without a budget share what is left of the total.
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, Optional
+
+DEFAULT_NAMESPACE = "default"
+
+# Share of a segment set's budget kept for entries that were read at least twice
+PROTECTED_RATIO = 0.8
+
+# Containers are sized by walking at most this deep
+_MAX_SIZE_DEPTH = 4
+
+_MISSING = object()
+
+
+def estimate_size(value: Any, _depth: int = 0) -> int:
+    """
+    Approximate the memory held by a cached value, in bytes.
+
+    Buffers and arrays report their exact payload; containers are walked a few
+    levels deep; anything else falls back to sys.getsizeof. Callers caching
+    objects whose memory lives outside Python (FAISS indexes, models) should
+    pass an explicit size instead.
+    """
+    if isinstance(value, (bytes, bytearray)):
+        return len(value) + 33
+    if isinstance(value, memoryview):
+        return value.nbytes
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes + 112
+    size = sys.getsizeof(value)
+    if _depth >= _MAX_SIZE_DEPTH:
+        return size
+    if isinstance(value, dict):
+        for key, item in value.items():
+            size += estimate_size(key, _depth + 1) + estimate_size(item, _depth + 1)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += estimate_size(item, _depth + 1)
+    return size
+
+
+class _Entry:
+    __slots__ = ("value", "size", "expires")
+
+    def __init__(self, value: Any, size: int, expires: Optional[float]):
+        self.value = value
+        self.size = size
+        self.expires = expires
+
+
+class _SegmentedLRU:
+    """Probation and protected LRU segments sharing one byte budget."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.protected_max_bytes = int(max_bytes * PROTECTED_RATIO)
+        self.probation: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.protected: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.probation_bytes = 0
+        self.protected_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejections = 0
+
+    @property
+    def bytes(self) -> int:
+        return self.probation_bytes + self.protected_bytes
+
+    def __len__(self) -> int:
+        return len(self.probation) + len(self.protected)
+
+    def _remove(self, key: str) -> Optional[_Entry]:
+        entry = self.probation.pop(key, None)
+        if entry is not None:
+            self.probation_bytes -= entry.size
+            return entry
+        entry = self.protected.pop(key, None)
+        if entry is not None:
+            self.protected_bytes -= entry.size
+        return entry
+
+    def get(self, key: str, now: float) -> Any:
+        entry = self.protected.get(key)
+        if entry is None:
+            entry = self.probation.get(key)
+        if entry is None:
+            self.misses += 1
+            return _MISSING
+        if entry.expires is not None and entry.expires <= now:
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return _MISSING
+
+        if key in self.protected:
+            self.protected.move_to_end(key)
+        else:
+            # Second access: promote, demoting protected LRU entries to keep its share
+            del self.probation[key]
+            self.probation_bytes -= entry.size
+            self.protected[key] = entry
+            self.protected_bytes += entry.size
+            while self.protected_bytes > self.protected_max_bytes and len(self.protected) > 1:
+                demoted_key, demoted = self.protected.popitem(last=False)
+                self.protected_bytes -= demoted.size
+                self.probation[demoted_key] = demoted
+                self.probation_bytes += demoted.size
+        self.hits += 1
+        return entry.value
+
+    def set(self, key: str, entry: _Entry) -> int:
+        """Store an entry; returns how many entries were evicted to make room."""
+        self._remove(key)
+        if entry.size > self.max_bytes:
+            self.rejections += 1
+            return 0
+        self.probation[key] = entry
+        self.probation_bytes += entry.size
+
+        evicted = 0
+        while self.bytes > self.max_bytes:
+            # The new entry is the newest in probation; once it is the only one left,
+            # room comes out of protected (the entry fits max_bytes, so this ends)
+            segment = self.probation if len(self.probation) > 1 else self.protected
+            _, victim = segment.popitem(last=False)
+            if segment is self.probation:
+                self.probation_bytes -= victim.size
+            else:
+                self.protected_bytes -= victim.size
+            evicted += 1
+        self.evictions += evicted
+        return evicted
+
+    def delete(self, key: str) -> bool:
+        return self._remove(key) is not None
+
+    def keys(self) -> Iterator[str]:
+        yield from list(self.probation)
+        yield from list(self.protected)
+
+    def clear(self) -> None:
+        self.probation.clear()
+        self.protected.clear()
+        self.probation_bytes = 0
+        self.protected_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "protected_bytes": self.protected_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "rejections": self.rejections,
+        }
+
+
+class LocalCache:
+    """
+    Thread-safe, byte-bounded SLRU cache with TTLs and per-namespace budgets.
+
+    Args:
+        max_bytes: Total budget across all namespaces
+        namespace_budgets: Byte budgets of namespaces that get their own segments
+        on_evict: Called as on_evict(namespace, count) after entries are evicted
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        namespace_budgets: Optional[Dict[str, int]] = None,
+        on_evict: Optional[Callable[[str, int], None]] = None,
+    ):
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self._lock = threading.Lock()
+        self._segments: Dict[str, _SegmentedLRU] = {}
+        for namespace, budget in (namespace_budgets or {}).items():
+            self._segments[namespace] = _SegmentedLRU(budget)
+        reserved = sum(segment.max_bytes for segment in self._segments.values())
+        self._shared = _SegmentedLRU(max(0, max_bytes - reserved))
+
+    def _segment(self, namespace: str) -> _SegmentedLRU:
+        return self._segments.get(namespace, self._shared)
+
+    def get(self, key: str, namespace: str = DEFAULT_NAMESPACE, default: Any = None) -> Any:
+        segment = self._segment(namespace)
+        with self._lock:
+            value = segment.get(key, time.monotonic())
+        return default if value is _MISSING else value
+
+    def contains(self, key: str, namespace: str = DEFAULT_NAMESPACE) -> bool:
+        segment = self._segment(namespace)
+        with self._lock:
+            entry = segment.protected.get(key) or segment.probation.get(key)
+            return entry is not None and (entry.expires is None or entry.expires > time.monotonic())
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: Optional[float] = None,
+        namespace: str = DEFAULT_NAMESPACE,
+        size: Optional[int] = None,
+    ) -> bool:
+        """
+        Store a value.
+
+        Returns:
+            False if the value is larger than its namespace's whole budget and was not stored
+        """
+        entry = _Entry(
+            value,
+            estimate_size(value) if size is None else size,
+            time.monotonic() + ttl if ttl else None,
+        )
+        segment = self._segment(namespace)
+        with self._lock:
+            evicted = segment.set(key, entry)
+            stored = key in segment.probation
+        if evicted and self.on_evict is not None:
+            self.on_evict(namespace, evicted)
+        return stored
+
+    def delete(self, key: str, namespace: str = DEFAULT_NAMESPACE) -> bool:
+        segment = self._segment(namespace)
+        with self._lock:
+            return segment.delete(key)
+
+    def delete_matching(self, predicate: Callable[[str], bool]) -> int:
+        """Delete every key for which predicate(key) is true, in all namespaces."""
+        deleted = 0
+        with self._lock:
+            for segment in (*self._segments.values(), self._shared):
+                for key in segment.keys():
+                    if predicate(key):
+                        segment.delete(key)
+                        deleted += 1
+        return deleted
+
+    def clear(self) -> None:
+        with self._lock:
+            for segment in (*self._segments.values(), self._shared):
+                segment.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._shared) + sum(len(segment) for segment in self._segments.values())
+
+    @property
+    def bytes(self) -> int:
+        with self._lock:
+            return self._shared.bytes + sum(segment.bytes for segment in self._segments.values())
+
+    def namespace_bytes(self, namespace: str) -> int:
+        """Bytes held by a namespace's segments (the shared pool for unbudgeted namespaces)."""
+        with self._lock:
+            return self._segment(namespace).bytes
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            namespaces = {name: segment.stats() for name, segment in self._segments.items()}
+            # Namespaces without a budget of their own
+            namespaces["*"] = self._shared.stats()
+            totals = tuple(
+                sum(stats[field] for stats in namespaces.values())
+                for field in ("entries", "bytes", "hits", "misses", "evictions")
+            )
+        return {
+            "entries": totals[0],
+            "bytes": totals[1],
+            "max_bytes": self.max_bytes,
+            "hits": totals[2],
+            "misses": totals[3],
+            "evictions": totals[4],
+            "namespaces": namespaces,
+        }
@@ -10,27 +10,17 @@ import os
 import time
 import asyncio
 import hashlib
-from typing import Dict, Any, Optional, Callable, Union, List
-from datetime import datetime, timedelta
+import math
+from typing import Dict, Any, Optional, Callable, Union, List, Awaitable
+from collections import deque
+from datetime import datetime
 from functools import wraps, lru_cache
 from contextlib import asynccontextmanager
-import pickle
+import struct
 import json
 import psutil
 from pathlib import Path
 
-try:
-    import redis
-    HAS_REDIS = True
-except ImportError:
-    HAS_REDIS = False
-
-try:
-    import aioredis
-    HAS_AIOREDIS = True
-except ImportError:
-    HAS_AIOREDIS = False
-
 try:
     from prometheus_client import Counter, Histogram, Gauge
     HAS_PROMETHEUS = True
@@ -38,13 +28,25 @@ except ImportError:
     HAS_PROMETHEUS = False
 
 from utils.production_logging import get_production_logger
+from utils.local_cache import DEFAULT_NAMESPACE, LocalCache, estimate_size
+from utils.cache_tiers import AsyncKeyedLocks, CacheRecord, KeyedLocks, MemoryTier, RedisTier
+from utils.cache_codecs import CacheCodec
+from utils.cache_versions import cache_versions, namespace_dependency
 
 logger = get_production_logger('performance')
 
 
+# Request samples kept in memory per endpoint, next to the Prometheus histograms
+_LOCAL_SAMPLES_PER_ENDPOINT = 1000
+
+
 class PerformanceMetrics:
     """Centralized performance metrics collection."""
     
+    # Prometheus collectors are process-wide; registering them twice raises, so every
+    # PerformanceMetrics instance shares the collectors created by the first one.
+    _shared_prometheus_metrics: Dict[str, Any] = {}
+    
     def __init__(self):
         self.metrics = {}
         self.prometheus_metrics = {}
@@ -54,11 +56,22 @@ class PerformanceMetrics:
     
     def _setup_prometheus_metrics(self):
         """Setup Prometheus metrics."""
+        if PerformanceMetrics._shared_prometheus_metrics:
+            self.prometheus_metrics = PerformanceMetrics._shared_prometheus_metrics
+            return
+        
         self.prometheus_metrics = {
             'request_duration': Histogram(
                 'ai_nvcb_request_duration_seconds',
                 'Request duration in seconds',
-                ['method', 'endpoint', 'status']
+                ['method', 'endpoint', 'status', 'model'],
+                # Generation requests take seconds to minutes
+                buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+            ),
+            'requests_in_progress': Gauge(
+                'ai_nvcb_requests_in_progress',
+                'Requests currently being handled',
+                ['method', 'endpoint']
             ),
             'cache_hits': Counter(
                 'ai_nvcb_cache_hits_total',
@@ -70,6 +83,27 @@ class PerformanceMetrics:
                 'Total cache misses',
                 ['cache_type', 'key_pattern']
             ),
+            'cache_evictions': Counter(
+                'ai_nvcb_cache_evictions_total',
+                'Entries evicted from a cache to stay within its byte budget',
+                ['cache_type', 'namespace']
+            ),
+            'cache_size': Gauge(
+                'ai_nvcb_cache_size_bytes',
+                'Bytes held by a cache',
+                ['cache_type', 'namespace']
+            ),
+            'cache_serialization_duration': Histogram(
+                'ai_nvcb_cache_serialization_seconds',
+                'Time to encode or decode a shared cache entry',
+                ['operation', 'codec', 'compression'],
+                buckets=(0.00001, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+            ),
+            'cache_serialized_bytes': Counter(
+                'ai_nvcb_cache_serialized_bytes_total',
+                'Bytes of shared cache entries encoded or decoded',
+                ['operation', 'codec', 'compression']
+            ),
             'memory_usage': Gauge(
                 'ai_nvcb_memory_usage_bytes',
                 'Memory usage in bytes',
@@ -93,28 +127,76 @@ class PerformanceMetrics:
                 'ai_nvcb_ollama_duration_seconds',
                 'Ollama request duration in seconds',
                 ['model']
+            ),
+            'llm_queue_depth': Gauge(
+                'ai_nvcb_llm_queue_depth',
+                'Generations waiting for an Ollama slot',
+                ['model']
+            ),
+            'llm_queue_wait': Histogram(
+                'ai_nvcb_llm_queue_wait_seconds',
+                'Time generations spent waiting for an Ollama slot',
+                ['model', 'priority']
+            ),
+            'llm_rejections': Counter(
+                'ai_nvcb_llm_rejections_total',
+                'Generations shed by admission control',
+                ['model', 'priority']
+            ),
+            'llm_prompt_tokens': Histogram(
+                'ai_nvcb_llm_prompt_tokens',
+                'Prompt tokens evaluated per generation',
+                ['model', 'route'],
+                buckets=(16, 64, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+            ),
+            'llm_output_tokens': Histogram(
+                'ai_nvcb_llm_output_tokens',
+                'Tokens generated per generation',
+                ['model', 'route'],
+                buckets=(16, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+            ),
+            'llm_prefill_duration': Histogram(
+                'ai_nvcb_llm_prefill_seconds',
+                'Prompt evaluation (prefill) time per generation',
+                ['model', 'route']
+            ),
+            'llm_decode_rate': Histogram(
+                'ai_nvcb_llm_decode_tokens_per_second',
+                'Decode throughput per generation',
+                ['model', 'route'],
+                buckets=(1, 2, 5, 10, 20, 40, 80, 160, 320)
             )
         }
+        PerformanceMetrics._shared_prometheus_metrics = self.prometheus_metrics
     
-    def record_request_duration(self, method: str, endpoint: str, status: int, duration: float):
-        """Record HTTP request duration."""
+    def record_request_duration(self, method: str, endpoint: str, status: int, duration: float, model: str = 'none'):
+        """Record HTTP request duration (endpoint is the route template, model the LLM used, if any)."""
         if HAS_PROMETHEUS and 'request_duration' in self.prometheus_metrics:
             self.prometheus_metrics['request_duration'].labels(
                 method=method,
                 endpoint=endpoint,
-                status=str(status)
+                status=str(status),
+                model=model
             ).observe(duration)
         
         # Store in local metrics
         key = f"{method}:{endpoint}"
         if key not in self.metrics:
-            self.metrics[key] = []
+            self.metrics[key] = deque(maxlen=_LOCAL_SAMPLES_PER_ENDPOINT)
         self.metrics[key].append({
             'duration': duration,
             'status': status,
             'timestamp': datetime.utcnow()
         })
     
+    def record_request_in_progress(self, method: str, endpoint: str, delta: int):
+        """Adjust the number of requests being handled for a route."""
+        if HAS_PROMETHEUS and 'requests_in_progress' in self.prometheus_metrics:
+            self.prometheus_metrics['requests_in_progress'].labels(
+                method=method,
+                endpoint=endpoint
+            ).inc(delta)
+    
     def record_cache_hit(self, cache_type: str, key_pattern: str):
         """Record cache hit."""
         if HAS_PROMETHEUS and 'cache_hits' in self.prometheus_metrics:
@@ -131,6 +213,76 @@ class PerformanceMetrics:
                 key_pattern=key_pattern
             ).inc()
     
+    def record_cache_eviction(self, cache_type: str, namespace: str, count: int = 1):
+        """Record entries evicted from a cache."""
+        if HAS_PROMETHEUS and 'cache_evictions' in self.prometheus_metrics:
+            self.prometheus_metrics['cache_evictions'].labels(
+                cache_type=cache_type,
+                namespace=namespace
+            ).inc(count)
+    
+    def record_cache_size(self, cache_type: str, namespace: str, size_bytes: int):
+        """Record the bytes currently held by a cache."""
+        if HAS_PROMETHEUS and 'cache_size' in self.prometheus_metrics:
+            self.prometheus_metrics['cache_size'].labels(
+                cache_type=cache_type,
+                namespace=namespace
+            ).set(size_bytes)
+    
+    def record_cache_serialization(self, operation: str, codec: str, compression: str, duration: float, size_bytes: int):
+        """Record encoding or decoding of a shared cache entry."""
+        if HAS_PROMETHEUS and 'cache_serialization_duration' in self.prometheus_metrics:
+            labels = {'operation': operation, 'codec': codec, 'compression': compression}
+            self.prometheus_metrics['cache_serialization_duration'].labels(**labels).observe(duration)
+            self.prometheus_metrics['cache_serialized_bytes'].labels(**labels).inc(size_bytes)
+    
+    def record_llm_queue_depth(self, model: str, depth: int):
+        """Record the number of generations queued for a model."""
+        if HAS_PROMETHEUS and 'llm_queue_depth' in self.prometheus_metrics:
+            self.prometheus_metrics['llm_queue_depth'].labels(model=model).set(depth)
+    
+    def record_llm_queue_wait(self, model: str, priority: str, wait_seconds: float):
+        """Record how long a generation waited for admission."""
+        if HAS_PROMETHEUS and 'llm_queue_wait' in self.prometheus_metrics:
+            self.prometheus_metrics['llm_queue_wait'].labels(
+                model=model,
+                priority=priority
+            ).observe(wait_seconds)
+    
+    def record_llm_rejection(self, model: str, priority: str):
+        """Record a generation shed by admission control."""
+        if HAS_PROMETHEUS and 'llm_rejections' in self.prometheus_metrics:
+            self.prometheus_metrics['llm_rejections'].labels(
+                model=model,
+                priority=priority
+            ).inc()
+    
+    def record_llm_generation(
+        self,
+        model: str,
+        route: str,
+        status: str,
+        duration: float,
+        prompt_tokens: int,
+        output_tokens: int,
+        prefill_seconds: float,
+        decode_tokens_per_second: float
+    ):
+        """Record an Ollama generation with its token counts and timings."""
+        if not HAS_PROMETHEUS or 'ollama_requests' not in self.prometheus_metrics:
+            return
+        
+        self.prometheus_metrics['ollama_requests'].labels(model=model, status=status).inc()
+        self.prometheus_metrics['ollama_duration'].labels(model=model).observe(duration)
+        if status != 'success':
+            return
+        
+        self.prometheus_metrics['llm_prompt_tokens'].labels(model=model, route=route).observe(prompt_tokens)
+        self.prometheus_metrics['llm_output_tokens'].labels(model=model, route=route).observe(output_tokens)
+        self.prometheus_metrics['llm_prefill_duration'].labels(model=model, route=route).observe(prefill_seconds)
+        if decode_tokens_per_second > 0:
+            self.prometheus_metrics['llm_decode_rate'].labels(model=model, route=route).observe(decode_tokens_per_second)
+    
     def update_system_metrics(self):
         """Update system resource metrics."""
         if not HAS_PROMETHEUS:
@@ -149,233 +301,395 @@ class PerformanceMetrics:
             self.prometheus_metrics['cpu_usage'].set(cpu_percent)
 
 
+# fresh_until, stale_until and compute_time of a record stored in the shared tier
+_RECORD_HEADER = struct.Struct('<ddd')
+
+
 class CacheManager:
-    """Advanced caching manager with multiple backends."""
+    """
+    Two-tier cache: an in-process LocalCache (L1) in front of a shared L2.
+    
+    The L2 tier is Redis when REDIS_CACHE_ENABLED is set, or the in-process
+    MemoryTier when CACHE_L2_BACKEND=memory (tests, single worker). Values are
+    stored as CacheRecords so get_or_compute() can protect expensive
+    computations from stampedes: one caller per key recomputes (per-key locks),
+    a value is refreshed probabilistically shortly before it expires, stale
+    values are served while a refresh is running, and None results are cached
+    briefly as negative entries.
+    
+    Keys carry the generation of their namespace and of the whole cache
+    (utils.cache_versions), so clear() is a counter bump rather than a scan of
+    the shared tier; superseded entries are never read again and expire.
+    """
     
     def __init__(self):
-        self.local_cache = {}
-        self.redis_client = None
-        self.redis_async_client = None
         self.config = self._load_config()
         self.metrics = PerformanceMetrics()
-        
-        if HAS_REDIS and self.config['redis_enabled']:
-            self._setup_redis()
-        
-        if HAS_AIOREDIS and self.config['redis_enabled']:
-            self._setup_async_redis()
+        self.local_cache = LocalCache(
+            max_bytes=self.config['max_local_cache_bytes'],
+            namespace_budgets=self.config['local_cache_namespace_budgets'],
+            on_evict=lambda namespace, count: self.metrics.record_cache_eviction('local', namespace, count),
+        )
+        self.codec = CacheCodec(
+            allow_pickle=self.config['allow_pickle'],
+            compression=self.config['cache_compression'],
+            compression_min_bytes=self.config['compression_min_bytes'],
+            on_timing=self.metrics.record_cache_serialization,
+        )
+        self.l2 = self._setup_l2()
+        self._locks = KeyedLocks()
+        self._async_locks = AsyncKeyedLocks()
+        self._refresh_tasks = set()
     
     def _load_config(self) -> Dict[str, Any]:
         """Load cache configuration."""
+        redis_enabled = os.getenv('REDIS_CACHE_ENABLED', 'false').lower() == 'true'
         return {
-            'redis_enabled': os.getenv('REDIS_CACHE_ENABLED', 'false').lower() == 'true',
+            'redis_enabled': redis_enabled,
             'redis_url': os.getenv('REDIS_URL', 'redis://localhost:6379/1'),
+            'redis_socket_timeout': float(os.getenv('REDIS_SOCKET_TIMEOUT', '5')),
+            'redis_socket_connect_timeout': float(os.getenv('REDIS_SOCKET_CONNECT_TIMEOUT', '5')),
+            # "redis", "memory" (in-process stand-in) or "none"
+            'l2_backend': os.getenv('CACHE_L2_BACKEND', 'redis' if redis_enabled else 'none').lower(),
             'default_ttl': int(os.getenv('CACHE_DEFAULT_TTL', '3600')),  # 1 hour
-            'max_local_cache_size': int(os.getenv('MAX_LOCAL_CACHE_SIZE', '1000')),
-            'cache_compression': os.getenv('CACHE_COMPRESSION', 'false').lower() == 'true',
+            'stale_ttl': int(os.getenv('CACHE_STALE_TTL', '300')),  # Served while a refresh runs
+            'negative_ttl': int(os.getenv('CACHE_NEGATIVE_TTL', '30')),  # How long a None result is cached
+            'early_refresh_beta': float(os.getenv('CACHE_EARLY_REFRESH_BETA', '1.0')),  # 0 disables
+            'max_local_cache_bytes': int(os.getenv('MAX_LOCAL_CACHE_BYTES', str(512 * 1024 * 1024))),
+            # e.g. "llm_response=67108864,faiss=268435456"; other namespaces share the rest
+            'local_cache_namespace_budgets': self._parse_namespace_budgets(
+                os.getenv('LOCAL_CACHE_NAMESPACE_BUDGETS', '')
+            ),
+            'cache_compression': os.getenv('CACHE_COMPRESSION', 'true').lower() == 'true',
+            'compression_min_bytes': int(os.getenv('CACHE_COMPRESSION_MIN_BYTES', '16384')),
+            # Pickle lets any object reach the shared tier but trusts everyone who can write to it
+            'allow_pickle': os.getenv('CACHE_ALLOW_PICKLE', 'false').lower() == 'true',
             'cache_prefix': os.getenv('CACHE_PREFIX', 'ai_nvcb:')
         }
     
-    def _setup_redis(self):
-        """Setup Redis client."""
+    @staticmethod
+    def _parse_namespace_budgets(spec: str) -> Dict[str, int]:
+        """Parse "namespace=bytes,..." into a budget per namespace."""
+        budgets = {}
+        for item in spec.split(','):
+            if '=' in item:
+                namespace, budget = item.split('=', 1)
+                budgets[namespace.strip()] = int(budget)
+        return budgets
+    
+    @staticmethod
+    def _namespace(key: str) -> str:
+        """Namespace of a key: its first ":"-separated part (e.g. "llm_response")."""
+        namespace, separator, _ = key.partition(':')
+        return namespace if separator else DEFAULT_NAMESPACE
+    
+    def _setup_l2(self) -> Optional[Union[RedisTier, MemoryTier]]:
+        """Create the shared cache tier."""
+        backend = self.config['l2_backend']
+        if backend == 'memory':
+            return MemoryTier()
+        if backend == 'redis':
+            tier = RedisTier(
+                self.config['redis_url'],
+                socket_timeout=self.config['redis_socket_timeout'],
+                socket_connect_timeout=self.config['redis_socket_connect_timeout'],
+            )
+            if tier.client is not None:
+                # Generations are shared so every worker sees a clear() and restarts keep them
+                cache_versions.attach(tier.client, self.config['cache_prefix'])
+            return tier if tier.connected else None
+        return None
+    
+    @property
+    def redis_client(self):
+        """Sync Redis client of the L2 tier, if Redis is in use and reachable."""
+        return getattr(self.l2, 'client', None)
+    
+    def _get_cache_key(self, key: str) -> str:
+        """Generate cache key with prefix and the generations of the whole cache and of the key's namespace."""
+        generation = cache_versions.generation(namespace_dependency('*'))
+        namespace_generation = cache_versions.generation(namespace_dependency(self._namespace(key)))
+        return f"{self.config['cache_prefix']}{generation}.{namespace_generation}:{key}"
+    
+    def _serialize_value(self, record: CacheRecord) -> bytes:
+        """Serialize a record for the shared tier: its timestamps, then the encoded value."""
+        return _RECORD_HEADER.pack(record.fresh_until, record.stale_until, record.compute_time) + \
+            self.codec.encode(record.value)
+    
+    def _deserialize_value(self, data: bytes) -> CacheRecord:
+        """Deserialize a record; array values stay views of data."""
+        fresh_until, stale_until, compute_time = _RECORD_HEADER.unpack_from(data)
+        value = self.codec.decode(memoryview(data)[_RECORD_HEADER.size:])
+        return CacheRecord(value, fresh_until, stale_until, compute_time)
+    
+    def _encode_for_l2(self, key: str, record: CacheRecord) -> Optional[bytes]:
         try:
-            self.redis_client = redis.from_url(self.config['redis_url'])
-            self.redis_client.ping()
-            logger.info("Redis cache client initialized")
-        except Exception as e:
-            logger.warning(f"Failed to initialize Redis cache: {e}")
-            self.redis_client = None
+            return self._serialize_value(record)
+        except TypeError as e:
+            # Kept in the local tier only
+            logger.debug(f"Not sharing {key} through the L2 cache: {e}")
+            return None
     
-    async def _setup_async_redis(self):
-        """Setup async Redis client."""
+    def _new_record(self, value: Any, ttl: Optional[int], stale_ttl: Optional[int], negative_ttl: Optional[int],
+                    compute_time: float = 0.0) -> CacheRecord:
+        now = time.time()
+        if value is None:
+            ttl = self.config['negative_ttl'] if negative_ttl is None else negative_ttl
+            stale_ttl = 0
+        else:
+            ttl = ttl or self.config['default_ttl']
+            stale_ttl = self.config['stale_ttl'] if stale_ttl is None else stale_ttl
+        return CacheRecord(value, now + ttl, now + ttl + stale_ttl, compute_time)
+    
+    def _read_local(self, key: str, cache_key: str) -> Optional[CacheRecord]:
+        namespace = self._namespace(key)
+        record = self.local_cache.get(cache_key, namespace)
+        if record is not None:
+            self.metrics.record_cache_hit('local', namespace)
+        return record
+    
+    def _decode_l2(self, key: str, cache_key: str, data: Optional[bytes]) -> Optional[CacheRecord]:
+        namespace = self._namespace(key)
+        if not data:
+            self.metrics.record_cache_miss('local_and_redis', namespace)
+            return None
         try:
-            self.redis_async_client = aioredis.from_url(self.config['redis_url'])
-            await self.redis_async_client.ping()
-            logger.info("Async Redis cache client initialized")
+            record = self._deserialize_value(data)
         except Exception as e:
-            logger.warning(f"Failed to initialize async Redis cache: {e}")
-            self.redis_async_client = None
+            logger.warning(f"Discarding undecodable cache entry {key}: {e}")
+            return None
+        self.metrics.record_cache_hit(self.l2.name, namespace)
+        # Promote to L1 for the rest of its lifetime
+        remaining = record.remaining_ttl(time.time())
+        if remaining > 0:
+            self._set_local(key, cache_key, record, remaining)
+        return record
     
-    def _get_cache_key(self, key: str) -> str:
-        """Generate cache key with prefix."""
-        return f"{self.config['cache_prefix']}{key}"
-    
-    def _serialize_value(self, value: Any) -> bytes:
-        """Serialize value for caching."""
-        if self.config['cache_compression']:
-            import zlib
-            return zlib.compress(pickle.dumps(value))
-        return pickle.dumps(value)
-    
-    def _deserialize_value(self, data: bytes) -> Any:
-        """Deserialize cached value."""
-        if self.config['cache_compression']:
-            import zlib
-            return pickle.loads(zlib.decompress(data))
-        return pickle.loads(data)
+    def _read(self, key: str) -> Optional[CacheRecord]:
+        cache_key = self._get_cache_key(key)
+        record = self._read_local(key, cache_key)
+        if record is not None:
+            return record
+        if self.l2 is None:
+            self.metrics.record_cache_miss('local', self._namespace(key))
+            return None
+        return self._decode_l2(key, cache_key, self.l2.get(cache_key))
     
-    def get(self, key: str) -> Optional[Any]:
-        """Get value from cache."""
+    async def _aread(self, key: str) -> Optional[CacheRecord]:
         cache_key = self._get_cache_key(key)
-        
-        # Try local cache first
-        if cache_key in self.local_cache:
-            entry = self.local_cache[cache_key]
-            if entry['expires'] > datetime.utcnow():
-                self.metrics.record_cache_hit('local', 'general')
-                return entry['value']
-            else:
-                del self.local_cache[cache_key]
-        
-        # Try Redis cache
-        if self.redis_client:
-            try:
-                data = self.redis_client.get(cache_key)
-                if data:
-                    value = self._deserialize_value(data)
-                    self.metrics.record_cache_hit('redis', 'general')
-                    return value
-            except Exception as e:
-                logger.warning(f"Redis cache get error: {e}")
-        
-        self.metrics.record_cache_miss('local_and_redis', 'general')
+        record = self._read_local(key, cache_key)
+        if record is not None:
+            return record
+        if self.l2 is None:
+            self.metrics.record_cache_miss('local', self._namespace(key))
+            return None
+        return self._decode_l2(key, cache_key, await self.l2.aget(cache_key))
+    
+    def _set_local(self, key: str, cache_key: str, record: CacheRecord, ttl: float,
+                   size: Optional[int] = None) -> None:
+        namespace = self._namespace(key)
+        size = estimate_size(record.value) if size is None else size
+        if not self.local_cache.set(cache_key, record, ttl=ttl, namespace=namespace, size=size):
+            logger.debug(f"Value for {key} exceeds the local cache budget of namespace {namespace}")
+        self.metrics.record_cache_size('local', namespace, self.local_cache.namespace_bytes(namespace))
+    
+    def _write(self, key: str, record: CacheRecord, size: Optional[int] = None) -> None:
+        cache_key = self._get_cache_key(key)
+        ttl = record.remaining_ttl(time.time())
+        self._set_local(key, cache_key, record, ttl, size)
+        data = self._encode_for_l2(key, record) if self.l2 is not None else None
+        if data is not None:
+            self.l2.set(cache_key, data, max(1, math.ceil(ttl)))
+    
+    async def _awrite(self, key: str, record: CacheRecord, size: Optional[int] = None) -> None:
+        cache_key = self._get_cache_key(key)
+        ttl = record.remaining_ttl(time.time())
+        self._set_local(key, cache_key, record, ttl, size)
+        data = self._encode_for_l2(key, record) if self.l2 is not None else None
+        if data is not None:
+            await self.l2.aset(cache_key, data, max(1, math.ceil(ttl)))
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Get a fresh value from cache."""
+        record = self._read(key)
+        if record is not None and record.is_fresh(time.time()):
+            return record.value
         return None
     
     async def aget(self, key: str) -> Optional[Any]:
-        """Async get value from cache."""
-        cache_key = self._get_cache_key(key)
-        
-        # Try local cache first
-        if cache_key in self.local_cache:
-            entry = self.local_cache[cache_key]
-            if entry['expires'] > datetime.utcnow():
-                self.metrics.record_cache_hit('local', 'general')
-                return entry['value']
-            else:
-                del self.local_cache[cache_key]
-        
-        # Try async Redis cache
-        if self.redis_async_client:
-            try:
-                data = await self.redis_async_client.get(cache_key)
-                if data:
-                    value = self._deserialize_value(data)
-                    self.metrics.record_cache_hit('redis', 'general')
-                    return value
-            except Exception as e:
-                logger.warning(f"Async Redis cache get error: {e}")
-        
-        self.metrics.record_cache_miss('local_and_redis', 'general')
+        """Async get a fresh value from cache."""
+        record = await self._aread(key)
+        if record is not None and record.is_fresh(time.time()):
+            return record.value
         return None
     
-    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
-        """Set value in cache."""
+    def set(self, key: str, value: Any, ttl: Optional[int] = None, size: Optional[int] = None) -> bool:
+        """Set value in cache; size (bytes) overrides the local tier's size estimate."""
+        self._write(key, self._new_record(value, ttl, 0, None), size)
+        return True
+    
+    async def aset(self, key: str, value: Any, ttl: Optional[int] = None, size: Optional[int] = None) -> bool:
+        """Async set value in cache; size (bytes) overrides the local tier's size estimate."""
+        await self._awrite(key, self._new_record(value, ttl, 0, None), size)
+        return True
+    
+    def _servable(self, record: Optional[CacheRecord], now: float) -> bool:
+        return (
+            record is not None
+            and record.is_fresh(now)
+            and not record.should_refresh_early(now, self.config['early_refresh_beta'])
+        )
+    
+    @staticmethod
+    def _refreshed_meanwhile(previous: Optional[CacheRecord], current: Optional[CacheRecord], now: float) -> bool:
+        """Whether another caller stored a newer fresh value while we waited for the key lock."""
+        if current is None or not current.is_fresh(now):
+            return False
+        return previous is None or current.fresh_until > previous.fresh_until
+    
+    def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Any],
+        ttl: Optional[int] = None,
+        stale_ttl: Optional[int] = None,
+        negative_ttl: Optional[int] = None,
+        size: Optional[int] = None,
+    ) -> Any:
+        """
+        Return the cached value for key, computing and storing it when needed.
+        
+        Only one caller per key (in this process) runs compute at a time; the
+        others wait for its result, or get the stale value if there is one.
+        If compute raises while a stale value exists, the stale value is served.
+        
+        Args:
+            key: Cache key
+            compute: Zero-argument callable producing the value
+            ttl: Seconds the value is fresh (default CACHE_DEFAULT_TTL)
+            stale_ttl: Seconds past ttl the value may be served during a refresh
+            negative_ttl: Seconds a None result is cached (0 to not cache it)
+            size: Value size in bytes for the local tier, when it can't be estimated
+        """
+        now = time.time()
+        record = self._read(key)
+        if self._servable(record, now):
+            return record.value
+        
+        stale = record if record is not None and record.is_usable(now) else None
         cache_key = self._get_cache_key(key)
-        ttl = ttl or self.config['default_ttl']
-        expires = datetime.utcnow() + timedelta(seconds=ttl)
-        
-        # Set in local cache
-        if len(self.local_cache) >= self.config['max_local_cache_size']:
-            # Remove oldest entries
-            oldest_key = min(self.local_cache.keys(), 
-                           key=lambda k: self.local_cache[k]['created'])
-            del self.local_cache[oldest_key]
-        
-        self.local_cache[cache_key] = {
-            'value': value,
-            'expires': expires,
-            'created': datetime.utcnow()
-        }
-        
-        # Set in Redis cache
-        if self.redis_client:
+        if not self._locks.acquire(cache_key, blocking=stale is None):
+            # Someone else is refreshing this key
+            return stale.value
+        try:
+            current = self._read(key)
+            if self._refreshed_meanwhile(record, current, time.time()):
+                return current.value
+            
+            start_time = time.monotonic()
             try:
-                serialized_value = self._serialize_value(value)
-                self.redis_client.setex(cache_key, ttl, serialized_value)
-                return True
+                value = compute()
             except Exception as e:
-                logger.warning(f"Redis cache set error: {e}")
+                if stale is None:
+                    raise
+                logger.warning(f"Refreshing {key} failed, serving stale value: {e}")
+                return stale.value
+            record = self._new_record(value, ttl, stale_ttl, negative_ttl, time.monotonic() - start_time)
+            if value is not None or record.fresh_until > time.time():
+                self._write(key, record, size)
+            return value
+        finally:
+            self._locks.release(cache_key)
+    
+    async def aget_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        ttl: Optional[int] = None,
+        stale_ttl: Optional[int] = None,
+        negative_ttl: Optional[int] = None,
+        size: Optional[int] = None,
+    ) -> Any:
+        """
+        Async get_or_compute(); compute returns an awaitable.
+        
+        A stale value is returned immediately while the refresh runs in a
+        background task (stale-while-revalidate).
+        """
+        now = time.time()
+        record = await self._aread(key)
+        if self._servable(record, now):
+            return record.value
         
-        return True
+        cache_key = self._get_cache_key(key)
+        if record is not None and record.is_usable(now):
+            if not self._async_locks.locked(cache_key):
+                task = asyncio.create_task(self._arefresh(key, record, compute, ttl, stale_ttl, negative_ttl, size))
+                self._refresh_tasks.add(task)
+                task.add_done_callback(self._refresh_tasks.discard)
+            return record.value
+        
+        return await self._arefresh(key, record, compute, ttl, stale_ttl, negative_ttl, size, raise_errors=True)
     
-    async def aset(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
-        """Async set value in cache."""
+    async def _arefresh(
+        self,
+        key: str,
+        previous: Optional[CacheRecord],
+        compute: Callable[[], Awaitable[Any]],
+        ttl: Optional[int],
+        stale_ttl: Optional[int],
+        negative_ttl: Optional[int],
+        size: Optional[int],
+        raise_errors: bool = False,
+    ) -> Any:
         cache_key = self._get_cache_key(key)
-        ttl = ttl or self.config['default_ttl']
-        expires = datetime.utcnow() + timedelta(seconds=ttl)
-        
-        # Set in local cache
-        if len(self.local_cache) >= self.config['max_local_cache_size']:
-            # Remove oldest entries
-            oldest_key = min(self.local_cache.keys(), 
-                           key=lambda k: self.local_cache[k]['created'])
-            del self.local_cache[oldest_key]
-        
-        self.local_cache[cache_key] = {
-            'value': value,
-            'expires': expires,
-            'created': datetime.utcnow()
-        }
-        
-        # Set in async Redis cache
-        if self.redis_async_client:
+        await self._async_locks.acquire(cache_key)
+        try:
+            current = await self._aread(key)
+            if self._refreshed_meanwhile(previous, current, time.time()):
+                return current.value
+            
+            start_time = time.monotonic()
             try:
-                serialized_value = self._serialize_value(value)
-                await self.redis_async_client.setex(cache_key, ttl, serialized_value)
-                return True
+                value = await compute()
             except Exception as e:
-                logger.warning(f"Async Redis cache set error: {e}")
-        
-        return True
+                if raise_errors:
+                    raise
+                logger.warning(f"Background refresh of {key} failed: {e}")
+                return None
+            record = self._new_record(value, ttl, stale_ttl, negative_ttl, time.monotonic() - start_time)
+            if value is not None or record.fresh_until > time.time():
+                await self._awrite(key, record, size)
+            return value
+        finally:
+            self._async_locks.release(cache_key)
     
     def delete(self, key: str) -> bool:
         """Delete value from cache."""
         cache_key = self._get_cache_key(key)
         
         # Delete from local cache
-        if cache_key in self.local_cache:
-            del self.local_cache[cache_key]
+        self.local_cache.delete(cache_key, self._namespace(key))
         
-        # Delete from Redis cache
-        if self.redis_client:
-            try:
-                self.redis_client.delete(cache_key)
-                return True
-            except Exception as e:
-                logger.warning(f"Redis cache delete error: {e}")
+        # Delete from the shared tier
+        if self.l2 is not None:
+            self.l2.delete(cache_key)
         
         return True
     
     def clear(self, pattern: str = None) -> bool:
-        """Clear cache entries."""
+        """
+        Clear cache entries.
+        
+        Args:
+            pattern: Namespace to clear (e.g. "llm_response" or "llm_response:"); everything if omitted
+        """
         if pattern:
-            # Clear by pattern
-            pattern_key = self._get_cache_key(pattern)
-            
-            # Clear from local cache
-            keys_to_delete = [k for k in self.local_cache.keys() if pattern_key in k]
-            for key in keys_to_delete:
-                del self.local_cache[key]
-            
-            # Clear from Redis cache
-            if self.redis_client:
-                try:
-                    keys = self.redis_client.keys(f"{pattern_key}*")
-                    if keys:
-                        self.redis_client.delete(*keys)
-                except Exception as e:
-                    logger.warning(f"Redis cache clear error: {e}")
+            cache_versions.bump(namespace_dependency(pattern.partition(':')[0]))
         else:
-            # Clear all
+            cache_versions.bump(namespace_dependency('*'))
+            # Frees local memory at once; superseded shared entries expire by TTL
             self.local_cache.clear()
-            
-            if self.redis_client:
-                try:
-                    keys = self.redis_client.keys(f"{self.config['cache_prefix']}*")
-                    if keys:
-                        self.redis_client.delete(*keys)
-                except Exception as e:
-                    logger.warning(f"Redis cache clear all error: {e}")
         
         return True
 
@@ -461,81 +775,46 @@ class PerformanceOptimizer:
         }
     
     def cache(self, key: str = None, ttl: int = None, ignore_args: List[str] = None):
-        """Decorator for caching function results."""
+        """
+        Decorator for caching function results.
+        
+        Results go through CacheManager.get_or_compute(), so concurrent callers
+        of an uncached or expiring key run the function once between them.
+        """
         def decorator(func: Callable) -> Callable:
+            def make_cache_key(args, kwargs) -> str:
+                if key:
+                    return key
+                # Create key from function name and arguments
+                filtered_kwargs = {k: v for k, v in kwargs.items() 
+                                 if ignore_args is None or k not in ignore_args}
+                key_data = f"{func.__name__}:{args}:{filtered_kwargs}"
+                return hashlib.md5(key_data.encode()).hexdigest()
+            
             @wraps(func)
             async def async_wrapper(*args, **kwargs):
-                # Generate cache key
-                if key:
-                    cache_key = key
-                else:
-                    # Create key from function name and arguments
-                    filtered_kwargs = {k: v for k, v in kwargs.items() 
-                                     if ignore_args is None or k not in ignore_args}
-                    key_data = f"{func.__name__}:{args}:{filtered_kwargs}"
-                    cache_key = hashlib.md5(key_data.encode()).hexdigest()
-                
-                # Try to get from cache
+                cache_key = make_cache_key(args, kwargs)
                 start_time = time.time()
-                cached_result = await self.cache_manager.aget(cache_key)
-                
-                if cached_result is not None:
-                    cache_duration = time.time() - start_time
-                    logger.debug(f"Cache hit for {func.__name__}", extra={
-                        'cache_key': cache_key,
-                        'cache_duration': cache_duration
-                    })
-                    return cached_result
-                
-                # Execute function
-                result = await func(*args, **kwargs)
-                
-                # Cache result
-                await self.cache_manager.aset(cache_key, result, ttl)
-                
-                execution_duration = time.time() - start_time
-                logger.debug(f"Function executed and cached: {func.__name__}", extra={
+                result = await self.cache_manager.aget_or_compute(
+                    cache_key, lambda: func(*args, **kwargs), ttl
+                )
+                logger.debug(f"Cached call: {func.__name__}", extra={
                     'cache_key': cache_key,
-                    'execution_duration': execution_duration
+                    'duration': time.time() - start_time
                 })
-                
                 return result
             
             @wraps(func)
             def sync_wrapper(*args, **kwargs):
-                # Generate cache key
-                if key:
-                    cache_key = key
-                else:
-                    filtered_kwargs = {k: v for k, v in kwargs.items() 
-                                     if ignore_args is None or k not in ignore_args}
-                    key_data = f"{func.__name__}:{args}:{filtered_kwargs}"
-                    cache_key = hashlib.md5(key_data.encode()).hexdigest()
-                
-                # Try to get from cache
+                cache_key = make_cache_key(args, kwargs)
                 start_time = time.time()
-                cached_result = self.cache_manager.get(cache_key)
-                
-                if cached_result is not None:
-                    cache_duration = time.time() - start_time
-                    logger.debug(f"Cache hit for {func.__name__}", extra={
-                        'cache_key': cache_key,
-                        'cache_duration': cache_duration
-                    })
-                    return cached_result
-                
-                # Execute function
-                result = func(*args, **kwargs)
-                
-                # Cache result
-                self.cache_manager.set(cache_key, result, ttl)
-                
-                execution_duration = time.time() - start_time
-                logger.debug(f"Function executed and cached: {func.__name__}", extra={
+                result = self.cache_manager.get_or_compute(
+                    cache_key, lambda: func(*args, **kwargs), ttl
+                )
+                logger.debug(f"Cached call: {func.__name__}", extra={
                     'cache_key': cache_key,
-                    'execution_duration': execution_duration
+                    'duration': time.time() - start_time
                 })
-                
                 return result
             
             return async_wrapper if asyncio.iscoroutinefunction(func) else sync_wrapper
@@ -621,7 +900,11 @@ class PerformanceOptimizer:
         stats = {
             'cache_stats': {
                 'local_cache_size': len(self.cache_manager.local_cache),
-                'redis_connected': self.cache_manager.redis_client is not None
+                'local_cache': self.cache_manager.local_cache.stats(),
+                'redis_connected': self.cache_manager.redis_client is not None,
+                'l2_backend': self.cache_manager.l2.name if self.cache_manager.l2 is not None else None,
+                'serialization': self.cache_manager.codec.stats(),
+                'versions': cache_versions.stats()
             },
             'connection_pool_stats': {
                 'active_pools': len(self.connection_pool.pools)
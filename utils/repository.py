@@ -1,7 +1,9 @@
 import uuid
 import time
 import os
+import json
 import logging
+import sqlite3
 from typing import Optional, Dict, Any, List
 
 from .database import DatabaseConnection, serialize_meta, deserialize_meta, Storage
@@ -324,9 +326,10 @@ class DocumentRepository:
         
         with DatabaseConnection() as conn:
             cursor = conn.cursor()
+            # A concurrent upload of the same file may insert it first
             cursor.execute(
                 """
-                INSERT INTO documents (
+                INSERT OR IGNORE INTO documents (
                     id, user_id, filename, path, content_type, size, meta, created_at, updated_at
                 ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
                 """,
@@ -337,6 +340,13 @@ class DocumentRepository:
             )
             conn.commit()
             
+            if cursor.rowcount == 0:
+                existing_doc = self.get_document_by_content_id(document_id, user_id)
+                if existing_doc is None:
+                    raise sqlite3.IntegrityError(f"Document {document_id} already exists for another user")
+                logger.info(f"Found existing document with content-based ID: {document_id}")
+                return existing_doc
+            
             logger.info(f"Created new document with content-based ID: {document_id}")
             
             return {
@@ -401,6 +411,52 @@ class ChatHistoryRepository:
                 
             return chat_entry
     
+    def add_chat_entries(self, entries: List[Dict[str, Any]]) -> int:
+        """
+        Insert pre-built chat entries in one transaction
+        
+        Entries whose document no longer exists are skipped. Used by the
+        write-behind chat history store, which assigns IDs and timestamps
+        when the entry is created on the request path.
+        
+        Args:
+            entries: Chat entry records (id, document_id, user_query, system_response, meta, created_at, updated_at)
+            
+        Returns:
+            Number of entries inserted
+        """
+        rows = [
+            (
+                entry["id"], entry["document_id"], entry["user_query"], entry["system_response"],
+                serialize_meta(entry.get("meta")), entry["created_at"], entry["updated_at"]
+            )
+            for entry in entries
+        ]
+        sql = """
+                INSERT OR IGNORE INTO chat_history (
+                    id, document_id, user_query, system_response, meta, created_at, updated_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?)
+                """
+        
+        with DatabaseConnection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.executemany(sql, rows)
+                conn.commit()
+                return len(rows)
+            except sqlite3.IntegrityError:
+                # A document was deleted while its entries were queued; insert the rest one by one
+                conn.rollback()
+                inserted = 0
+                for row in rows:
+                    try:
+                        cursor.execute(sql, row)
+                        inserted += 1
+                    except sqlite3.IntegrityError:
+                        logger.warning(f"Skipping chat entry {row[0]} for missing document {row[1]}")
+                conn.commit()
+                return inserted
+    
     def get_chat_entry_by_id(self, chat_id: str) -> Optional[Dict[str, Any]]:
         """
         Get a chat entry by its ID
@@ -489,4 +545,144 @@ class ChatHistoryRepository:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM chat_history WHERE document_id = ?", (document_id,))
             conn.commit()
-            return cursor.rowcount > 0
\ No newline at end of file
+            return cursor.rowcount > 0
+
+class QuizRepository:
+    """Repository for quiz CRUD operations"""
+    
+    def _deserialize(self, quiz: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if quiz:
+            quiz["meta"] = deserialize_meta(quiz.get("meta"))
+            quiz["questions"] = json.loads(quiz.pop("content") or "[]")
+        return quiz
+    
+    def add_quiz(
+        self,
+        document_id: str,
+        difficulty: str,
+        questions: List[Dict[str, Any]],
+        meta: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Store a generated quiz
+        
+        Args:
+            document_id: The document (or multi-document placeholder) the quiz was generated from
+            difficulty: The difficulty level
+            questions: Structured questions (question, options, answer, source)
+            meta: Additional metadata, e.g. model and cache_key
+            
+        Returns:
+            Created quiz record with deserialized questions
+        """
+        quiz_id = str(uuid.uuid4())
+        now = int(time.time())
+        
+        with DatabaseConnection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                INSERT INTO quizzes (
+                    id, document_id, questions_count, difficulty, content, meta, cache_key, created_at, updated_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    quiz_id, document_id, len(questions), difficulty,
+                    json.dumps(questions, ensure_ascii=False), serialize_meta(meta),
+                    (meta or {}).get("cache_key"), now, now
+                )
+            )
+            conn.commit()
+            
+            cursor.execute("SELECT * FROM quizzes WHERE id = ?", (quiz_id,))
+            return self._deserialize(cursor.fetchone())
+    
+    def get_quiz_by_id(self, quiz_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a quiz by its ID
+        
+        Args:
+            quiz_id: The quiz ID to retrieve
+            
+        Returns:
+            Quiz record with deserialized questions, or None if not found
+        """
+        with DatabaseConnection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM quizzes WHERE id = ?", (quiz_id,))
+            return self._deserialize(cursor.fetchone())
+    
+    def get_quiz_by_cache_key(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the most recent quiz generated for an identical request
+        
+        Args:
+            cache_key: Request fingerprint stored in the quiz metadata
+            
+        Returns:
+            Quiz record with deserialized questions, or None if not found
+        """
+        with DatabaseConnection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT * FROM quizzes 
+                WHERE cache_key = ? 
+                ORDER BY created_at DESC 
+                LIMIT 1
+                """,
+                (cache_key,)
+            )
+            return self._deserialize(cursor.fetchone())
+    
+    def get_quizzes_by_document(
+        self, 
+        document_id: str, 
+        limit: int = 20, 
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        """
+        Get quizzes for a specific document, newest first, without their questions
+        
+        Args:
+            document_id: The document ID to get quizzes for
+            limit: Maximum number of quizzes to return
+            offset: Pagination offset
+            
+        Returns:
+            List of quiz summary records
+        """
+        with DatabaseConnection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT id, document_id, questions_count, difficulty, meta, created_at, updated_at 
+                FROM quizzes 
+                WHERE document_id = ? 
+                ORDER BY created_at DESC 
+                LIMIT ? OFFSET ?
+                """, 
+                (document_id, limit, offset)
+            )
+            quizzes = cursor.fetchall()
+            
+            for quiz in quizzes:
+                quiz["meta"] = deserialize_meta(quiz.get("meta"))
+                
+            return quizzes
+    
+    def delete_quiz(self, quiz_id: str) -> bool:
+        """
+        Delete a quiz
+        
+        Args:
+            quiz_id: The quiz ID to delete
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        with DatabaseConnection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM quizzes WHERE id = ?", (quiz_id,))
+            conn.commit()
+            return cursor.rowcount > 0
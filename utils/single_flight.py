@@ -0,0 +1,86 @@
+"""
+Single-flight coalescing for identical concurrent requests.
+
+When several callers ask for the same expensive computation at once, only the
+first one runs it; the others await the in-flight result instead of starting
+their own generation.
+"""
+
+import asyncio
+import copy
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+def flight_key(*parts: Any) -> str:
+    """Build a coalescing key from request parts (bytes are hashed by content)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, (bytes, bytearray)):
+            digest.update(hashlib.sha256(part).digest())
+        elif isinstance(part, (list, tuple)):
+            digest.update(flight_key(*part).encode("utf-8"))
+        else:
+            digest.update(repr(part).encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+class SingleFlight:
+    """Coalesces concurrent async calls that share a key into one computation."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._executions = 0
+        self._coalesced = 0
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        enabled: bool = True,
+    ) -> Any:
+        """
+        Run fn once per key among concurrent callers and share its result.
+
+        The computation runs in its own task, so a caller disconnecting does not
+        cancel it for the others. Every caller receives its own deep copy of the
+        result, since routes decorate the returned dictionaries in place.
+
+        Args:
+            key: Coalescing key, usually built with flight_key()
+            fn: Zero-argument callable returning the awaitable to run
+            enabled: When False, fn is awaited directly without coalescing
+        """
+        if not enabled:
+            return await fn()
+
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            self._executions += 1
+            task.add_done_callback(lambda _task, _key=key: self._calls.pop(_key, None))
+        else:
+            self._coalesced += 1
+            logger.info(f"Coalesced request into in-flight {self.name} computation")
+
+        result = await asyncio.shield(task)
+        return copy.deepcopy(result)
+
+    def in_flight(self) -> int:
+        """Number of distinct computations currently running."""
+        return len(self._calls)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return execution and coalescing counters."""
+        return {
+            "name": self.name,
+            "in_flight": len(self._calls),
+            "executions": self._executions,
+            "coalesced": self._coalesced,
+        }
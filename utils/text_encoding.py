@@ -0,0 +1,146 @@
+"""
+Encoding detection and single-pass decoding for uploaded text files.
+
+The encoding is chosen once, from a byte-order mark or a bounded sample from
+the start of the file, and the file is then decoded in one streaming pass.
+Bytes that do not fit the chosen encoding are replaced rather than causing
+the whole file to be decoded again with another codec.
+"""
+
+import codecs
+import io
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+# Bytes inspected when there is no byte-order mark
+SAMPLE_BYTES = 64 * 1024
+# Bytes decoded per read when streaming a file
+READ_CHUNK_BYTES = 1024 * 1024
+# Legacy single-byte encoding assumed for text that is not valid UTF-8 (Vietnamese)
+FALLBACK_ENCODING = "cp1258"
+
+# UTF-32 marks come first: the UTF-32 LE mark starts with the UTF-16 LE one.
+# The "utf-16"/"utf-32" codecs read the mark themselves to pick the byte order.
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+def _utf16_without_bom(sample: bytes) -> Optional[str]:
+    """Recognize BOM-less UTF-16 by the NUL high bytes of mostly-ASCII text."""
+    if len(sample) < 4:
+        return None
+    even_nuls = sample[0::2].count(0)
+    odd_nuls = sample[1::2].count(0)
+    half = len(sample) // 2
+    if odd_nuls > half * 0.3 and even_nuls < half * 0.05:
+        return "utf-16-le"
+    if even_nuls > half * 0.3 and odd_nuls < half * 0.05:
+        return "utf-16-be"
+    return None
+
+
+def detect_encoding(sample: bytes, complete: bool = False) -> str:
+    """
+    Pick the encoding of text starting with sample.
+
+    Args:
+        sample: The first bytes of the text
+        complete: Whether sample is the whole text; otherwise a multi-byte
+            character cut off at the end of the sample is not an error
+
+    Returns:
+        A codec name accepted by bytes.decode()
+    """
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+
+    encoding = _utf16_without_bom(sample)
+    if encoding:
+        return encoding
+
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=complete)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return FALLBACK_ENCODING
+
+
+def decode_bytes(data: bytes, encoding: Optional[str] = None) -> Tuple[str, str]:
+    """
+    Decode in-memory text, detecting its encoding unless one is given.
+
+    Returns:
+        The text and the encoding it was decoded with
+    """
+    if encoding is None:
+        encoding = detect_encoding(data[:SAMPLE_BYTES], complete=len(data) <= SAMPLE_BYTES)
+    return data.decode(encoding, errors="replace"), encoding
+
+
+def read_text_file(
+    path: str,
+    encoding: Optional[str] = None,
+    translate_newlines: bool = True,
+) -> Tuple[str, str]:
+    """
+    Read a text file in one pass, detecting its encoding unless one is given.
+
+    Args:
+        path: The file to read
+        encoding: A previously detected encoding; skips detection
+        translate_newlines: Convert \\r\\n and \\r to \\n, as open() in text mode does
+
+    Returns:
+        The text and the encoding it was decoded with
+    """
+    with open(path, "rb") as f:
+        head = f.read(SAMPLE_BYTES)
+        if encoding is None:
+            encoding = detect_encoding(head, complete=len(head) < SAMPLE_BYTES)
+
+        decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        if translate_newlines:
+            decoder = io.IncrementalNewlineDecoder(decoder, translate=True)
+
+        parts = [decoder.decode(head)]
+        for block in iter(lambda: f.read(READ_CHUNK_BYTES), b""):
+            parts.append(decoder.decode(block))
+        parts.append(decoder.decode(b"", final=True))
+    return "".join(parts), encoding
+
+
+class EncodingCache:
+    """Remembers the detected encoding of each document so it is detected only once."""
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._encodings: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, document_id: Optional[str]) -> Optional[str]:
+        if document_id is None:
+            return None
+        with self._lock:
+            encoding = self._encodings.get(document_id)
+            if encoding is not None:
+                self._encodings.move_to_end(document_id)
+            return encoding
+
+    def set(self, document_id: Optional[str], encoding: str) -> None:
+        if document_id is None:
+            return
+        with self._lock:
+            self._encodings[document_id] = encoding
+            self._encodings.move_to_end(document_id)
+            while len(self._encodings) > self.max_entries:
+                self._encodings.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._encodings)
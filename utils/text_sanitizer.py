@@ -0,0 +1,90 @@
+"""
+Chinese-character filtering and whitespace cleanup for model output.
+
+Models occasionally drift into Chinese mid-answer. Characters are matched
+against precompiled Unicode ranges (the blocks whose character names contain
+"CJK": radicals, strokes, unified and compatibility ideographs), so a whole
+response is filtered by one regex pass instead of a name lookup per character.
+Vietnamese letters are Latin and never match.
+"""
+
+import re
+
+# Unicode blocks whose characters are named "CJK ..."
+CJK_CHARACTER_CLASS = (
+    "["
+    "\u2e80-\u2eff"                  # CJK Radicals Supplement
+    "\u31c0-\u31ef"                  # CJK Strokes
+    "\u3400-\u4dbf"                  # CJK Unified Ideographs Extension A
+    "\u4e00-\u9fff"                  # CJK Unified Ideographs
+    "\uf900-\ufaff"                  # CJK Compatibility Ideographs
+    "\U0001f210-\U0001f212"          # Squared CJK ideographs (1F213 is katakana)
+    "\U0001f214-\U0001f23b"
+    "\U0001f240-\U0001f248"          # Tortoise shell bracketed CJK ideographs
+    "\U00020000-\U0002fa1f"          # Extensions B-F and Compatibility Ideographs Supplement
+    "\U00030000-\U000323af"          # Extensions G-H
+    "]"
+)
+
+_CJK = re.compile(CJK_CHARACTER_CLASS)
+_CJK_RUNS = re.compile(CJK_CHARACTER_CLASS + "+")
+_WHITESPACE_RUNS = re.compile(r"\s+")
+
+
+def is_chinese(char: str) -> bool:
+    """Check if a character is Chinese."""
+    return _CJK.match(char) is not None
+
+
+def contains_chinese(text: str) -> bool:
+    """Check if text contains any Chinese characters."""
+    return _CJK.search(text) is not None
+
+
+def remove_chinese(text: str) -> str:
+    """Drop Chinese characters, leaving everything else untouched."""
+    return _CJK_RUNS.sub("", text)
+
+
+def sanitize_text(text: str) -> str:
+    """Remove Chinese characters and collapse all whitespace to single spaces."""
+    return " ".join(remove_chinese(text).split())
+
+
+class StreamSanitizer:
+    """
+    Applies sanitize_text to text arriving in pieces, e.g. streamed tokens.
+
+    Each feed() returns the cleaned text that can be emitted so far; the
+    concatenation of all outputs equals sanitize_text() of the whole input.
+    Whitespace is held back until non-space text follows it, so leading and
+    trailing whitespace never reach the output.
+    """
+
+    def __init__(self):
+        self._started = False
+        self._pending_space = False
+
+    def feed(self, chunk: str) -> str:
+        cleaned = remove_chinese(chunk)
+        if not cleaned:
+            return ""
+
+        parts = []
+        for index, piece in enumerate(_WHITESPACE_RUNS.split(cleaned)):
+            if index:
+                # A whitespace run separated this piece from the previous one
+                self._pending_space = True
+            if not piece:
+                continue
+            if self._pending_space and self._started:
+                parts.append(" ")
+            parts.append(piece)
+            self._started = True
+            self._pending_space = False
+        return "".join(parts)
+
+    def close(self) -> str:
+        """Finish the stream; held-back trailing whitespace is dropped."""
+        self._pending_space = False
+        return ""
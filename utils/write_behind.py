@@ -0,0 +1,132 @@
+"""
+Write-behind queue for database writes made on the request path.
+
+Requests enqueue records and return immediately; a background thread drains
+the queue and hands the records to a flush function in batches, so many
+inserts share one SQLite transaction and no request waits on a commit.
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    """
+    Batches records for a flush function running on one background thread.
+
+    A batch is flushed once batch_size records are waiting or flush_interval
+    seconds after its first record arrived, whichever comes first. A failed
+    flush is retried once; the batch is then dropped, logged and passed to
+    on_drop, so a bad record cannot block the queue. When the queue is full,
+    submit() flushes the record synchronously instead of dropping it.
+    """
+
+    def __init__(
+        self,
+        flush_fn: Callable[[List[Any]], None],
+        name: str = "write-behind",
+        batch_size: int = 100,
+        flush_interval: float = 0.5,
+        max_queue: int = 10000,
+        on_drop: Optional[Callable[[List[Any]], None]] = None,
+    ):
+        self.flush_fn = flush_fn
+        self.on_drop = on_drop
+        self.name = name
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.flushed = 0
+        self.batches = 0
+        self.failed = 0
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def submit(self, record: Any) -> None:
+        """Queue a record for the next batch."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            logger.warning(f"{self.name} queue is full; writing record synchronously")
+            self._flush([record])
+
+    def _collect(self) -> List[Any]:
+        try:
+            first = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, batch: List[Any]) -> None:
+        for attempt in (1, 2):
+            try:
+                self.flush_fn(batch)
+                self.flushed += len(batch)
+                self.batches += 1
+                return
+            except Exception as e:
+                if attempt == 2:
+                    self.failed += len(batch)
+                    logger.error(f"{self.name} dropped a batch of {len(batch)} records: {e}")
+                    if self.on_drop is not None:
+                        self.on_drop(batch)
+                else:
+                    logger.warning(f"{self.name} flush failed, retrying: {e}")
+
+    def _run(self) -> None:
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._collect()
+            if batch:
+                self._flush(batch)
+                for _ in batch:
+                    self._queue.task_done()
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self) -> None:
+        """Block until every record submitted so far has been flushed."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Flush what is queued and stop the background thread."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            if self._thread.is_alive():
+                logger.warning(f"{self.name} did not drain within {timeout}s; {self.pending()} records pending")
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending(),
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "failed": self.failed,
+        }